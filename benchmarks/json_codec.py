@@ -0,0 +1,91 @@
+"""Micro-benchmark of the ``json_utils`` backends on synthetic issue documents.
+
+For each installed backend, the script times ``loads`` on the canonical file
+bytes, compact ``dumps`` and ``dumps_canonical``. Each timing is the best of
+``--repeat`` runs over ``--docs`` documents. It also checks that every
+backend's canonical output is byte-identical to the standard library's, and
+exits with status 1 if it is not.
+
+Usage:
+    python benchmarks/json_codec.py --docs 5000 --output json-codec.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+HERE = Path(__file__).resolve().parent
+sys.path.append(str(HERE.parent / 'scripts'))
+sys.path.append(str(HERE))
+
+import json_utils  # noqa: E402
+import synth  # noqa: E402
+
+OPERATIONS = ('loads', 'dumps', 'dumps_canonical')
+
+
+def _best(fn: Callable[[], Any], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(docs: int, repeat: int, seed: int) -> Dict[str, Dict[str, Any]]:
+    corpus = list(synth.generate(docs, seed))
+    reference = [json.dumps(d, ensure_ascii=False, indent=2, sort_keys=True) for d in corpus]
+    raw = [text.encode('utf-8') for text in reference]
+    results: Dict[str, Dict[str, Any]] = {}
+    for name in json_utils.BACKENDS:
+        try:
+            codec = json_utils.get_codec(name)
+        except ImportError:
+            continue
+        row: Dict[str, Any] = {
+            'loads': _best(lambda: [codec.loads(r) for r in raw], repeat),
+            'dumps': _best(lambda: [codec.dumps(d) for d in corpus], repeat),
+            'dumps_canonical': _best(lambda: [codec.dumps_canonical(d) for d in corpus], repeat),
+        }
+        row = {op: round(seconds / docs * 1e6, 3) for op, seconds in row.items()}  # us/doc
+        row['canonical_identical'] = [codec.dumps_canonical(d) for d in corpus] == reference
+        results[name] = row
+    return results
+
+
+def format_table(results: Dict[str, Dict[str, Any]]) -> str:
+    lines = [f'{"backend":<10}' + ''.join(f'{op + " us":>20}' for op in OPERATIONS) + f'{"identical":>11}']
+    for name, row in results.items():
+        lines.append(
+            f'{name:<10}' + ''.join(f'{row[op]:>20.3f}' for op in OPERATIONS) + f'{str(row["canonical_identical"]):>11}'
+        )
+    return '\n'.join(lines)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description='Compare json_utils backends')
+    ap.add_argument('--docs', type=int, default=5000)
+    ap.add_argument('--repeat', type=int, default=5)
+    ap.add_argument('--seed', type=int, default=7)
+    ap.add_argument('--output', type=Path, default=None)
+    return ap.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    results = run(args.docs, args.repeat, args.seed)
+    print(f'default backend: {json_utils.BACKEND}')
+    print(format_table(results))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding='utf-8')
+    return 0 if all(row['canonical_identical'] for row in results.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""Search relevance and latency harness against a golden query set.
+
+The golden set (``golden_queries.json``) is derived from the deterministic
+synthetic corpus, so its expected ``issue_id`` lists are computed from the
+documents themselves rather than from any search implementation. Query classes:
+
+* ``rule_id``: exact rule ids such as ``sonar:java-00012``, expecting every issue
+  that carries that rule signal;
+* ``message``: three consecutive words from an error-message signal or summary;
+* ``prefix``: 4-character prefixes of two title words.
+
+Each configuration builds the corpus with a variant of the ``fts_issues``
+definition in ``issues_index.sql`` (tokenizer, prefix indexes) and runs the
+golden queries through ``search.query_fts``. The report gives recall@k, MRR,
+error counts and latency percentiles per class, side by side.
+
+Usage:
+    python benchmarks/relevance.py --configs baseline,unicode61,no_prefix
+    python benchmarks/relevance.py --regenerate   # rewrite golden_queries.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+HERE = Path(__file__).resolve().parent
+sys.path.append(str(HERE))
+
+import synth  # noqa: E402
+from run_benchmarks import REPO, Corpus, build_index, point_at, search  # noqa: E402
+
+GOLDEN_PATH = HERE / 'golden_queries.json'
+GOLDEN_SIZE = 2000
+PER_CLASS = 25
+# Prefix queries matching more documents than this say little about ranking.
+MAX_PREFIX_EXPECTED = 20
+DEFAULT_K = 10
+CLASSES = ('rule_id', 'message', 'prefix')
+
+# fts_issues option overrides per configuration; None removes the option.
+CONFIGS: Dict[str, Dict[str, Optional[str]]] = {
+    'baseline': {},
+    'unicode61': {'tokenize': 'unicode61'},
+    'no_prefix': {'prefix': None},
+    'prefix_3': {'prefix': '3'},
+    'trigram': {'tokenize': 'trigram', 'prefix': None},
+}
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def _tokens(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall((text or '').lower())
+
+
+def _indexed_tokens(doc: Dict[str, Any]) -> List[List[str]]:
+    """Token lists of the FTS columns (title, summary, fix_steps, signals, language)."""
+
+    signals = ' '.join(s['value'] for s in doc.get('signals', []))
+    return [_tokens(doc.get(k)) for k in ('title', 'summary', 'fix_steps')] + [
+        _tokens(signals),
+        _tokens(doc.get('language')),
+    ]
+
+
+def _contains_run(tokens: List[str], run: List[str]) -> bool:
+    n = len(run)
+    return any(tokens[i:i + n] == run for i in range(len(tokens) - n + 1))
+
+
+def make_golden(size: int = GOLDEN_SIZE, seed: int = 0, per_class: int = PER_CLASS) -> Dict[str, Any]:
+    """Derive golden queries and their expected ids from the synthetic corpus."""
+
+    docs = list(synth.generate(size, seed))
+    columns = {d['issue_id']: _indexed_tokens(d) for d in docs}
+    by_rule: Dict[str, List[str]] = defaultdict(list)
+    for d in docs:
+        by_rule[d['source_rule_id']].append(d['issue_id'])
+    rng = random.Random(f'golden:{seed}')
+    queries: List[Dict[str, Any]] = []
+
+    for rule in rng.sample(sorted(by_rule), per_class):
+        queries.append({'class': 'rule_id', 'query': rule, 'expected': sorted(by_rule[rule])})
+
+    for d in rng.sample(docs, per_class):
+        messages = [s['value'] for s in d['signals'] if s['kind'] == 'message' and len(_tokens(s['value'])) >= 3]
+        words = _tokens(messages[0] if messages else d['summary'])
+        start = rng.randrange(0, max(1, len(words) - 2))
+        run = words[start:start + 3]
+        expected = sorted(i for i, cols in columns.items() if any(_contains_run(c, run) for c in cols))
+        queries.append({'class': 'message', 'query': ' '.join(run), 'expected': expected})
+
+    prefix_queries = 0
+    for d in rng.sample(docs, len(docs)):
+        if prefix_queries == per_class:
+            break
+        words = sorted({w for w in _tokens(d['title']) if len(w) >= 6})
+        if len(words) < 2:
+            continue
+        prefixes = [w[:4] for w in rng.sample(words, 2)]
+        expected = sorted(
+            i
+            for i, cols in columns.items()
+            if all(any(t.startswith(p) for c in cols for t in c) for p in prefixes)
+        )
+        if len(expected) > MAX_PREFIX_EXPECTED:
+            continue
+        queries.append({'class': 'prefix', 'query': ' '.join(prefixes), 'expected': expected})
+        prefix_queries += 1
+
+    return {'corpus': {'size': size, 'seed': seed}, 'queries': queries}
+
+
+def schema_sql(overrides: Dict[str, Optional[str]]) -> str:
+    """``issues_index.sql`` with the ``fts_issues`` options replaced."""
+
+    sql = (REPO / 'issues_index.sql').read_text(encoding='utf-8')
+    head, _, rest = sql.partition('CREATE VIRTUAL TABLE IF NOT EXISTS fts_issues')
+    body, sep, tail = rest.partition(');')
+    for option, value in overrides.items():
+        pattern = re.compile(rf",\s*{option}\s*=\s*'[^']*'")
+        body = pattern.sub('' if value is None else f",\n  {option}='{value}'", body)
+        if value is not None and not pattern.search(body):
+            body = body.rstrip() + f",\n  {option}='{value}'\n"
+    return head + 'CREATE VIRTUAL TABLE IF NOT EXISTS fts_issues' + body + sep + tail
+
+
+def _percentile(samples: Sequence[float], q: float) -> float:
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def evaluate(db: Path, golden: Dict[str, Any], k: int = DEFAULT_K) -> Dict[str, Dict[str, float]]:
+    """Run the golden queries against ``db`` and score them per class."""
+
+    per_class: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+    for item in golden['queries']:
+        expected = set(item['expected'])
+        stats = per_class[item['class']]
+        start = time.perf_counter()
+        try:
+            ids = [r['issue_id'] for r in search.query_fts(db, item['query'], k)]
+        except sqlite3.Error:
+            ids = []
+            stats['errors'].append(1)
+        stats['latency'].append(time.perf_counter() - start)
+        found = [i for i in ids if i in expected]
+        stats['recall'].append(len(found) / min(k, len(expected)) if expected else 1.0)
+        rank = next((n for n, i in enumerate(ids, 1) if i in expected), None)
+        stats['rr'].append(1 / rank if rank else 0.0)
+
+    report: Dict[str, Dict[str, float]] = {}
+    for cls, stats in sorted(per_class.items()):
+        n = len(stats['latency'])
+        report[cls] = {
+            'queries': n,
+            'errors': len(stats['errors']),
+            f'recall@{k}': round(sum(stats['recall']) / n, 4),
+            'mrr': round(sum(stats['rr']) / n, 4),
+            'p50_ms': round(_percentile(stats['latency'], 0.5) * 1000, 3),
+            'p95_ms': round(_percentile(stats['latency'], 0.95) * 1000, 3),
+            'p99_ms': round(_percentile(stats['latency'], 0.99) * 1000, 3),
+        }
+    return report
+
+
+def run_config(name: str, golden: Dict[str, Any], k: int) -> Dict[str, Dict[str, float]]:
+    corpus_spec = golden['corpus']
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix=f'relevance-{name}-') as tmp:
+        corpus = Corpus(Path(tmp) / 'issuesdb', corpus_spec['size'], corpus_spec['seed'])
+        synth.write_corpus(corpus.root, corpus.size, corpus.seed)
+        sql = Path(tmp) / 'issues_index.sql'
+        sql.write_text(schema_sql(CONFIGS[name]), encoding='utf-8')
+        os.chdir(tmp)
+        logging.disable(logging.INFO)
+        try:
+            with point_at(corpus, sql=sql):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    build_index.main(['--integrity-tier', 'none'])
+                return evaluate(corpus.db, golden, k)
+        finally:
+            logging.disable(logging.NOTSET)
+            os.chdir(cwd)
+
+
+def format_table(results: Dict[str, Dict[str, Dict[str, float]]], k: int) -> str:
+    cols = ('errors', f'recall@{k}', 'mrr', 'p50_ms', 'p95_ms', 'p99_ms')
+    lines = [f"{'config':<12} {'class':<8} " + ' '.join(f'{c:>10}' for c in cols)]
+    for name, report in results.items():
+        for cls, row in report.items():
+            lines.append(f'{name:<12} {cls:<8} ' + ' '.join(f'{row[c]:>10}' for c in cols))
+    return '\n'.join(lines)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    ap.add_argument('--golden', type=Path, default=GOLDEN_PATH)
+    ap.add_argument('--configs', default='baseline', help=f'comma list from {", ".join(CONFIGS)}')
+    ap.add_argument('--k', type=int, default=DEFAULT_K)
+    ap.add_argument('--output', type=Path, help='write the JSON report here')
+    ap.add_argument('--regenerate', action='store_true', help='rewrite the golden set from the corpus')
+    ap.add_argument('--size', type=int, default=GOLDEN_SIZE, help='corpus size for --regenerate')
+    args = ap.parse_args(argv)
+    args.configs = [c.strip() for c in args.configs.split(',') if c.strip()]
+    unknown = set(args.configs) - set(CONFIGS)
+    if unknown:
+        ap.error(f'unknown configs: {", ".join(sorted(unknown))}')
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.regenerate:
+        golden = make_golden(args.size)
+        lines = ',\n'.join(json.dumps(q) for q in golden['queries'])
+        args.golden.write_text(
+            f'{{"corpus": {json.dumps(golden["corpus"])},\n"queries": [\n{lines}\n]}}\n', encoding='utf-8'
+        )
+        print(f"Wrote {len(golden['queries'])} golden queries to {args.golden}")
+        return 0
+    golden = json.loads(args.golden.read_text(encoding='utf-8'))
+    results = {name: run_config(name, golden, args.k) for name in args.configs}
+    print(format_table(results, args.k))
+    if args.output:
+        args.output.write_text(json.dumps({'k': args.k, 'results': results}, indent=2) + '\n', encoding='utf-8')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,381 @@
+"""Benchmark suite for the indexing and search pipeline.
+
+Every case runs against a deterministic synthetic corpus (see ``synth.py``) in a
+temporary directory. The cases are cold, incremental and no-op builds, search
+latency, chunk export, memory bank rendering, the SQLite serving profile,
+search during an in-place versus a blue/green rebuild, and a sharded index with
+fan-out search, at each ``--sizes`` corpus size. Results are written as JSON. ``--compare BASELINE`` flags results that are
+slower than the baseline by more than ``--threshold`` and exits with status 1.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 1000,10000 --output bench.json
+    python benchmarks/run_benchmarks.py --compare bench-baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+HERE = Path(__file__).resolve().parent
+REPO = HERE.parent
+sys.path.append(str(REPO / 'scripts'))
+sys.path.append(str(HERE))
+
+import build_index  # noqa: E402
+import chunk_export  # noqa: E402
+import render_memory_bank  # noqa: E402
+import search  # noqa: E402
+import shards  # noqa: E402
+import sqlite_profile  # noqa: E402
+import synth  # noqa: E402
+
+DEFAULT_SIZES = (1000, 10000)
+DEFAULT_QUERIES = 200
+DEFAULT_THRESHOLD = 0.2
+INCREMENTAL_FRACTION = 0.01
+
+
+@dataclass
+class Corpus:
+    root: Path
+    size: int
+    seed: int
+
+    @property
+    def db(self) -> Path:
+        return self.root / 'issues.sqlite'
+
+
+Results = Dict[str, float]
+Case = Callable[[Corpus, argparse.Namespace, Results], None]
+CASES: Dict[str, Case] = {}
+
+
+def case(name: str) -> Callable[[Case], Case]:
+    def register(fn: Case) -> Case:
+        CASES[name] = fn
+        return fn
+
+    return register
+
+
+@contextlib.contextmanager
+def point_at(corpus: Corpus, *, sql: Optional[Path] = None) -> Iterator[None]:
+    """Redirect the pipeline modules' path globals to ``corpus`` for the block.
+
+    ``sql`` replaces the schema file. The previous values are restored on exit,
+    so nothing keeps pointing at a deleted temporary corpus.
+    """
+
+    values = {
+        (build_index, 'ROOT'): corpus.root,
+        (build_index, 'DB'): corpus.db,
+        (build_index, 'STATE'): corpus.root / 'index_state.json',
+        (build_index, 'SQL'): sql or REPO / 'issues_index.sql',
+        (chunk_export, 'ROOT'): corpus.root / 'issues',
+        (render_memory_bank, 'ROOT'): corpus.root.parent,
+        (render_memory_bank, 'MB'): corpus.root.parent / 'memory_bank',
+        (render_memory_bank, 'ISS'): corpus.root / 'issues',
+        (render_memory_bank, 'DB'): corpus.db,
+        (render_memory_bank, 'STATE'): corpus.root / 'index_state.json',
+    }
+    saved = {key: getattr(*key) for key in values}
+    for (module, name), value in values.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for (module, name), value in saved.items():
+            setattr(module, name, value)
+
+
+def _timed(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _percentiles(samples: List[float], prefix: str, results: Results) -> None:
+    ordered = sorted(samples)
+    for q in (50, 95, 99):
+        idx = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+        results[f'{prefix}_p{q}_ms'] = round(ordered[idx] * 1000, 4)
+
+
+@case('build')
+def bench_build(corpus: Corpus, args: argparse.Namespace, results: Results) -> None:
+    n = corpus.size
+    results[f'cold_build_s@{n}'] = round(_timed(lambda: build_index.main([])), 4)
+
+    rng = random.Random(corpus.seed)
+    changed = set(rng.sample(range(n), max(1, int(n * INCREMENTAL_FRACTION))))
+    for i, doc in enumerate(synth.generate(n, corpus.seed)):
+        if i in changed:
+            doc['title'] = f"{doc['title']} revised"
+            synth.write_doc(corpus.root, doc)
+    results[f'incremental_build_s@{n}'] = round(_timed(lambda: build_index.main([])), 4)
+    results[f'noop_build_s@{n}'] = round(_timed(lambda: build_index.main([])), 4)
+
+
+def query_set(count: int, seed: int) -> List[str]:
+    """Deterministic mix of one-word, two-word and prefix queries."""
+
+    rng = random.Random(f'queries:{seed}')
+    head = synth.VOCABULARY[:200]
+    queries = []
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            queries.append(rng.choice(head))
+        elif kind == 1:
+            queries.append(' '.join(rng.sample(head, 2)))
+        else:
+            queries.append(rng.choice(head)[:3])
+    return queries
+
+
+@case('search')
+def bench_search(corpus: Corpus, args: argparse.Namespace, results: Results) -> None:
+    samples = []
+    for query in query_set(args.queries, corpus.seed):
+        start = time.perf_counter()
+        search.query_fts(corpus.db, query, 10)
+        samples.append(time.perf_counter() - start)
+    _percentiles(samples, f'search@{corpus.size}', results)
+
+
+@case('serving')
+def bench_serving(corpus: Corpus, args: argparse.Namespace, results: Results) -> None:
+    """Search latency as the serving profile's settings are added one at a time."""
+
+    n = corpus.size
+    default, serving = sqlite_profile.DEFAULTS, sqlite_profile.SERVING
+    snap_4k = corpus.root.parent / 'serving-4k.sqlite'
+    snap = corpus.root.parent / 'serving.sqlite'
+    sqlite_profile.snapshot(corpus.db, snap_4k, replace(serving, page_size=4096))
+    results[f'serving_snapshot_s@{n}'] = round(_timed(lambda: sqlite_profile.snapshot(corpus.db, snap)), 4)
+    results[f'serving_snapshot_mb@{n}'] = round(snap.stat().st_size / 2 ** 20, 2)
+    results[f'serving_build_db_mb@{n}'] = round(corpus.db.stat().st_size / 2 ** 20, 2)
+
+    mmap = replace(default, mmap_size=serving.mmap_size)
+    cache = replace(mmap, cache_kib=serving.cache_kib)
+    ladder = [
+        ('build_db', corpus.db, default, False),
+        ('vacuum_4k', snap_4k, default, False),
+        ('page_size', snap, default, False),
+        ('mmap', snap, mmap, False),
+        ('cache', snap, cache, False),
+        ('temp_store', snap, serving, False),
+        ('immutable', snap, serving, True),
+    ]
+    queries = query_set(args.queries, corpus.seed)
+    saved = search.PROFILE
+    try:
+        for label, db, profile, immutable in ladder:
+            search.PROFILE = profile
+            for query in queries[:20]:  # warm the OS page cache
+                search.query_fts(db, query, 10, immutable=immutable)
+            samples = []
+            for query in queries:
+                start = time.perf_counter()
+                search.query_fts(db, query, 10, immutable=immutable)
+                samples.append(time.perf_counter() - start)
+            _percentiles(samples, f'serving_{label}@{n}', results)
+    finally:
+        search.PROFILE = saved
+
+
+def _rebuild(argv: List[str]) -> None:
+    logging.disable(logging.INFO)
+    build_index.main(argv)
+
+
+@case('swap')
+def bench_swap(corpus: Corpus, args: argparse.Namespace, results: Results) -> None:
+    """Search latency and errors while a full rebuild runs in another process.
+
+    ``inplace`` re-indexes every file into the live database; ``shadow`` builds a
+    new generation and swaps it in (see ``index_generations.py``). Cases after
+    this one read the migrated, generational index through its symlink.
+    """
+
+    n = corpus.size
+    queries = query_set(args.queries, corpus.seed)
+    ctx = multiprocessing.get_context('fork')
+    state = corpus.root / 'index_state.json'
+    for label, argv in (('inplace', []), ('shadow', ['--rebuild'])):
+        if not argv:
+            state.unlink()
+        proc = ctx.Process(target=_rebuild, args=(argv,))
+        samples: List[float] = []
+        errors = 0
+        start = time.perf_counter()
+        proc.start()
+        while proc.is_alive():
+            query = queries[len(samples) % len(queries)]
+            t0 = time.perf_counter()
+            try:
+                search.query_fts(corpus.db, query, 10)
+            except sqlite3.Error:
+                errors += 1
+            samples.append(time.perf_counter() - t0)
+        proc.join()
+        results[f'swap_{label}_build_s@{n}'] = round(time.perf_counter() - start, 4)
+        results[f'swap_{label}_errors@{n}'] = errors
+        if samples:
+            _percentiles(samples, f'swap_{label}@{n}', results)
+            results[f'swap_{label}@{n}_max_ms'] = round(max(samples) * 1000, 4)
+
+
+@case('shards')
+def bench_shards(corpus: Corpus, args: argparse.Namespace, results: Results) -> None:
+    """Per-partition shards: parallel build, fan-out search and language pruning.
+
+    ``overlap`` is the mean share of the single index's top 10 that the fan-out
+    also returns.
+    """
+
+    n = corpus.size
+    shards_dir = corpus.root / shards.SHARDS_DIR
+    results[f'shards_build_s@{n}'] = round(_timed(lambda: shards.build(corpus.root)), 4)
+    results[f'shards_count@{n}'] = len(shards.discover(shards_dir))
+    language = synth.LANGUAGES[0]
+    queries = query_set(args.queries, corpus.seed)
+    runs = (
+        ('single', lambda q: search.query_fts(corpus.db, q, 10)),
+        ('fanout', lambda q: search.query_shards(shards_dir, q, 10)),
+        ('pruned', lambda q: search.query_shards(shards_dir, q, 10, languages=[language])),
+    )
+    hits: Dict[str, List[List[str]]] = {}
+    for label, fn in runs:
+        for query in queries[:20]:
+            fn(query)
+        samples = []
+        hits[label] = []
+        for query in queries:
+            start = time.perf_counter()
+            rows = fn(query)
+            samples.append(time.perf_counter() - start)
+            hits[label].append([r['issue_id'] for r in rows])
+        _percentiles(samples, f'shards_{label}@{n}', results)
+    shared = [len(set(a) & set(b)) / len(a) for a, b in zip(hits['single'], hits['fanout']) if a]
+    results[f'shards_overlap@{n}'] = round(sum(shared) / len(shared), 4) if shared else 1.0
+
+
+@case('chunk_export')
+def bench_chunk_export(corpus: Corpus, args: argparse.Namespace, results: Results) -> None:
+    out = corpus.root.parent / 'exports' / 'chunks.jsonl'
+    results[f'chunk_export_s@{corpus.size}'] = round(_timed(lambda: chunk_export.export(out)), 4)
+
+
+@case('render_memory_bank')
+def bench_render(corpus: Corpus, args: argparse.Namespace, results: Results) -> None:
+    results[f'render_memory_bank_s@{corpus.size}'] = round(_timed(lambda: render_memory_bank.main([])), 4)
+
+
+def run(args: argparse.Namespace) -> Dict[str, object]:
+    results: Results = {}
+    logging.disable(logging.INFO)
+    cwd = os.getcwd()
+    try:
+        for size in args.sizes:
+            with tempfile.TemporaryDirectory(prefix=f'bench-{size}-') as tmp:
+                corpus = Corpus(Path(tmp) / 'issuesdb', size, args.seed)
+                synth.write_corpus(corpus.root, size, args.seed)
+                # Keep metrics and memory bank output inside the temp dir.
+                os.chdir(tmp)
+                try:
+                    # 'build' must run first: the other cases read its index.
+                    with point_at(corpus), contextlib.redirect_stdout(io.StringIO()):
+                        for name in ['build'] + [c for c in args.cases if c != 'build']:
+                            CASES[name](corpus, args, results)
+                finally:
+                    os.chdir(cwd)
+    finally:
+        logging.disable(logging.NOTSET)
+    return {
+        'meta': {
+            'ts': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'sizes': list(args.sizes),
+            'queries': args.queries,
+        },
+        'results': results,
+    }
+
+
+def compare(current: Results, baseline: Results, threshold: float) -> List[Dict[str, object]]:
+    """Return results slower than ``baseline`` by more than ``threshold`` (all lower-is-better)."""
+
+    regressions = []
+    for name, base in sorted(baseline.items()):
+        value = current.get(name)
+        if value is None or base <= 0:
+            continue
+        ratio = value / base
+        if ratio > 1 + threshold:
+            regressions.append({'name': name, 'baseline': base, 'current': value, 'ratio': round(ratio, 3)})
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    ap.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)))
+    ap.add_argument('--cases', default=','.join(CASES), help=f'comma list from {", ".join(CASES)}')
+    ap.add_argument('--queries', type=int, default=DEFAULT_QUERIES)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--output', type=Path)
+    ap.add_argument('--compare', type=Path, help='baseline JSON written by an earlier run')
+    ap.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = ap.parse_args(argv)
+    args.sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    args.cases = [c.strip() for c in args.cases.split(',') if c.strip()]
+    unknown = set(args.cases) - set(CASES)
+    if unknown:
+        ap.error(f'unknown cases: {", ".join(sorted(unknown))}')
+    if not args.sizes or min(args.sizes) <= 0 or args.queries <= 0:
+        ap.error('--sizes and --queries must be positive')
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = run(args)
+    status = 0
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding='utf-8'))
+        regressions = compare(report['results'], baseline['results'], args.threshold)
+        report['regressions'] = regressions
+        for r in regressions:
+            print(f"REGRESSION {r['name']}: {r['baseline']} -> {r['current']} (x{r['ratio']})", file=sys.stderr)
+        status = 1 if regressions else 0
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text + '\n', encoding='utf-8')
+    else:
+        print(text)
+    return status
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,160 @@
+"""Deterministic synthetic issue corpus matching ``schemas/issue.schema.json``.
+
+The same ``seed`` and parameters always produce byte-identical files, so
+benchmark runs on different machines or commits index the same corpus. Text
+lengths follow a log-normal distribution around ``text_mean`` characters; words
+come from a fixed vocabulary with a Zipf-like skew so FTS postings look like
+real text rather than uniform noise.
+
+Usage:
+    python benchmarks/synth.py OUT_DIR --count 10000 [--seed 0]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+SOURCES = ('sonar', 'semgrep', 'eslint', 'bandit')
+LANGUAGES = ('java', 'js', 'ts', 'py')
+SEVERITIES = ('BLOCKER', 'CRITICAL', 'MAJOR', 'MINOR', 'INFO')
+CWES = tuple(f'CWE-{n}' for n in (20, 22, 78, 79, 89, 94, 190, 200, 287, 295, 352, 400, 434, 502, 611, 798, 918))
+SIGNAL_KINDS = ('rule_id', 'error_code', 'message', 'signature')
+BASE_TIME = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+_SYLLABLES = (
+    'al', 'be', 'con', 'de', 'ex', 'fa', 'gen', 'hy', 'in', 'jo', 'ka', 'lo', 'man', 'ne', 'or',
+    'pa', 'que', 'ro', 'sa', 'ta', 'un', 've', 'wa', 'xe', 'yo', 'za',
+)
+_TECH = (
+    'null', 'pointer', 'injection', 'sql', 'query', 'buffer', 'overflow', 'deprecated', 'import',
+    'unused', 'variable', 'exception', 'timeout', 'thread', 'lock', 'race', 'cookie', 'header',
+    'token', 'password', 'hash', 'regex', 'loop', 'index', 'array', 'string', 'format', 'logger',
+    'socket', 'request', 'response', 'session', 'cache', 'memory', 'leak', 'close', 'stream',
+)
+
+
+def _vocabulary(size: int = 2000) -> List[str]:
+    words = list(_TECH)
+    rng = random.Random('vocabulary')
+    seen = set(words)
+    while len(words) < size:
+        word = ''.join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+VOCABULARY = _vocabulary()
+# Zipf-like cumulative weights: word k has weight 1/(k+1).
+_CUM_WEIGHTS: List[float] = []
+_total = 0.0
+for _k in range(len(VOCABULARY)):
+    _total += 1 / (_k + 1)
+    _CUM_WEIGHTS.append(_total)
+
+
+def _words(rng: random.Random, n: int) -> str:
+    return ' '.join(rng.choices(VOCABULARY, cum_weights=_CUM_WEIGHTS, k=n))
+
+
+def _text(rng: random.Random, mean_chars: int, sigma: float) -> str:
+    chars = max(20, int(rng.lognormvariate(math.log(mean_chars), sigma)))
+    # Average word plus space is about 7 characters.
+    sentences = []
+    remaining = chars // 7
+    while remaining > 0:
+        n = min(remaining, rng.randint(6, 18))
+        sentences.append(_words(rng, n).capitalize() + '.')
+        remaining -= n
+    return ' '.join(sentences)
+
+
+def issue_id(seed: int, index: int) -> str:
+    return hashlib.sha1(f'synth|{seed}|{index}'.encode('utf-8')).hexdigest()
+
+
+def generate(
+    count: int,
+    seed: int = 0,
+    *,
+    text_mean: int = 400,
+    text_sigma: float = 0.6,
+    signals: Tuple[int, int] = (1, 4),
+    references: Tuple[int, int] = (0, 3),
+) -> Iterator[Dict[str, Any]]:
+    """Yield ``count`` issue documents; each depends only on ``seed`` and its index."""
+
+    for index in range(count):
+        rng = random.Random(f'{seed}:{index}')
+        source = SOURCES[index % len(SOURCES)]
+        language = rng.choice(LANGUAGES)
+        rule = f'{source}:{language}-{rng.randint(1, max(10, count // 20)):05d}'
+        doc: Dict[str, Any] = {
+            'issue_id': issue_id(seed, index),
+            'source': source,
+            'source_rule_id': rule,
+            'language': language,
+            'title': _words(rng, rng.randint(3, 9)).capitalize()[:240],
+            'summary': _text(rng, text_mean, text_sigma),
+            'root_cause': _text(rng, text_mean // 2, text_sigma) if rng.random() < 0.7 else None,
+            'fix_steps': _text(rng, text_mean // 2, text_sigma) if rng.random() < 0.8 else None,
+            'autofix_snippet': None,
+            'severity': rng.choice(SEVERITIES),
+            'confidence': round(rng.random(), 2),
+            'taxonomy': {'cwe': rng.sample(CWES, rng.randint(0, 2)), 'owasp': []},
+            'frequency': rng.randint(0, 1000),
+            'signals': [{'kind': 'rule_id', 'value': rule}]
+            + [
+                {'kind': rng.choice(SIGNAL_KINDS[1:]), 'value': _words(rng, rng.randint(1, 4))}
+                for _ in range(rng.randint(*signals) - 1)
+            ],
+            'references': [
+                {'label': f'Reference {r}', 'url': f'https://example.org/{source}/{rule}/{r}', 'license': None}
+                for r in range(rng.randint(*references))
+            ],
+            'metadata': {'synthetic': True, 'seed': seed},
+            'updated_at': (BASE_TIME + timedelta(minutes=index)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        }
+        yield doc
+
+
+def doc_path(root: Path, doc: Dict[str, Any]) -> Path:
+    return root / 'issues' / doc['source'] / doc['language'] / f"{doc['issue_id']}.json"
+
+
+def write_doc(root: Path, doc: Dict[str, Any]) -> Path:
+    path = doc_path(root, doc)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Same canonical layout as emit_issue.write_issue.
+    path.write_text(json.dumps(doc, ensure_ascii=False, indent=2, sort_keys=True), encoding='utf-8')
+    return path
+
+
+def write_corpus(root: Path, count: int, seed: int = 0, **kwargs: Any) -> List[Path]:
+    """Write the corpus under ``root/issues/<source>/<language>/``."""
+
+    return [write_doc(root, doc) for doc in generate(count, seed, **kwargs)]
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description='Write a synthetic issue corpus')
+    ap.add_argument('out', type=Path, help='issuesdb-like root; files go to OUT/issues/...')
+    ap.add_argument('--count', type=int, default=10000)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--text-mean', type=int, default=400)
+    ap.add_argument('--text-sigma', type=float, default=0.6)
+    args = ap.parse_args(argv)
+    paths = write_corpus(args.out, args.count, args.seed, text_mean=args.text_mean, text_sigma=args.text_sigma)
+    print(f'Wrote {len(paths)} issues under {args.out / "issues"}')
+
+
+if __name__ == '__main__':
+    main()
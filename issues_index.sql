@@ -14,21 +14,58 @@ CREATE TABLE IF NOT EXISTS issues (
   taxonomy_json   TEXT,
   frequency       INTEGER,
   metadata_json   TEXT,
-  updated_at      TEXT
+  updated_at      TEXT,
+  content_hash    TEXT
 );
 
+CREATE INDEX IF NOT EXISTS idx_issues_updated_at ON issues(updated_at);
+
 CREATE TABLE IF NOT EXISTS signals (
   issue_id  TEXT NOT NULL,
   kind      TEXT,
   value     TEXT NOT NULL
 );
 
+-- issue_id: per-issue signal rewrites and the signals_concat subquery in build_index.
+-- value: exact rule-id / signature lookups in search.py.
+CREATE INDEX IF NOT EXISTS idx_signals_issue ON signals(issue_id);
+CREATE INDEX IF NOT EXISTS idx_signals_value ON signals(value);
+
 CREATE TABLE IF NOT EXISTS references_web (
   issue_id  TEXT NOT NULL,
   label     TEXT,
   url       TEXT NOT NULL,
   license   TEXT
 );
+-- Per-issue reference rewrites in build_index; without it each upsert scans the table.
+CREATE INDEX IF NOT EXISTS idx_references_issue ON references_web(issue_id);
+
+-- Near-duplicate detection maintained by build_index (see scripts/dedup.py).
+CREATE TABLE IF NOT EXISTS minhash (
+  issue_id    TEXT PRIMARY KEY,
+  text_hash   TEXT NOT NULL,
+  signature   BLOB NOT NULL,
+  cluster_id  TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_minhash_cluster ON minhash(cluster_id);
+
+CREATE TABLE IF NOT EXISTS lsh_buckets (
+  band      INTEGER NOT NULL,
+  bucket    INTEGER NOT NULL,
+  issue_id  TEXT NOT NULL,
+  PRIMARY KEY (band, bucket, issue_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_lsh_buckets_issue ON lsh_buckets(issue_id);
+
+-- Materialized aggregates maintained by build_index (see scripts/index_stats.py).
+CREATE TABLE IF NOT EXISTS stats (
+  dimension TEXT NOT NULL,
+  key       TEXT NOT NULL,
+  count     INTEGER NOT NULL,
+  PRIMARY KEY (dimension, key)
+) WITHOUT ROWID;
 
 CREATE VIRTUAL TABLE IF NOT EXISTS fts_issues
 USING fts5(
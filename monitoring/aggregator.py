@@ -0,0 +1,337 @@
+"""Aggregate the daily metrics JSONL into rolling windows and feed AlertManager.
+
+The daily files written by :class:`MetricsCollector` are tailed incrementally:
+byte offsets per file are kept in a state file, so each run only reads lines
+appended since the previous one. Only complete lines are consumed; a partially
+written last line is picked up on the next run.
+
+Events are folded into per-minute slots per event type (status counts plus
+log-bucketed durations), so the window costs bounded memory and survives across
+cron runs through the same state file. The window summary is mapped onto the
+keys :meth:`AlertManager.evaluate` understands.
+
+Usage:
+    python -m monitoring.aggregator --once
+    python -m monitoring.aggregator --follow --interval 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from monitoring.alert_manager import Alert, AlertManager, add_setting_arguments, load_thresholds  # noqa: E402
+from monitoring.registry import LogBuckets  # noqa: E402
+
+METRICS_DIR = Path('metrics') / 'daily'
+STATE_PATH = Path('metrics') / 'aggregator_state.json'
+OUTPUT_PATH = Path('metrics') / 'aggregates.json'
+DEFAULT_WINDOW_S = 3600
+SLOT_S = 60
+PRUNE_EVERY = 10000
+QUANTILES = (0.5, 0.95, 0.99)
+# Durations are bucketed in seconds from 1 ms to one day.
+BUCKETS = LogBuckets(1e-3, 86400.0)
+
+# Statuses counted as failures when computing success rates.
+FAILURE_STATUSES = {'error', 'failure', 'timeout', 'rate_limited'}
+
+
+def _atomic_write(path: Path, data: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def parse_ts(value: Any) -> Optional[float]:
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+class LogTailer:
+    """Yield records appended to ``base_dir/*.json`` since the saved offsets."""
+
+    def __init__(self, base_dir: Path, offsets: Optional[Dict[str, int]] = None) -> None:
+        self.base_dir = Path(base_dir)
+        self.offsets: Dict[str, int] = dict(offsets or {})
+        self.malformed = 0
+
+    def read_new(self) -> Iterator[Dict[str, Any]]:
+        files = sorted(self.base_dir.glob('*.json'))
+        names = {p.name for p in files}
+        for name in list(self.offsets):
+            if name not in names:
+                del self.offsets[name]
+        for path in files:
+            offset = self.offsets.get(path.name, 0)
+            if path.stat().st_size < offset:
+                # Truncated or replaced: start over.
+                offset = 0
+            with path.open('rb') as fh:
+                fh.seek(offset)
+                for line in fh:
+                    if not line.endswith(b'\n'):
+                        break
+                    offset += len(line)
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        self.malformed += 1
+                        continue
+                    if isinstance(record, dict):
+                        yield record
+            self.offsets[path.name] = offset
+
+
+class Window:
+    """Per-minute slots of status counts and duration buckets per event type."""
+
+    def __init__(self, seconds: int = DEFAULT_WINDOW_S) -> None:
+        self.seconds = seconds
+        # event_type -> slot start -> {'statuses': {status: n}, 'buckets': {idx: n}, 'sum_s': float}
+        self.slots: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        # event_type -> status -> {'ts': ..., 'duration_ms': ..., numeric details}
+        self.last: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.newest = 0.0
+
+    def add(self, record: Dict[str, Any]) -> None:
+        event_type = record.get('event_type')
+        status = record.get('status')
+        ts = parse_ts(record.get('ts'))
+        if not isinstance(event_type, str) or not isinstance(status, str) or ts is None:
+            return
+        self.newest = max(self.newest, ts)
+        latest = self.last.setdefault(event_type, {})
+        if ts >= latest.get(status, {}).get('ts', float('-inf')):
+            entry: Dict[str, Any] = {'ts': ts}
+            if record.get('duration_ms') is not None:
+                entry['duration_ms'] = record['duration_ms']
+            details = record.get('details')
+            if isinstance(details, dict):
+                entry.update(
+                    (k, v)
+                    for k, v in details.items()
+                    if isinstance(v, (int, float)) and not isinstance(v, bool) and k not in entry
+                )
+            latest[status] = entry
+        slot_start = int(ts // SLOT_S * SLOT_S)
+        slot = self.slots.setdefault(event_type, {}).setdefault(
+            slot_start, {'statuses': {}, 'buckets': {}, 'sum_s': 0.0}
+        )
+        slot['statuses'][status] = slot['statuses'].get(status, 0) + 1
+        duration_ms = record.get('duration_ms')
+        if isinstance(duration_ms, (int, float)) and not isinstance(duration_ms, bool):
+            seconds = duration_ms / 1000
+            idx = BUCKETS.index(seconds)
+            slot['buckets'][idx] = slot['buckets'].get(idx, 0) + 1
+            slot['sum_s'] += seconds
+
+    def prune(self, now: float) -> None:
+        cutoff = now - self.seconds
+        for event_type in list(self.slots):
+            slots = self.slots[event_type]
+            for start in [s for s in slots if s + SLOT_S <= cutoff]:
+                del slots[start]
+            if not slots:
+                del self.slots[event_type]
+
+    def summary(self, now: float) -> Dict[str, Dict[str, Any]]:
+        self.prune(now)
+        out: Dict[str, Dict[str, Any]] = {}
+        for event_type, slots in sorted(self.slots.items()):
+            statuses: Dict[str, int] = {}
+            buckets: Dict[int, int] = {}
+            sum_s = 0.0
+            for slot in slots.values():
+                for status, n in slot['statuses'].items():
+                    statuses[status] = statuses.get(status, 0) + n
+                for idx, n in slot['buckets'].items():
+                    buckets[idx] = buckets.get(idx, 0) + n
+                sum_s += slot['sum_s']
+            count = sum(statuses.values())
+            failures = sum(n for s, n in statuses.items() if s in FAILURE_STATUSES)
+            timed = sum(buckets.values())
+            entry: Dict[str, Any] = {
+                'count': count,
+                'per_minute': round(count * 60 / self.seconds, 4),
+                'statuses': statuses,
+                'failure_ratio': round(failures / count, 4) if count else 0.0,
+            }
+            if timed:
+                entry['mean_seconds'] = sum_s / timed
+                for q in QUANTILES:
+                    entry[f'p{round(q * 100)}_seconds'] = BUCKETS.quantile(buckets, q)
+            out[event_type] = entry
+        return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'slots': {
+                et: {str(start): {**slot, 'buckets': {str(i): n for i, n in slot['buckets'].items()}}
+                     for start, slot in slots.items()}
+                for et, slots in self.slots.items()
+            },
+            'last': self.last,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], seconds: int = DEFAULT_WINDOW_S) -> 'Window':
+        window = cls(seconds)
+        for et, slots in data.get('slots', {}).items():
+            window.slots[et] = {
+                int(start): {**slot, 'buckets': {int(i): n for i, n in slot['buckets'].items()}}
+                for start, slot in slots.items()
+            }
+        window.last = data.get('last', {})
+        return window
+
+
+def _latest(window: Window, event_type: str, status: str) -> Optional[Dict[str, Any]]:
+    return window.last.get(event_type, {}).get(status)
+
+
+def alert_metrics(window: Window, summary: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Map a window summary onto the keys understood by :class:`AlertManager`."""
+
+    metrics: Dict[str, Any] = {}
+    collect = summary.get('collect')
+    if collect and collect['count']:
+        statuses = collect['statuses']
+        metrics['collection_success_rate'] = statuses.get('ok', 0) / collect['count']
+        metrics['api_rate_limited_ratio'] = statuses.get('rate_limited', 0) / collect['count']
+
+    build = _latest(window, 'build_index', 'ok')
+    if build and 'duration_ms' in build:
+        metrics['index_build_time_seconds'] = build['duration_ms'] / 1000
+
+    memory = _latest(window, 'memory_governor', 'summary')
+    if memory and 'peak_rss_mb' in memory:
+        metrics['memory_usage_mb'] = memory['peak_rss_mb']
+
+    checks = []
+    for event_type, ok_status in (('check_health', 'success'), ('index_integrity', 'success')):
+        for status, ok in ((ok_status, True), ('failure', False)):
+            entry = _latest(window, event_type, status)
+            if entry:
+                checks.append((entry['ts'], ok))
+    if checks:
+        metrics['fts5_integrity_ok'] = max(checks)[1]
+    return metrics
+
+
+class Aggregator:
+    """Tail the daily logs, update the window and evaluate alerts."""
+
+    def __init__(
+        self,
+        base_dir: Path = METRICS_DIR,
+        state_path: Path = STATE_PATH,
+        *,
+        window_seconds: int = DEFAULT_WINDOW_S,
+        output_path: Optional[Path] = OUTPUT_PATH,
+        disk_path: Optional[Path] = None,
+        alerts: Optional[AlertManager] = None,
+    ) -> None:
+        self.state_path = Path(state_path)
+        state = self._load_state()
+        self.tailer = LogTailer(base_dir, state.get('offsets'))
+        self.window = Window.from_dict(state.get('window', {}), window_seconds)
+        self.output_path = output_path
+        self.disk_path = disk_path
+        self.alerts = alerts
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.state_path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_state(self) -> None:
+        _atomic_write(self.state_path, {'offsets': self.tailer.offsets, 'window': self.window.to_dict()})
+
+    def run_once(self, now: Optional[float] = None) -> Tuple[Dict[str, Any], List[Alert]]:
+        """Consume new lines and return ``(aggregates, alerts)``."""
+
+        read = 0
+        for record in self.tailer.read_new():
+            self.window.add(record)
+            read += 1
+            if read % PRUNE_EVERY == 0:
+                # Keep a long catch-up read bounded to the window as well.
+                self.window.prune(self.window.newest)
+        now = time.time() if now is None else now
+        summary = self.window.summary(now)
+        metrics = alert_metrics(self.window, summary)
+        if self.disk_path is not None:
+            usage = shutil.disk_usage(self.disk_path)
+            metrics['disk_usage'] = usage.used / usage.total
+        alerts: List[Alert] = []
+        if self.alerts is not None:
+            alerts = self.alerts.check(metrics, now=now)
+        aggregates = {
+            'ts': datetime.fromtimestamp(now, timezone.utc).isoformat(),
+            'window_seconds': self.window.seconds,
+            'records_read': read,
+            'malformed': self.tailer.malformed,
+            'events': summary,
+            'alert_metrics': metrics,
+        }
+        self.save_state()
+        if self.output_path is not None:
+            _atomic_write(Path(self.output_path), aggregates)
+        return aggregates, alerts
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--once', action='store_true', help='read new lines once and exit (default)')
+    mode.add_argument('--follow', action='store_true', help='keep tailing every --interval seconds')
+    parser.add_argument('--interval', type=float, default=30.0)
+    parser.add_argument('--metrics-dir', type=Path, default=METRICS_DIR)
+    parser.add_argument('--state-path', type=Path, default=STATE_PATH)
+    parser.add_argument('--output', type=Path, default=OUTPUT_PATH)
+    parser.add_argument('--window-seconds', type=int, default=DEFAULT_WINDOW_S)
+    parser.add_argument('--disk-path', type=Path, help='report disk usage of this path')
+    add_setting_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.interval <= 0 or args.window_seconds <= 0:
+        parser.error('--interval and --window-seconds must be positive')
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    aggregator = Aggregator(
+        args.metrics_dir,
+        args.state_path,
+        window_seconds=args.window_seconds,
+        output_path=args.output,
+        disk_path=args.disk_path,
+        alerts=AlertManager(load_thresholds(args)),
+    )
+    while True:
+        _, alerts = aggregator.run_once()
+        for alert in alerts:
+            print(f'{alert.severity} {alert.name}: {alert.message}')
+        if not args.follow:
+            return 0
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
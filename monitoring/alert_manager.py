@@ -1,13 +1,37 @@
-"""Alert manager evaluating metrics against thresholds and writing active alerts."""
+"""Alert manager evaluating metrics against thresholds and tracking active alerts.
+
+Alerts are identified by ``id`` (the rule name, or ``manual:<hash>`` for
+:meth:`AlertManager.critical`). A breach fires once it has persisted for the
+rule's ``for_seconds``; a firing alert clears only after its metric recovers past
+the threshold by the ``hysteresis`` fraction, and is downgraded (e.g. disk usage
+CRITICAL to WARN) only past the same band. Samples that omit a metric leave its
+alert, firing or pending, untouched. The active set is written to
+``alerts/active_alerts.json`` with a tmp+rename, and only when it changes (new,
+cleared or re-graded alerts), so :meth:`AlertManager.check` can run on every
+aggregated sample. Breaches still
+waiting out ``for_seconds`` are kept the same way in
+``alerts/active_alerts.pending.json``, so a manager created per run (cron,
+``aggregator.py --once``) still fires them.
+
+``for_seconds`` (a number, or per alert name) and ``hysteresis`` default to the
+values in ``thresholds.json``, with the same env/CLI overrides as thresholds.
+"""
 
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
 import os
-from dataclasses import asdict, dataclass
+import time
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
+
+DEFAULT_HYSTERESIS = 0.02
+# thresholds.json keys that configure the manager rather than a rule.
+SETTINGS = ("for_seconds", "hysteresis")
 
 
 @dataclass
@@ -17,129 +41,250 @@ class Alert:
     name: str
     message: str
     severity: str
+    id: str = ""
+    value: Optional[float] = None
+    first_seen: Optional[str] = None
+    last_seen: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        if not self.id:
+            self.id = self.name
+
+
+@dataclass(frozen=True)
+class Rule:
+    """Threshold rule on one metric key."""
+
+    name: str
+    metric: str
+    threshold: str
+    above: bool
+    severity: str
+    message: str
+
+
+# Ordered by precedence: the first breached rule per name wins.
+RULES = (
+    Rule("collection_success_rate", "collection_success_rate", "collection_success_rate", False,
+         "ERROR", "Collection success rate below threshold"),
+    Rule("index_build_time_seconds", "index_build_time_seconds", "index_build_time_seconds", True,
+         "WARN", "Index build time exceeds threshold"),
+    Rule("disk_usage", "disk_usage", "disk_usage_critical", True,
+         "CRITICAL", "Disk usage above critical threshold"),
+    Rule("disk_usage", "disk_usage", "disk_usage_warn", True,
+         "WARN", "Disk usage above warning threshold"),
+    Rule("memory_usage_mb", "memory_usage_mb", "memory_usage_mb", True,
+         "WARN", "Memory usage above threshold"),
+    Rule("api_rate_limited_ratio", "api_rate_limited_ratio", "api_rate_limited_ratio", True,
+         "WARN", "API rate-limited requests ratio too high"),
+)
+
+
+def _now_iso(now: float) -> str:
+    return datetime.fromtimestamp(now, timezone.utc).isoformat()
 
 
 class AlertManager:
-    """Evaluates metrics and writes active alerts to a JSON file."""
+    """Evaluates metrics and keeps the active alert set in a JSON file."""
 
     def __init__(
         self,
-        thresholds: Optional[Dict[str, float]] = None,
+        thresholds: Optional[Dict[str, Any]] = None,
         *,
         output_path: Optional[Path] = None,
+        for_seconds: Union[None, float, Dict[str, float]] = None,
+        hysteresis: Optional[float] = None,
     ) -> None:
         if thresholds is None:
             thresholds = load_thresholds(parse_args([]))
+        if for_seconds is None:
+            for_seconds = thresholds.get("for_seconds", 0.0)
+        if hysteresis is None:
+            hysteresis = thresholds.get("hysteresis", DEFAULT_HYSTERESIS)
+        if hysteresis < 0:
+            raise ValueError("hysteresis must be non-negative")
         self.thresholds = thresholds
         self.output_path = output_path or Path("alerts") / "active_alerts.json"
+        self.pending_path = self.output_path.with_name(f"{self.output_path.stem}.pending{self.output_path.suffix}")
+        self.for_seconds = for_seconds
+        self.hysteresis = hysteresis
+        self.writes = 0
+        # id -> epoch seconds when the breach was first seen (not yet firing)
+        self._pending: Dict[str, float] = self._load_pending()
+        self.active: Dict[str, Alert] = self._load()
+        self._written = self.output_path.exists()
 
-    def evaluate(self, metrics: Dict[str, Any]) -> List[Alert]:
-        """Return alerts for metrics breaching thresholds."""
+    # -- stateless evaluation -------------------------------------------------
+    def evaluate(self, metrics: Dict[str, Any], *, relax: bool = False) -> List[Alert]:
+        """Return alerts for metrics breaching thresholds.
+
+        With ``relax`` thresholds are shifted by the hysteresis fraction in the
+        recovering direction, which is the test for keeping a firing alert.
+        """
         t = self.thresholds
         alerts: List[Alert] = []
+        seen = set()
+        for rule in RULES:
+            value = metrics.get(rule.metric)
+            if value is None or rule.name in seen:
+                continue
+            limit = t[rule.threshold]
+            if relax:
+                limit *= (1 - self.hysteresis) if rule.above else (1 + self.hysteresis)
+            if (value > limit) if rule.above else (value < limit):
+                seen.add(rule.name)
+                alerts.append(Alert(rule.name, rule.message, rule.severity, value=value))
 
-        rate = metrics.get("collection_success_rate")
-        if rate is not None and rate < t["collection_success_rate"]:
-            alerts.append(
-                Alert(
-                    "collection_success_rate",
-                    "Collection success rate below threshold",
-                    "ERROR",
-                )
-            )
-
-        build_time = metrics.get("index_build_time_seconds")
-        if build_time is not None and build_time > t["index_build_time_seconds"]:
-            alerts.append(
-                Alert(
-                    "index_build_time_seconds",
-                    "Index build time exceeds threshold",
-                    "WARN",
-                )
-            )
-
-        disk_usage = metrics.get("disk_usage")
-        if disk_usage is not None:
-            if disk_usage > t["disk_usage_critical"]:
-                alerts.append(
-                    Alert(
-                        "disk_usage",
-                        "Disk usage above critical threshold",
-                        "CRITICAL",
-                    )
-                )
-            elif disk_usage > t["disk_usage_warn"]:
-                alerts.append(
-                    Alert(
-                        "disk_usage",
-                        "Disk usage above warning threshold",
-                        "WARN",
-                    )
-                )
-
-        mem = metrics.get("memory_usage_mb")
-        if mem is not None and mem > t["memory_usage_mb"]:
-            alerts.append(
-                Alert(
-                    "memory_usage_mb",
-                    "Memory usage above threshold",
-                    "WARN",
-                )
-            )
-
-        rate_limited = metrics.get("api_rate_limited_ratio")
-        if rate_limited is not None and rate_limited > t["api_rate_limited_ratio"]:
-            alerts.append(
-                Alert(
-                    "api_rate_limited_ratio",
-                    "API rate-limited requests ratio too high",
-                    "WARN",
-                )
-            )
-
-        fts5_ok = metrics.get("fts5_integrity_ok", True)
-        if not fts5_ok:
-            alerts.append(
-                Alert(
-                    "fts5_integrity",
-                    "FTS5 integrity check failed",
-                    "CRITICAL",
-                )
-            )
-
+        if not metrics.get("fts5_integrity_ok", True):
+            alerts.append(Alert("fts5_integrity", "FTS5 integrity check failed", "CRITICAL"))
         return alerts
 
-    def write_alerts(self, alerts: List[Alert]) -> None:
-        """Write alerts to the configured output file."""
-        self.output_path.parent.mkdir(parents=True, exist_ok=True)
-        data = [asdict(a) for a in alerts]
-        with self.output_path.open("w", encoding="utf-8") as fh:
+    # -- state -----------------------------------------------------------------
+    def _load(self) -> Dict[str, Alert]:
+        try:
+            data = json.loads(self.output_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return {}
+        known = {f.name for f in fields(Alert)}
+        alerts = [Alert(**{k: v for k, v in item.items() if k in known}) for item in data]
+        return {a.id: a for a in alerts}
+
+    def _load_pending(self) -> Dict[str, float]:
+        try:
+            data = json.loads(self.pending_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return {}
+        return {str(k): float(v) for k, v in data.items()} if isinstance(data, dict) else {}
+
+    def _hold_for(self, name: str) -> float:
+        if isinstance(self.for_seconds, dict):
+            return self.for_seconds.get(name, 0.0)
+        return self.for_seconds
+
+    @staticmethod
+    def _metric_of(alert_id: str) -> Optional[str]:
+        if alert_id == "fts5_integrity":
+            return "fts5_integrity_ok"
+        for rule in RULES:
+            if rule.name == alert_id:
+                return rule.metric
+        return None
+
+    @staticmethod
+    def _write_json(path: Path, data: Any) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as fh:
             json.dump(data, fh, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    def write_alerts(self, alerts: List[Alert]) -> None:
+        """Atomically write alerts to the configured output file."""
+        self._write_json(self.output_path, [asdict(a) for a in alerts])
+        self._written = True
+        self.writes += 1
+
+    def _write_pending(self) -> None:
+        if self._pending:
+            self._write_json(self.pending_path, self._pending)
+        else:
+            self.pending_path.unlink(missing_ok=True)
+
+    def flush(self) -> None:
+        """Write the active set now, e.g. to persist ``last_seen``."""
+        self.write_alerts(list(self.active.values()))
 
     def critical(self, message: str) -> None:
-        """Write a single critical alert with the given message."""
+        """Add a manual critical alert; other active alerts are kept."""
         if not isinstance(message, str) or not message:
             raise ValueError("message must be a non-empty string")
-        self.write_alerts([Alert("manual", message, "CRITICAL")])
+        alert_id = "manual:" + hashlib.sha1(message.encode("utf-8")).hexdigest()[:12]
+        stamp = _now_iso(time.time())
+        existing = self.active.get(alert_id)
+        first_seen = existing.first_seen if existing else stamp
+        self.active[alert_id] = Alert("manual", message, "CRITICAL", alert_id, None, first_seen, stamp)
+        self.flush()
 
-    def check(self, metrics: Dict[str, Any]) -> List[Alert]:
-        """Evaluate metrics and persist active alerts."""
-        alerts = self.evaluate(metrics)
-        self.write_alerts(alerts)
-        return alerts
+    def resolve(self, alert_id: str) -> bool:
+        """Clear an alert by id (manual alerts never clear on their own)."""
+        if self.active.pop(alert_id, None) is None:
+            return False
+        self.flush()
+        return True
+
+    def check(self, metrics: Dict[str, Any], *, now: Optional[float] = None) -> List[Alert]:
+        """Fold one metrics sample into the active set and return firing alerts.
+
+        The output file is rewritten only when the active set changes, and the
+        pending file only when a breach starts waiting, fires or recovers.
+        """
+        now = time.time() if now is None else now
+        stamp = _now_iso(now)
+        breached = {a.id: a for a in self.evaluate(metrics)}
+        changed = False
+        pending = dict(self._pending)
+
+        for alert_id in list(self._pending):
+            if alert_id not in breached and self._metric_of(alert_id) in metrics:
+                del self._pending[alert_id]
+
+        held: Optional[Dict[str, Alert]] = None
+        for alert_id, alert in breached.items():
+            current = self.active.get(alert_id)
+            if current is not None:
+                if current.severity != alert.severity or current.message != alert.message:
+                    if held is None:
+                        held = {a.id: a for a in self.evaluate(metrics, relax=True)}
+                    # Re-grade only past the hysteresis band, so a downgrade waits like a clear does.
+                    kept = held[alert_id]
+                    if kept.severity != current.severity or kept.message != current.message:
+                        current.severity, current.message = alert.severity, alert.message
+                        changed = True
+                current.value = alert.value
+                current.last_seen = stamp
+                continue
+            since = self._pending.setdefault(alert_id, now)
+            if now - since >= self._hold_for(alert.name):
+                del self._pending[alert_id]
+                alert.first_seen = _now_iso(since)
+                alert.last_seen = stamp
+                self.active[alert_id] = alert
+                changed = True
+
+        for alert_id in list(self.active):
+            metric = self._metric_of(alert_id)
+            if alert_id in breached or metric is None or metric not in metrics:
+                continue
+            if held is None:
+                held = {a.id: a for a in self.evaluate(metrics, relax=True)}
+            if alert_id not in held:
+                del self.active[alert_id]
+                changed = True
+
+        if changed or not self._written:
+            self.flush()
+        if self._pending != pending:
+            self._write_pending()
+        return list(self.active.values())
 
 
 def load_thresholds(
     args: argparse.Namespace,
     config_path: Path = Path(__file__).resolve().parent / "config" / "thresholds.json",
-) -> Dict[str, float]:
-    """Load thresholds with env and CLI overrides."""
+) -> Dict[str, Any]:
+    """Load thresholds and ``SETTINGS`` with env and CLI overrides.
+
+    ``for_seconds`` may be a per-alert mapping in the file; an override
+    replaces it with one value for every alert.
+    """
     with config_path.open("r", encoding="utf-8") as fh:
-        thresholds: Dict[str, float] = json.load(fh)
+        thresholds: Dict[str, Any] = json.load(fh)
+    for key in SETTINGS:
+        thresholds.setdefault(key, DEFAULT_HYSTERESIS if key == "hysteresis" else 0.0)
     for key, value in list(thresholds.items()):
         env_val = os.getenv(f"ALERT_{key.upper()}")
         if env_val is not None:
-            thresholds[key] = type(value)(env_val)
+            thresholds[key] = float(env_val) if isinstance(value, dict) else type(value)(env_val)
         cli_val = getattr(args, key, None)
         if cli_val is not None:
             thresholds[key] = cli_val
@@ -155,9 +300,16 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser.add_argument("--disk-usage-critical", type=float)
     parser.add_argument("--memory-usage-mb", type=float)
     parser.add_argument("--api-rate-limited-ratio", type=float)
+    add_setting_arguments(parser)
     return parser.parse_args(argv)
 
 
+def add_setting_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add ``--for-seconds`` and ``--hysteresis``, read by :func:`load_thresholds`."""
+    parser.add_argument("--for-seconds", type=float, help="how long a breach must last before it fires")
+    parser.add_argument("--hysteresis", type=float, help="recovery band for clearing a firing alert")
+
+
 def main(argv: Optional[List[str]] = None) -> int:
     """Entry point parsing flags and writing alerts for provided metrics."""
     args = parse_args(argv)
@@ -1,17 +1,62 @@
+import atexit
 import json
 import os
+import threading
+import time
 from datetime import datetime, date, timezone
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+# (epoch seconds, event_type, status, duration_ms, details, cid)
+_Pending = Tuple[float, str, str, Optional[int], Optional[Dict[str, Any]], Optional[str]]
 
 
 class MetricsCollector:
-    """Collects simple metrics by writing JSONL files per day."""
+    """Collects simple metrics by writing JSONL files per day.
+
+    In buffered mode (``buffered=True`` or ``METRICS_BUFFERED=true``) ``record``
+    only appends a tuple to an in-memory buffer. A background thread formats and
+    writes the buffer when it holds ``flush_size`` records, every
+    ``flush_interval_s`` seconds, on :meth:`flush` and at interpreter exit. The
+    buffer holds at most ``max_buffer`` records; overflow is counted in
+    :attr:`dropped` and reported as a ``metrics_collector``/``dropped`` event. One
+    ``O_APPEND`` descriptor stays open per day. After :meth:`close`, ``record``
+    writes each event directly. Instances are safe to share across threads.
 
-    def __init__(self, base_dir: Optional[Path] = None, *, enabled: Optional[bool] = None) -> None:
+    Every write appends whole lines with a single ``os.write`` on an ``O_APPEND``
+    descriptor, so processes sharing a day's file never interleave partial lines.
+    """
+
+    def __init__(
+        self,
+        base_dir: Optional[Path] = None,
+        *,
+        enabled: Optional[bool] = None,
+        buffered: Optional[bool] = None,
+        max_buffer: int = 10000,
+        flush_size: int = 500,
+        flush_interval_s: float = 1.0,
+    ) -> None:
         self.base_dir = Path(base_dir or Path('metrics') / 'daily')
         env_enabled = os.getenv('METRICS_ENABLED', 'true').lower() != 'false'
         self.enabled = env_enabled if enabled is None else enabled
+        env_buffered = os.getenv('METRICS_BUFFERED', 'false').lower() == 'true'
+        self.buffered = env_buffered if buffered is None else buffered
+        if max_buffer <= 0 or flush_size <= 0 or flush_interval_s <= 0:
+            raise ValueError('max_buffer, flush_size and flush_interval_s must be positive')
+        self.max_buffer = max_buffer
+        self.flush_size = flush_size
+        self.flush_interval_s = flush_interval_s
+        self.dropped = 0
+        self._dropped_unreported = 0
+        self._buffer: List[_Pending] = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._fd: Optional[int] = None
+        self._fd_day: Optional[str] = None
 
     def _get_today(self) -> date:
         return datetime.now(timezone.utc).date()
@@ -41,8 +86,30 @@ class MetricsCollector:
 
         self._validate(event_type, status)
 
-        record = {
-            'ts': datetime.now(timezone.utc).isoformat(),
+        if self.buffered and self._enqueue((time.time(), event_type, status, duration_ms, details, cid)):
+            return
+
+        record = self._build(datetime.now(timezone.utc).isoformat(), event_type, status, duration_ms, details, cid)
+
+        today = self._get_today().isoformat()
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        fd = self._open(self.base_dir / f'{today}.json')
+        try:
+            self._write(fd, json.dumps(record, ensure_ascii=False) + '\n')
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _build(
+        ts: str,
+        event_type: str,
+        status: str,
+        duration_ms: Optional[int],
+        details: Optional[Dict[str, Any]],
+        cid: Optional[str],
+    ) -> Dict[str, Any]:
+        record: Dict[str, Any] = {
+            'ts': ts,
             'event_type': event_type,
             'status': status,
         }
@@ -52,10 +119,90 @@ class MetricsCollector:
             record['details'] = details
         if cid is not None:
             record['cid'] = cid
+        return record
 
-        today = self._get_today().isoformat()
-        path = self.base_dir / f'{today}.json'
-        path.parent.mkdir(parents=True, exist_ok=True)
-        with path.open('a', encoding='utf-8') as fh:
-            json.dump(record, fh, ensure_ascii=False)
-            fh.write('\n')
+    @staticmethod
+    def _open(path: Path) -> int:
+        return os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    @staticmethod
+    def _write(fd: int, text: str) -> None:
+        data = memoryview(text.encode('utf-8'))
+        while data:
+            data = data[os.write(fd, data):]
+
+    # -- buffered mode ------------------------------------------------------
+    def _enqueue(self, item: _Pending) -> bool:
+        """Buffer ``item``; False once closed, so the caller writes it directly."""
+        with self._lock:
+            if self._closed:
+                return False
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                self._dropped_unreported += 1
+                return True
+            self._buffer.append(item)
+            size = len(self._buffer)
+            if self._thread is None:
+                self._start()
+        if size >= self.flush_size:
+            self._wake.set()
+        return True
+
+    def _start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='metrics-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            self.flush()
+            if self._closed:
+                return
+
+    def flush(self) -> None:
+        """Write buffered records now."""
+        with self._lock:
+            items, self._buffer = self._buffer, []
+            dropped, self._dropped_unreported = self._dropped_unreported, 0
+        if dropped:
+            items.append((time.time(), 'metrics_collector', 'dropped', None, {'count': dropped}, None))
+        if not items:
+            return
+        days: Dict[str, List[str]] = {}
+        for ts, event_type, status, duration_ms, details, cid in items:
+            moment = datetime.fromtimestamp(ts, timezone.utc)
+            record = self._build(moment.isoformat(), event_type, status, duration_ms, details, cid)
+            days.setdefault(moment.date().isoformat(), []).append(json.dumps(record, ensure_ascii=False) + '\n')
+        with self._write_lock:
+            for day, lines in days.items():
+                self._write(self._handle(day), ''.join(lines))
+
+    def _handle(self, day: str) -> int:
+        if self._fd is None or self._fd_day != day:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self.base_dir.mkdir(parents=True, exist_ok=True)
+            self._fd = self._open(self.base_dir / f'{day}.json')
+            self._fd_day = day
+        return self._fd
+
+    def close(self) -> None:
+        """Flush remaining records, stop the flusher and close the file descriptor."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        self._wake.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+            atexit.unregister(self.close)
+        self.flush()
+        with self._write_lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
@@ -0,0 +1,470 @@
+"""In-process metrics registry with labelled counters, gauges and histograms.
+
+Histograms use fixed, log-linear buckets in the style of HDR histograms: each
+power-of-two range between ``lowest`` and ``highest`` is split into
+``SUB_BUCKETS`` linear sub-buckets, so memory per label set is constant and
+percentiles carry a bounded relative error (about 1/SUB_BUCKETS).
+
+The registry exports Prometheus text format (optionally as a node_exporter
+textfile at ``METRICS_PROM_PATH``) and JSON snapshots that are written to the
+daily JSONL through :class:`MetricsCollector`.
+
+Registries pickle without their locks. A worker process can send its registry
+back to the parent, which folds it in with :meth:`MetricsRegistry.merge` and
+writes one textfile for the whole job.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from monitoring.metrics_collector import MetricsCollector
+
+LabelValues = Tuple[str, ...]
+
+SUB_BUCKETS = 16
+DEFAULT_LOWEST = 1e-6
+DEFAULT_HIGHEST = 3600.0
+SNAPSHOT_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+class LogBuckets:
+    """Log-linear bucket layout shared by histograms and rollups."""
+
+    def __init__(self, lowest: float = DEFAULT_LOWEST, highest: float = DEFAULT_HIGHEST) -> None:
+        if not 0 < lowest < highest:
+            raise ValueError('need 0 < lowest < highest')
+        self.lowest = lowest
+        self.highest = highest
+        self.octaves = math.ceil(math.log2(highest / lowest))
+        # index 0 holds values below ``lowest``; the last index holds overflow.
+        self.size = self.octaves * SUB_BUCKETS + 2
+
+    def index(self, value: float) -> int:
+        if value < self.lowest:
+            return 0
+        mantissa, exp = math.frexp(value / self.lowest)
+        idx = 1 + (exp - 1) * SUB_BUCKETS + int((mantissa * 2 - 1) * SUB_BUCKETS)
+        return min(idx, self.size - 1)
+
+    def upper(self, idx: int) -> float:
+        """Upper bound of bucket ``idx`` (``inf`` for overflow)."""
+
+        if idx <= 0:
+            return self.lowest
+        if idx >= self.size - 1:
+            return math.inf
+        octave, sub = divmod(idx - 1, SUB_BUCKETS)
+        return self.lowest * (2 ** octave) * (1 + (sub + 1) / SUB_BUCKETS)
+
+    def quantile(self, counts: Dict[int, int], q: float) -> Optional[float]:
+        """Estimate quantile ``q`` from sparse ``{bucket: count}``."""
+
+        total = sum(counts.values())
+        if not total:
+            return None
+        rank = max(1, math.ceil(q * total))
+        seen = 0
+        for idx in sorted(counts):
+            seen += counts[idx]
+            if seen >= rank:
+                return self.upper(idx)
+        return self.upper(max(counts))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str]) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _labels(self, key: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+    def _header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        if amount < 0:
+            raise ValueError('counters only increase')
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def merge(self, other: 'Counter') -> None:
+        """Add ``other``'s values to this metric's."""
+
+        with self._lock:
+            for key, value in other._values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+    def to_prometheus(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f'{self.name}{self._labels(k)} {_fmt(v)}' for k, v in items]
+        return lines
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [{'labels': dict(zip(self.labelnames, k)), 'value': v} for k, v in items]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def merge(self, other: 'Counter') -> None:
+        """Take ``other``'s values; a gauge is a reading, not a total."""
+
+        with self._lock:
+            self._values.update(other._values)
+
+
+class _Series:
+    __slots__ = ('counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self, size: int) -> None:
+        self.counts = [0] * size
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        *,
+        lowest: float = DEFAULT_LOWEST,
+        highest: float = DEFAULT_HIGHEST,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = LogBuckets(lowest, highest)
+        self._series: Dict[LabelValues, _Series] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        idx = self.buckets.index(value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(self.buckets.size)
+            series.counts[idx] += 1
+            series.count += 1
+            series.sum += value
+            if value < series.min:
+                series.min = value
+            if value > series.max:
+                series.max = value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def merge(self, other: 'Histogram') -> None:
+        """Add ``other``'s observations; both must use the same bucket layout."""
+
+        if (other.buckets.lowest, other.buckets.highest) != (self.buckets.lowest, self.buckets.highest):
+            raise ValueError(f'{self.name} bucket layouts differ')
+        with self._lock:
+            for key, theirs in other._series.items():
+                series = self._series.get(key)
+                if series is None:
+                    series = self._series[key] = _Series(self.buckets.size)
+                series.counts = [a + b for a, b in zip(series.counts, theirs.counts)]
+                series.count += theirs.count
+                series.sum += theirs.sum
+                series.min = min(series.min, theirs.min)
+                series.max = max(series.max, theirs.max)
+
+    def sparse(self, **labels: Any) -> Dict[int, int]:
+        series = self._series.get(self._key(labels))
+        if series is None:
+            return {}
+        return {i: n for i, n in enumerate(series.counts) if n}
+
+    def count(self, **labels: Any) -> int:
+        series = self._series.get(self._key(labels))
+        return series.count if series else 0
+
+    def percentile(self, q: float, **labels: Any) -> Optional[float]:
+        series = self._series.get(self._key(labels))
+        if series is None or not series.count:
+            return None
+        estimate = self.buckets.quantile(self.sparse(**labels), q)
+        return min(max(estimate, series.min), series.max)
+
+    def to_prometheus(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = sorted(self._series.items())
+        for key, series in items:
+            cumulative = 0
+            # Export cumulative counts at octave edges only; the fine buckets stay internal.
+            for octave in range(self.buckets.octaves + 1):
+                hi = 1 + octave * SUB_BUCKETS
+                cumulative = sum(series.counts[:hi])
+                le = self.buckets.lowest * (2 ** octave)
+                if cumulative:
+                    lines.append(f'{self.name}_bucket{self._labels(key, ("le", _fmt(le)))} {cumulative}')
+                if cumulative == series.count:
+                    break
+            lines.append(f'{self.name}_bucket{self._labels(key, ("le", "+Inf"))} {series.count}')
+            lines.append(f'{self.name}_sum{self._labels(key)} {_fmt(series.sum)}')
+            lines.append(f'{self.name}_count{self._labels(key)} {series.count}')
+        return lines
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            keys = sorted(self._series)
+        out = []
+        for key in keys:
+            labels = dict(zip(self.labelnames, key))
+            series = self._series[key]
+            entry: Dict[str, Any] = {
+                'labels': labels,
+                'count': series.count,
+                'sum': series.sum,
+                'min': series.min,
+                'max': series.max,
+                'buckets': self.sparse(**labels),
+            }
+            for q in SNAPSHOT_QUANTILES:
+                entry[f'p{round(q * 100)}'] = self.percentile(q, **labels)
+            out.append(entry)
+        return out
+
+
+class MetricsRegistry:
+    """Get-or-create registry of named metrics."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls: type, name: str, help: str, labelnames: Sequence[str], **kwargs: Any) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f'metric {name} already registered with a different type or labels')
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), **kwargs: Any) -> Histogram:
+        return self._get(Histogram, name, help, labelnames, **kwargs)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._metrics.clear()
+
+    def reset(self) -> None:
+        """Zero every metric; unlike :meth:`clear`, module-level handles stay registered."""
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def merge(self, other: 'MetricsRegistry') -> None:
+        """Fold ``other`` (e.g. a worker's registry) into this one."""
+
+        with other._lock:
+            metrics = list(other._metrics.values())
+        for metric in metrics:
+            kwargs = {}
+            if isinstance(metric, Histogram):
+                kwargs = {'lowest': metric.buckets.lowest, 'highest': metric.buckets.highest}
+            self._get(type(metric), metric.name, metric.help, metric.labelnames, **kwargs).merge(metric)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'_metrics': dict(self._metrics)}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self._metrics = state['_metrics']
+        self._lock = threading.Lock()
+
+    def to_prometheus(self) -> str:
+        with self._lock:
+            metrics = [self._metrics[n] for n in sorted(self._metrics)]
+        lines: List[str] = []
+        for metric in metrics:
+            lines += metric.to_prometheus()
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = [self._metrics[n] for n in sorted(self._metrics)]
+        return {m.name: {'type': m.kind, 'series': m.snapshot()} for m in metrics}
+
+    def write_snapshot(self, collector: MetricsCollector, cid: Optional[str] = None) -> None:
+        """Append the current snapshot to the daily JSONL as a ``metrics_snapshot`` event."""
+
+        snapshot = self.snapshot()
+        if snapshot:
+            collector.record('metrics_snapshot', 'ok', details=snapshot, cid=cid)
+
+    def write_textfile(self, path: Path) -> None:
+        """Atomically write Prometheus text format to ``path``."""
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A unique tmp name per writer: concurrent processes never replace each other's file.
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+                fh.write(self.to_prometheus())
+            # mkstemp creates 0600; node_exporter usually runs as another user.
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def export(self, collector: MetricsCollector, cid: Optional[str] = None) -> None:
+        """Write a snapshot and, when ``METRICS_PROM_PATH`` is set, the textfile."""
+
+        self.write_snapshot(collector, cid)
+        prom_path = os.getenv('METRICS_PROM_PATH')
+        if prom_path:
+            self.write_textfile(Path(prom_path))
+
+
+class PeriodicSnapshot:
+    """Write registry snapshots on a background thread every ``interval_s`` seconds."""
+
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        collector: MetricsCollector,
+        interval_s: float = 60.0,
+        *,
+        cid: Optional[str] = None,
+    ) -> None:
+        self.registry = registry
+        self.collector = collector
+        self.interval_s = interval_s
+        self.cid = cid
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.registry.write_snapshot(self.collector, self.cid)
+
+    def start(self) -> 'PeriodicSnapshot':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='metrics-snapshot', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the thread and write a final snapshot."""
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.registry.write_snapshot(self.collector, self.cid)
+
+    def __enter__(self) -> 'PeriodicSnapshot':
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
+
+
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,329 @@
+"""Compact completed days of metrics JSONL into a SQLite rollup store.
+
+Each completed day (``metrics/daily/<YYYY-MM-DD>.json``, UTC) is read once, no
+earlier than ``GRACE`` after it ends, and folded into per-minute and per-hour rows keyed by
+``(event_type, ts, status)``, the primary key doubling as the ``(event_type, ts)``
+index. Rows carry count, sum/min/max duration and sparse log-bucketed duration
+histograms, so percentiles over long ranges only sum a few hundred small rows.
+The grace period covers buffered collectors that flush a record stamped just
+before midnight after the day ended. Rows are upserted by adding counts, sums
+and buckets, so a row that already exists is merged, never replaced.
+Compacted days are recorded in ``compacted_days``; retention then deletes old raw
+files, minute rows and hour rows.
+
+Usage:
+    python monitoring/rollup.py compact [--grace-minutes 60] [--raw-days 7] [--minute-days 30] [--hour-days 400]
+    python monitoring/rollup.py percentile build_index 0.95 --days 30 --status ok
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from monitoring.aggregator import BUCKETS, parse_ts  # noqa: E402
+
+METRICS_DIR = Path('metrics') / 'daily'
+DB_PATH = Path('metrics') / 'metrics.sqlite'
+RAW_RETENTION_DAYS = 7
+MINUTE_RETENTION_DAYS = 30
+HOUR_RETENTION_DAYS = 400
+# A day is compacted only this long after it ends, once late buffered records have landed.
+GRACE = timedelta(hours=1)
+# Ranges longer than this are answered from the hourly table.
+MINUTE_QUERY_MAX_S = 2 * 86400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_minute (
+  event_type TEXT NOT NULL,
+  ts INTEGER NOT NULL,
+  status TEXT NOT NULL,
+  count INTEGER NOT NULL,
+  timed INTEGER NOT NULL,
+  sum_ms REAL NOT NULL,
+  min_ms REAL,
+  max_ms REAL,
+  buckets TEXT NOT NULL,
+  PRIMARY KEY (event_type, ts, status)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_hour (
+  event_type TEXT NOT NULL,
+  ts INTEGER NOT NULL,
+  status TEXT NOT NULL,
+  count INTEGER NOT NULL,
+  timed INTEGER NOT NULL,
+  sum_ms REAL NOT NULL,
+  min_ms REAL,
+  max_ms REAL,
+  buckets TEXT NOT NULL,
+  PRIMARY KEY (event_type, ts, status)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS compacted_days (
+  day TEXT PRIMARY KEY,
+  records INTEGER NOT NULL,
+  compacted_at TEXT NOT NULL
+);
+"""
+
+TABLES = {'minute': ('rollup_minute', 60), 'hour': ('rollup_hour', 3600)}
+
+_UPSERT = (
+    'INSERT INTO {table} VALUES (?,?,?,?,?,?,?,?,?)'
+    ' ON CONFLICT(event_type, ts, status) DO UPDATE SET'
+    ' count = count + excluded.count,'
+    ' timed = timed + excluded.timed,'
+    ' sum_ms = sum_ms + excluded.sum_ms,'
+    ' min_ms = MIN(COALESCE(min_ms, excluded.min_ms), COALESCE(excluded.min_ms, min_ms)),'
+    ' max_ms = MAX(COALESCE(max_ms, excluded.max_ms), COALESCE(excluded.max_ms, max_ms)),'
+    ' buckets = merge_buckets(buckets, excluded.buckets)'
+)
+
+
+def _merge_buckets(a: str, b: str) -> str:
+    merged = json.loads(a)
+    for idx, n in json.loads(b).items():
+        merged[idx] = merged.get(idx, 0) + n
+    return json.dumps(merged)
+
+
+class _Cell:
+    __slots__ = ('count', 'timed', 'sum_ms', 'min_ms', 'max_ms', 'buckets')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.timed = 0
+        self.sum_ms = 0.0
+        self.min_ms: Optional[float] = None
+        self.max_ms: Optional[float] = None
+        self.buckets: Dict[int, int] = {}
+
+    def add(self, duration_ms: Optional[float]) -> None:
+        self.count += 1
+        if duration_ms is None:
+            return
+        self.timed += 1
+        self.sum_ms += duration_ms
+        self.min_ms = duration_ms if self.min_ms is None else min(self.min_ms, duration_ms)
+        self.max_ms = duration_ms if self.max_ms is None else max(self.max_ms, duration_ms)
+        idx = BUCKETS.index(duration_ms / 1000)
+        self.buckets[idx] = self.buckets.get(idx, 0) + 1
+
+    def row(self, key: Tuple[str, int, str]) -> Tuple:
+        return (*key, self.count, self.timed, self.sum_ms, self.min_ms, self.max_ms, json.dumps(self.buckets))
+
+
+def connect(db_path: Path = DB_PATH) -> sqlite3.Connection:
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(db_path)
+    con.executescript(SCHEMA)
+    con.create_function('merge_buckets', 2, _merge_buckets, deterministic=True)
+    return con
+
+
+def _day_of(path: Path) -> Optional[date]:
+    try:
+        return date.fromisoformat(path.stem)
+    except ValueError:
+        return None
+
+
+def rollup_day(path: Path) -> Tuple[int, Dict[str, Dict[Tuple[str, int, str], _Cell]]]:
+    """Read one daily file and return ``(records, {resolution: {key: cell}})``."""
+
+    cells: Dict[str, Dict[Tuple[str, int, str], _Cell]] = {name: {} for name in TABLES}
+    records = 0
+    with path.open('r', encoding='utf-8') as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict):
+                continue
+            event_type, status = record.get('event_type'), record.get('status')
+            ts = parse_ts(record.get('ts'))
+            if not isinstance(event_type, str) or not isinstance(status, str) or ts is None:
+                continue
+            duration = record.get('duration_ms')
+            if not isinstance(duration, (int, float)) or isinstance(duration, bool):
+                duration = None
+            records += 1
+            for name, (_, width) in TABLES.items():
+                key = (event_type, int(ts // width * width), status)
+                cell = cells[name].get(key)
+                if cell is None:
+                    cell = cells[name][key] = _Cell()
+                cell.add(duration)
+    return records, cells
+
+
+def compact(
+    con: sqlite3.Connection,
+    base_dir: Path = METRICS_DIR,
+    *,
+    now: Optional[datetime] = None,
+    grace: timedelta = GRACE,
+    raw_days: int = RAW_RETENTION_DAYS,
+    minute_days: int = MINUTE_RETENTION_DAYS,
+    hour_days: int = HOUR_RETENTION_DAYS,
+) -> Dict[str, int]:
+    """Compact days that ended at least ``grace`` ago and are not yet in the store,
+    then apply retention. ``con`` comes from :func:`connect`."""
+
+    now = now or datetime.now(timezone.utc)
+    today = now.date()
+    done = {row[0] for row in con.execute('SELECT day FROM compacted_days')}
+    stats = {'days': 0, 'records': 0, 'raw_deleted': 0, 'rows_expired': 0}
+    for path in sorted(Path(base_dir).glob('*.json')):
+        day = _day_of(path)
+        if day is None or day >= today:
+            continue
+        ended = datetime.combine(day + timedelta(days=1), datetime.min.time(), timezone.utc)
+        if path.stem not in done and now >= ended + grace:
+            records, cells = rollup_day(path)
+            with con:
+                for name, (table, _) in TABLES.items():
+                    con.executemany(
+                        _UPSERT.format(table=table),
+                        (cell.row(key) for key, cell in cells[name].items()),
+                    )
+                con.execute(
+                    'INSERT INTO compacted_days VALUES (?,?,?)',
+                    (path.stem, records, datetime.now(timezone.utc).isoformat()),
+                )
+            done.add(path.stem)
+            stats['days'] += 1
+            stats['records'] += records
+        if path.stem in done and day < today - timedelta(days=raw_days):
+            path.unlink()
+            stats['raw_deleted'] += 1
+
+    midnight = datetime.combine(today, datetime.min.time(), timezone.utc).timestamp()
+    with con:
+        for table, days in (('rollup_minute', minute_days), ('rollup_hour', hour_days)):
+            cur = con.execute(f'DELETE FROM {table} WHERE ts < ?', (midnight - days * 86400,))
+            stats['rows_expired'] += cur.rowcount
+    return stats
+
+
+class MetricsStore:
+    """Query API over the rollup tables. Durations are in milliseconds."""
+
+    def __init__(self, con: sqlite3.Connection) -> None:
+        self.con = con
+
+    def _rows(
+        self,
+        columns: str,
+        event_type: str,
+        since: Optional[float],
+        until: Optional[float],
+        status: Optional[str],
+        resolution: Optional[str],
+    ) -> Iterable[Tuple]:
+        until = time.time() if until is None else until
+        since = 0.0 if since is None else since
+        if resolution is None:
+            resolution = 'minute' if until - since <= MINUTE_QUERY_MAX_S else 'hour'
+        table = TABLES[resolution][0]
+        sql = f'SELECT {columns} FROM {table} WHERE event_type = ? AND ts >= ? AND ts < ?'
+        params: List[object] = [event_type, int(since), until]
+        if status is not None:
+            sql += ' AND status = ?'
+            params.append(status)
+        return self.con.execute(sql, params)
+
+    def counts(
+        self,
+        event_type: str,
+        *,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        resolution: Optional[str] = None,
+    ) -> Dict[str, int]:
+        out: Dict[str, int] = {}
+        for status, count in self._rows('status, count', event_type, since, until, None, resolution):
+            out[status] = out.get(status, 0) + count
+        return out
+
+    def percentile(
+        self,
+        event_type: str,
+        q: float,
+        *,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        status: Optional[str] = None,
+        resolution: Optional[str] = None,
+    ) -> Optional[float]:
+        """Estimate duration quantile ``q`` in milliseconds, or ``None`` without data."""
+
+        merged: Dict[int, int] = {}
+        lo: Optional[float] = None
+        hi: Optional[float] = None
+        for buckets, min_ms, max_ms in self._rows(
+            'buckets, min_ms, max_ms', event_type, since, until, status, resolution
+        ):
+            for idx, n in json.loads(buckets).items():
+                merged[int(idx)] = merged.get(int(idx), 0) + n
+            if min_ms is not None:
+                lo = min_ms if lo is None else min(lo, min_ms)
+                hi = max_ms if hi is None else max(hi, max_ms)
+        estimate = BUCKETS.quantile(merged, q)
+        if estimate is None:
+            return None
+        return min(max(estimate * 1000, lo), hi)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Compact and query metrics rollups')
+    parser.add_argument('--db-path', type=Path, default=DB_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+    c = sub.add_parser('compact', help='fold completed days into the store and apply retention')
+    c.add_argument('--metrics-dir', type=Path, default=METRICS_DIR)
+    c.add_argument('--grace-minutes', type=float, default=GRACE.total_seconds() / 60)
+    c.add_argument('--raw-days', type=int, default=RAW_RETENTION_DAYS)
+    c.add_argument('--minute-days', type=int, default=MINUTE_RETENTION_DAYS)
+    c.add_argument('--hour-days', type=int, default=HOUR_RETENTION_DAYS)
+    p = sub.add_parser('percentile', help='print a duration percentile in milliseconds')
+    p.add_argument('event_type')
+    p.add_argument('q', type=float)
+    p.add_argument('--days', type=float, default=30)
+    p.add_argument('--status')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    con = connect(args.db_path)
+    try:
+        if args.command == 'compact':
+            stats = compact(
+                con,
+                args.metrics_dir,
+                grace=timedelta(minutes=args.grace_minutes),
+                raw_days=args.raw_days,
+                minute_days=args.minute_days,
+                hour_days=args.hour_days,
+            )
+            print(json.dumps(stats))
+        else:
+            value = MetricsStore(con).percentile(
+                args.event_type, args.q, since=time.time() - args.days * 86400, status=args.status
+            )
+            print('no data' if value is None else round(value, 1))
+    finally:
+        con.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -2,35 +2,68 @@
 
 This script maintains a contentless FTS5 index for fast search over issue metadata. It
 tracks file modification times to update only changed records, drastically reducing
-rebuild time for large datasets. The index is optimized using FTS5 merge operations and
-an `automerge` configuration. After updates, an integrity check validates index health.
+rebuild time for large datasets. FTS5 `automerge` merges small segments as they are
+written; after updates `fts_maintenance.py` runs bounded merges, or a full `optimize`
+once the index is fragmented. An integrity check then validates index health;
+the cheap `quick` tier runs by default (see `integrity.py`).
+
+With ``--shadow`` the build goes into a new index generation that is verified
+and then swapped in atomically, so readers never see a half-built index (see
+``index_generations.py``). ``--rebuild`` does the same starting from an empty
+index.
 
 Usage:
-    python scripts/build_index.py [--batch-size N]
+    python scripts/build_index.py [--batch-size N] [--integrity-tier quick|sampled|full|none]
+    python scripts/build_index.py --shadow | --rebuild
+    python scripts/build_index.py --fts-maintenance optimize   # e.g. from a nightly job
 """
 
 from __future__ import annotations
 
 import argparse
+import hashlib
+import itertools
 import json
 import logging
 import os
 import sqlite3
+import sys
 import time
 import uuid
+from collections import Counter
+from dataclasses import asdict, replace
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import dedup
+import fts_maintenance
+import index_generations
+import index_stats
+import sqlite_profile
+from integrity import TIERS, run_check
+from issue_model import Issue, IssueValidationError
+from json_utils import read_json_bytes
+from memory_monitor import GovernorDecision, MemoryGovernor, MemoryMonitor, measure_bytes_per_doc
+from profiling import Profiler, add_profile_arguments
 
-from json_utils import load_json
-from memory_monitor import MemoryMonitor
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from monitoring.metrics_collector import MetricsCollector  # noqa: E402
+from monitoring.registry import REGISTRY  # noqa: E402
 
 
 ROOT = Path('issuesdb')
 DB = ROOT / 'issues.sqlite'
 SQL = Path('issues_index.sql')
 STATE = ROOT / 'index_state.json'
+# (source, language) a shard build is limited to; set by shards.py.
+PARTITION: Optional[Tuple[str, str]] = None
 
 LOG_INTERVAL = 5000
+CALIBRATION_SAMPLE = 20
+
+BATCH_SECONDS = REGISTRY.histogram('index_batch_seconds', 'Seconds spent indexing one batch', ('op',))
+DOCS_INDEXED = REGISTRY.counter('index_documents_total', 'Documents written to or removed from the index', ('op',))
+FTS_MAINTENANCE = REGISTRY.counter('fts_maintenance_total', 'FTS merge/optimize decisions', ('action', 'reason'))
 
 
 def get_logger(correlation_id: str) -> logging.LoggerAdapter:
@@ -45,8 +78,11 @@ def get_logger(correlation_id: str) -> logging.LoggerAdapter:
 
 
 def iter_issue_files() -> Iterable[Path]:
-    """Yield all JSON issue files lazily."""
+    """Yield all JSON issue files (of ``PARTITION`` only, when set) lazily."""
 
+    if PARTITION is not None:
+        source, language = PARTITION
+        return (ROOT / 'issues' / source / language).glob('*.json')
     return (ROOT / 'issues').glob('*/*/*.json')
 
 
@@ -60,14 +96,71 @@ def save_state(state: Dict[str, int]) -> None:
     STATE.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding='utf-8')
 
 
-def upsert_issue(cur: sqlite3.Cursor, doc: Dict[str, object]) -> None:
+def governor_state_path() -> Path:
+    return STATE.with_suffix('.governor.json')
+
+
+def load_bytes_per_doc() -> Optional[float]:
+    """Return the memory governor's estimate persisted by the last build, if any."""
+
+    try:
+        value = json.loads(governor_state_path().read_text(encoding='utf-8'))['bytes_per_doc']
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return float(value) if isinstance(value, (int, float)) and value > 0 else None
+
+
+def save_bytes_per_doc(bytes_per_doc: float) -> None:
+    if bytes_per_doc > 0:
+        governor_state_path().write_text(json.dumps({'bytes_per_doc': round(bytes_per_doc, 1)}), encoding='utf-8')
+
+
+def has_changes(state: Dict[str, int]) -> bool:
+    """Stat-only scan: True if any issue file was added, changed or removed since ``state``."""
+
+    seen = 0
+    for path in iter_issue_files():
+        if state.get(str(path.relative_to(ROOT))) != int(path.stat().st_mtime_ns):
+            return True
+        seen += 1
+    return seen != len(state)
+
+
+def ensure_schema(cur: sqlite3.Cursor) -> None:
+    """Apply the schema and migrate columns added after an index was created."""
+
+    cur.executescript(SQL.read_text(encoding='utf-8'))
+    columns = {row[1] for row in cur.execute('PRAGMA table_info(issues)')}
+    if 'content_hash' not in columns:
+        cur.execute('ALTER TABLE issues ADD COLUMN content_hash TEXT')
+
+
+def content_hash(raw: bytes) -> str:
+    """Hash of the raw issue file, compared by the reconcile check."""
+
+    return hashlib.sha1(raw).hexdigest()
+
+
+def load_issue(path: Path) -> Tuple[Issue, str]:
+    raw = read_json_bytes(path)
+    try:
+        return Issue.from_json(raw), content_hash(raw)
+    except IssueValidationError as exc:
+        raise IssueValidationError(f'{path}: {exc}') from exc
+
+
+def upsert_issue(cur: sqlite3.Cursor, issue: Issue, digest: Optional[str] = None) -> None:
     cur.execute(
         """
         INSERT INTO issues(
             issue_id,source,source_rule_id,language,title,summary,fix_steps,
-            severity,confidence,taxonomy_json,frequency,metadata_json,updated_at
-        ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
+            severity,confidence,taxonomy_json,frequency,metadata_json,updated_at,
+            content_hash
+        ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)
         ON CONFLICT(issue_id) DO UPDATE SET
+            source=excluded.source,
+            source_rule_id=excluded.source_rule_id,
+            language=excluded.language,
             title=excluded.title,
             summary=excluded.summary,
             fix_steps=excluded.fix_steps,
@@ -76,45 +169,23 @@ def upsert_issue(cur: sqlite3.Cursor, doc: Dict[str, object]) -> None:
             frequency=excluded.frequency,
             taxonomy_json=excluded.taxonomy_json,
             metadata_json=excluded.metadata_json,
-            updated_at=excluded.updated_at
+            updated_at=excluded.updated_at,
+            content_hash=excluded.content_hash
         """,
-        (
-            doc['issue_id'],
-            doc['source'],
-            doc.get('source_rule_id'),
-            doc.get('language'),
-            doc['title'],
-            doc.get('summary'),
-            doc.get('fix_steps'),
-            doc.get('severity'),
-            doc.get('confidence'),
-            json.dumps(doc.get('taxonomy', {}), ensure_ascii=False),
-            doc.get('frequency'),
-            json.dumps(doc.get('metadata', {}), ensure_ascii=False),
-            doc.get('updated_at'),
-        ),
+        issue.db_row(digest),
+    )
+    cur.execute('DELETE FROM signals WHERE issue_id=?', (issue.issue_id,))
+    cur.executemany('INSERT INTO signals(issue_id,kind,value) VALUES(?,?,?)', issue.signal_rows())
+    cur.execute('DELETE FROM references_web WHERE issue_id=?', (issue.issue_id,))
+    cur.executemany(
+        'INSERT INTO references_web(issue_id,label,url,license) VALUES(?,?,?,?)',
+        issue.reference_rows(),
     )
-    cur.execute('DELETE FROM signals WHERE issue_id=?', (doc['issue_id'],))
-    for s in doc.get('signals', []):
-        cur.execute(
-            'INSERT INTO signals(issue_id,kind,value) VALUES(?,?,?)',
-            (doc['issue_id'], s['kind'], s['value']),
-        )
-    cur.execute('DELETE FROM references_web WHERE issue_id=?', (doc['issue_id'],))
-    for r in doc.get('references', []):
-        cur.execute(
-            'INSERT INTO references_web(issue_id,label,url,license) VALUES(?,?,?,?)',
-            (doc['issue_id'], r['label'], r['url'], r.get('license')),
-        )
 
 
-def update_fts(cur: sqlite3.Cursor, issue_id: str) -> None:
-    row = cur.execute('SELECT rowid FROM issues WHERE issue_id=?', (issue_id,)).fetchone()
-    if not row:
-        return
-    cur.execute(
-        """
-        INSERT INTO fts_issues(rowid,title,summary,fix_steps,signals_concat,language)
+# Column values of an indexed issue as fed to the contentless FTS table. The same
+# expression is used to insert and to 'delete', which must repeat the original values.
+FTS_ROW_SQL = """
         SELECT rowid,
                title,
                COALESCE(summary,''),
@@ -124,29 +195,135 @@ def update_fts(cur: sqlite3.Cursor, issue_id: str) -> None:
                COALESCE(language,'')
         FROM issues i
         WHERE issue_id=?
-        """,
-        (issue_id,),
+"""
+
+
+def fts_rows(cur: sqlite3.Cursor, issue_ids: Iterable[str]) -> List[Tuple]:
+    """FTS column values of the indexed issues among ``issue_ids``, in rowid order.
+
+    FTS5 flushes its pending postings into a new segment whenever a write's rowid
+    is not above the previous one. Writing a batch in rowid order, all deletes and
+    then all inserts, makes one or two segments instead of one per issue.
+    """
+
+    rows = [cur.execute(FTS_ROW_SQL, (issue_id,)).fetchone() for issue_id in issue_ids]
+    return sorted((r for r in rows if r), key=lambda r: r[0])
+
+
+def update_fts(cur: sqlite3.Cursor, issue_ids: Iterable[str]) -> None:
+    cur.executemany(
+        'INSERT INTO fts_issues(rowid,title,summary,fix_steps,signals_concat,language) VALUES(?,?,?,?,?,?)',
+        fts_rows(cur, issue_ids),
     )
 
 
-def delete_issue(cur: sqlite3.Cursor, issue_id: str) -> None:
-    row = cur.execute('SELECT rowid FROM issues WHERE issue_id=?', (issue_id,)).fetchone()
-    if not row:
-        return
-    cur.execute(
-        "INSERT INTO fts_issues(fts_issues, rowid) VALUES('delete', ?)",
-        (row[0],),
+def delete_fts(cur: sqlite3.Cursor, issue_ids: Iterable[str]) -> None:
+    """Remove the FTS postings of the currently indexed versions of ``issue_ids``."""
+
+    cur.executemany(
+        'INSERT INTO fts_issues(fts_issues,rowid,title,summary,fix_steps,signals_concat,language)'
+        " VALUES('delete',?,?,?,?,?,?)",
+        fts_rows(cur, issue_ids),
     )
+
+
+def delete_issue(cur: sqlite3.Cursor, issue_id: str) -> None:
+    """Remove an issue's rows; its FTS postings go first, through ``delete_fts``."""
+
+    dedup.remove_issue(cur, issue_id)
     cur.execute('DELETE FROM signals WHERE issue_id=?', (issue_id,))
     cur.execute('DELETE FROM references_web WHERE issue_id=?', (issue_id,))
     cur.execute('DELETE FROM issues WHERE issue_id=?', (issue_id,))
 
 
+def reindex(
+    db_path: Path,
+    paths: Iterable[Path],
+    removed_ids: Iterable[str],
+    *,
+    batch_size: int = 1000,
+    root: Optional[Path] = None,
+    state_path: Optional[Path] = None,
+) -> Tuple[int, int]:
+    """Feed just the given files and deletions into the incremental indexer.
+
+    Used to repair drift found by the reconcile check. When ``state_path`` is set the
+    mtimes of re-indexed files (keys relative to ``root``) are recorded so the next
+    regular build skips them. A generational index is repaired in a shadow
+    generation that is published after a ``quick`` check. Returns ``(updated, removed)``.
+    """
+
+    shadow = index_generations.new_shadow(db_path) if index_generations.is_managed(db_path) else None
+    con = sqlite3.connect(shadow or db_path)
+    sqlite_profile.apply_build(con)
+    cur = con.cursor()
+    ensure_schema(cur)
+    con.commit()
+    updated = 0
+    mtimes: Dict[str, int] = {}
+    removed = 0
+    gone: Set[str] = set()
+    try:
+        batch: Batch = []
+        for path in paths:
+            batch.append(load_issue(path))
+            updated += 1
+            if root is not None:
+                mtimes[str(path.relative_to(root))] = int(path.stat().st_mtime_ns)
+            if len(batch) >= batch_size:
+                process_batch(con, cur, batch)
+                batch.clear()
+        if batch:
+            process_batch(con, cur, batch)
+        ids = iter(removed_ids)
+        while chunk := list(itertools.islice(ids, batch_size)):
+            delete_batch(con, cur, chunk)
+            removed += len(chunk)
+            if state_path is not None:
+                gone.update(chunk)
+        if shadow is not None:
+            run_check(con, 'quick', budget_seconds=0)
+    finally:
+        con.close()
+    if shadow is not None:
+        index_generations.publish(db_path, shadow)
+    if state_path is not None and state_path.exists():
+        state = json.loads(state_path.read_text(encoding='utf-8'))
+        state = {k: v for k, v in state.items() if Path(k).stem not in gone}
+        state.update(mtimes)
+        state_path.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding='utf-8')
+    return updated, removed
+
+
 def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     ap = argparse.ArgumentParser()
     ap.add_argument('--batch-size', type=int, default=1000)
     ap.add_argument('--memory-warn-mb', type=int)
     ap.add_argument('--memory-limit-mb', type=int)
+    ap.add_argument('--integrity-tier', choices=('none',) + TIERS, default='quick')
+    ap.add_argument(
+        '--serving-snapshot',
+        type=Path,
+        help='after a build, VACUUM INTO this read-optimized copy for search (see sqlite_profile.py)',
+    )
+    ap.add_argument(
+        '--shadow',
+        action='store_true',
+        help='build into a new generation and swap it in atomically (see index_generations.py)',
+    )
+    ap.add_argument('--rebuild', action='store_true', help='like --shadow, but start from an empty index')
+    ap.add_argument(
+        '--fts-maintenance',
+        choices=fts_maintenance.MODES,
+        default='auto',
+        help='auto: bounded merges, optimize when fragmented (see fts_maintenance.py)',
+    )
+    ap.add_argument(
+        '--maintenance-window',
+        metavar='START-END',
+        help='local hours in which auto mode optimizes any fragmentation, e.g. 2-5',
+    )
+    add_profile_arguments(ap)
     args = ap.parse_args(argv)
     if not 1 <= args.batch_size <= 10000:
         raise ValueError('--batch-size must be between 1 and 10000')
@@ -160,115 +337,346 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
         val = getattr(args, name)
         if val is not None and val <= 0:
             raise ValueError(f'--{name.replace("_", "-")} must be positive')
+    if args.maintenance_window:
+        try:
+            start, end = (int(h) for h in args.maintenance_window.split('-'))
+        except ValueError as exc:
+            raise ValueError('--maintenance-window must look like START-END, e.g. 2-5') from exc
+        if not (0 <= start <= 23 and 0 <= end <= 24):
+            raise ValueError('--maintenance-window hours must be between 0 and 24')
+        args.maintenance_window = (start, end)
     return args
 
 
-def check_integrity(cur: sqlite3.Cursor) -> None:
-    """Validate FTS index and main database integrity."""
+def metrics_collector() -> MetricsCollector:
+    """Return a collector writing next to the index root (``metrics/daily``)."""
+
+    return MetricsCollector(ROOT.parent / 'metrics' / 'daily')
+
+
+def write_snapshot(dest: Path, logger: logging.LoggerAdapter, profiler: Profiler) -> None:
+    with profiler.stage('snapshot'):
+        started = time.perf_counter()
+        sqlite_profile.snapshot(DB, dest)
+    logger.info('serving snapshot path=%s seconds=%s', dest, round(time.perf_counter() - started, 2))
+
+
+def report_up_to_date(
+    args: argparse.Namespace,
+    start: float,
+    cid: str,
+    logger: logging.LoggerAdapter,
+    metrics: MetricsCollector,
+    profiler: Profiler,
+) -> None:
+    logger.info('index up-to-date seconds=%s', round(time.time() - start, 2))
+    metrics.record('build_index', 'up_to_date', duration_ms=round((time.time() - start) * 1000), cid=cid)
+    if args.serving_snapshot and not args.serving_snapshot.exists():
+        write_snapshot(args.serving_snapshot, logger, profiler)
+    REGISTRY.export(metrics, cid)
+
+
+def maintain_fts(
+    con: sqlite3.Connection,
+    changed: int,
+    indexed: int,
+    args: argparse.Namespace,
+    logger: logging.LoggerAdapter,
+    metrics: MetricsCollector,
+    cid: str,
+) -> None:
+    """Merge or optimize ``fts_issues`` as ``fts_maintenance`` decides, and record it."""
+
+    policy = replace(fts_maintenance.DEFAULT_POLICY, window=args.maintenance_window)
+    outcome = fts_maintenance.run(con, changed, indexed, policy, mode=args.fts_maintenance)
+    FTS_MAINTENANCE.inc(action=outcome.action, reason=outcome.reason)
+    metrics.record(
+        'fts_maintenance',
+        outcome.action,
+        duration_ms=round(outcome.seconds * 1000),
+        details={
+            'reason': outcome.reason,
+            'segments_before': outcome.segments_before,
+            'segments_after': outcome.segments_after,
+            'levels': outcome.levels,
+            'merge_steps': outcome.merge_steps,
+        },
+        cid=cid,
+    )
+    logger.info(
+        'fts maintenance action=%s reason=%s segments=%s->%s seconds=%s',
+        outcome.action,
+        outcome.reason,
+        outcome.segments_before,
+        outcome.segments_after,
+        round(outcome.seconds, 3),
+    )
 
-    cur.execute("INSERT INTO fts_issues(fts_issues) VALUES('integrity-check')")
-    if cur.fetchall():
-        raise RuntimeError('fts_issues integrity check failed')
-    if cur.execute('PRAGMA integrity_check').fetchone()[0] != 'ok':
-        raise RuntimeError('database integrity check failed')
 
+def check_integrity(
+    con: sqlite3.Connection,
+    tier: str,
+    logger: logging.LoggerAdapter,
+    cid: str,
+) -> None:
+    """Validate index health with the given tier and record its timing."""
 
-def process_batch(con: sqlite3.Connection, cur: sqlite3.Cursor, batch: List[Dict[str, object]]) -> None:
-    con.execute('BEGIN')
-    for doc in batch:
-        upsert_issue(cur, doc)
-        update_fts(cur, doc['issue_id'])
-    con.commit()
+    if tier == 'none':
+        return
+    metrics = metrics_collector()
+    try:
+        # No budget: a timeout here would discard a build whose batches are already committed.
+        result = run_check(con, tier, budget_seconds=0)
+    except Exception as exc:
+        metrics.record('index_integrity', 'failure', details={'tier': tier, 'error': str(exc)}, cid=cid)
+        raise
+    metrics.record(
+        'index_integrity',
+        'success',
+        duration_ms=round(result.seconds * 1000),
+        details={'tier': tier, 'samples': result.samples},
+        cid=cid,
+    )
+    logger.info('integrity check tier=%s seconds=%s', tier, round(result.seconds, 3))
 
 
-def main(argv: Optional[List[str]] = None) -> None:
-    args = parse_args(argv or [])
+Batch = List[Tuple[Issue, Optional[str]]]
 
-    cid = uuid.uuid4().hex[:8]
-    logger = get_logger(cid)
-    total_files = sum(1 for _ in iter_issue_files())
-    projected_mb = total_files * args.batch_size
-    if args.memory_limit_mb and projected_mb > args.memory_limit_mb:
-        raise SystemExit(
-            f'projected memory {projected_mb}MB exceeds limit {args.memory_limit_mb}MB'
-        )
+
+def process_batch(con: sqlite3.Connection, cur: sqlite3.Cursor, batch: Batch) -> None:
+    """Index ``(issue, content_hash)`` pairs in a single transaction."""
+
+    # The last file wins when two carry the same issue_id.
+    latest = {issue.issue_id: (issue, digest) for issue, digest in batch}
+    with BATCH_SECONDS.time(op='upsert'):
+        con.execute('BEGIN')
+        delta: Counter = Counter()
+        for issue_id in latest:
+            delta.subtract(index_stats.row_contributions(cur, issue_id))
+        delete_fts(cur, latest)
+        for issue, digest in latest.values():
+            upsert_issue(cur, issue, digest)
+        update_fts(cur, latest)
+        for issue, _ in latest.values():
+            dedup.sign_issue(cur, issue.issue_id, dedup.issue_text(issue))
+            delta.update(index_stats.doc_contributions(issue))
+        index_stats.apply_delta(cur, delta)
+        con.commit()
+    DOCS_INDEXED.inc(len(batch), op='upsert')
+
+
+def delete_batch(con: sqlite3.Connection, cur: sqlite3.Cursor, issue_ids: Iterable[str]) -> None:
+    ids = list(dict.fromkeys(issue_ids))
+    n = len(ids)
+    with BATCH_SECONDS.time(op='delete'):
+        con.execute('BEGIN')
+        delta: Counter = Counter()
+        for issue_id in ids:
+            delta.subtract(index_stats.row_contributions(cur, issue_id))
+        delete_fts(cur, ids)
+        for issue_id in ids:
+            delete_issue(cur, issue_id)
+        index_stats.apply_delta(cur, delta)
+        con.commit()
+    DOCS_INDEXED.inc(n, op='delete')
+
+
+def _calibration_sample() -> List[Tuple[Issue, int]]:
+    sample = []
+    for path in itertools.islice(iter_issue_files(), CALIBRATION_SAMPLE):
+        issue, _ = load_issue(path)
+        sample.append((issue, path.stat().st_size))
+    return sample
+
+
+def make_governor(
+    args: argparse.Namespace,
+    logger: logging.LoggerAdapter,
+    metrics: MetricsCollector,
+    cid: str,
+) -> MemoryGovernor:
+    """Build the memory governor from the last build's estimate.
+
+    Only the first build (or one whose estimate was lost) calibrates on a sample
+    of issue files; later builds refine the persisted estimate from full batches.
+    """
+
+    monitor = MemoryMonitor(args.memory_warn_mb, args.memory_limit_mb)
+
+    def on_decision(decision: GovernorDecision) -> None:
+        if decision.action == 'shrink_limit':
+            logger.warning(
+                'memory limit exceeded rss_mb=%s limit_mb=%s reducing batch_size=%s',
+                decision.rss_mb,
+                monitor.limit_mb,
+                decision.batch_size,
+            )
+        else:
+            logger.log(
+                logging.INFO if decision.action == 'grow' else logging.WARNING,
+                'memory governor action=%s rss_mb=%s bytes_per_doc=%s batch_size=%s',
+                decision.action,
+                decision.rss_mb,
+                decision.bytes_per_doc,
+                decision.batch_size,
+            )
+        metrics.record('memory_governor', decision.action, details=asdict(decision), cid=cid)
+
+    governor = MemoryGovernor(monitor, args.batch_size, on_decision=on_decision)
+    per_doc = load_bytes_per_doc() or measure_bytes_per_doc(_calibration_sample)
+    if per_doc:
+        governor.observe(per_doc)
+    projected_mb = round(governor.projected_mb(), 1)
     if args.memory_warn_mb and projected_mb > args.memory_warn_mb:
         logger.warning(
             'projected memory usage projected_mb=%s warn_mb=%s',
             projected_mb,
             args.memory_warn_mb,
         )
-    logger.info('total issue files=%s projected_mb=%s', total_files, projected_mb)
+    governor.clamp()
+    logger.info(
+        'memory governor rss_mb=%s bytes_per_doc=%s projected_mb=%s batch_size=%s target_mb=%s',
+        round(governor.rss_mb, 1),
+        round(governor.bytes_per_doc, 1),
+        projected_mb,
+        governor.batch_size,
+        governor.high_mb,
+    )
+    return governor
+
 
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv or [])
+
+    cid = uuid.uuid4().hex[:8]
+    logger = get_logger(cid)
+    metrics = metrics_collector()
+    with Profiler.from_args('build_index', cid, args) as profiler:
+        build(args, cid, logger, metrics, profiler)
+
+
+def build(
+    args: argparse.Namespace,
+    cid: str,
+    logger: logging.LoggerAdapter,
+    metrics: MetricsCollector,
+    profiler: Profiler,
+) -> None:
     start = time.time()
-    state = load_state()
+    state = {} if args.rebuild else load_state()
+    db = DB
+    shadow: Optional[Path] = None
+    if args.shadow or args.rebuild or index_generations.is_managed(DB):
+        # A stat pass first, so an up-to-date index is not copied for nothing.
+        if not args.rebuild and args.fts_maintenance != 'optimize' and DB.exists() and not has_changes(state):
+            report_up_to_date(args, start, cid, logger, metrics, profiler)
+            return
+        with profiler.stage('shadow'):
+            shadow = db = index_generations.new_shadow(DB, fresh=args.rebuild)
+        logger.info('shadow build path=%s', shadow)
     removed_keys = set(state.keys())
     new_state: Dict[str, int] = {}
     total = 0
     changed = 0
 
-    monitor = MemoryMonitor(args.memory_warn_mb, args.memory_limit_mb)
+    governor = make_governor(args, logger, metrics, cid)
 
-    con = sqlite3.connect(DB)
+    con = sqlite3.connect(db)
+    sqlite_profile.apply_build(con)
+    profiler.trace(con)
     cur = con.cursor()
-    cur.executescript(SQL.read_text(encoding='utf-8'))
+    ensure_schema(cur)
     cur.execute('PRAGMA journal_mode=WAL;')
     cur.execute("INSERT INTO fts_issues(fts_issues, rank) VALUES('automerge', 4)")
+    if index_stats.needs_backfill(cur):
+        index_stats.rebuild(cur)
+    if dedup.needs_backfill(cur):
+        with profiler.stage('dedup_backfill'):
+            logger.info('dedup backfill signed=%s', dedup.backfill(cur))
     con.commit()
 
-    batch: List[Dict[str, object]] = []
-    for path in iter_issue_files():
-        total += 1
-        mtime = int(path.stat().st_mtime_ns)
-        key = str(path.relative_to(ROOT))
-        new_state[key] = mtime
-        removed_keys.discard(key)
-        if state.get(key) != mtime:
-            doc = load_json(path)
-            batch.append(doc)
-            changed += 1
-            if len(batch) >= args.batch_size:
+    batch: Batch = []
+    batch_bytes = 0
+    with governor:
+        rss_before = governor.rss_mb
+        for path in iter_issue_files():
+            total += 1
+            st = path.stat()
+            mtime = int(st.st_mtime_ns)
+            key = str(path.relative_to(ROOT))
+            new_state[key] = mtime
+            removed_keys.discard(key)
+            if state.get(key) != mtime:
+                with profiler.stage('load'):
+                    batch.append(load_issue(path))
+                batch_bytes += st.st_size
+                changed += 1
+                if len(batch) >= governor.batch_size or governor.over_limit:
+                    governor.observe_batch(len(batch), batch_bytes, rss_before)
+                    with profiler.stage('index'):
+                        process_batch(con, cur, batch)
+                    batch.clear()
+                    batch_bytes = 0
+                    governor.adjust()
+                    rss_before = governor.rss_mb
+            if total % LOG_INTERVAL == 0:
+                rss = governor.rss_mb
+                level = logging.INFO
+                if args.memory_warn_mb and rss >= args.memory_warn_mb:
+                    level = logging.WARNING
+                logger.log(level, 'memory rss_mb=%s batch_size=%s', round(rss, 1), governor.batch_size)
+        if batch:
+            with profiler.stage('index'):
                 process_batch(con, cur, batch)
-                batch.clear()
-        if total % LOG_INTERVAL == 0:
-            rss = monitor.rss_mb()
-            level = logging.INFO
-            if monitor.warn_mb and rss >= monitor.warn_mb:
-                level = logging.WARNING
-            logger.log(level, 'memory rss_mb=%s batch_size=%s', round(rss, 1), args.batch_size)
-            if monitor.limit_mb and rss >= monitor.limit_mb:
-                args.batch_size = max(1, args.batch_size // 2)
-                logger.warning(
-                    'memory limit exceeded rss_mb=%s limit_mb=%s reducing batch_size=%s',
-                    round(rss, 1),
-                    monitor.limit_mb,
-                    args.batch_size,
-                )
-    if batch:
-        process_batch(con, cur, batch)
-        batch.clear()
+            batch.clear()
+    metrics.record(
+        'memory_governor',
+        'summary',
+        details={
+            'peak_rss_mb': round(governor.peak_rss_mb, 1),
+            'bytes_per_doc': round(governor.bytes_per_doc, 1),
+            'batch_size': governor.batch_size,
+        },
+        cid=cid,
+    )
 
     removed = list(removed_keys)
     logger.info('scan complete total=%s changed=%s removed=%s', total, changed, len(removed))
-    if not changed and not removed and DB.exists():
+    if not changed and not removed and DB.exists() and args.fts_maintenance != 'optimize':
         con.close()
-        logger.info('index up-to-date seconds=%s', round(time.time() - start, 2))
+        if shadow is not None:
+            index_generations.discard(shadow)
+        report_up_to_date(args, start, cid, logger, metrics, profiler)
         return
 
     if removed:
-        con.execute('BEGIN')
-        for key in removed:
-            delete_issue(cur, Path(key).stem)
-        con.commit()
+        with profiler.stage('delete'):
+            delete_batch(con, cur, (Path(key).stem for key in removed))
 
     con.execute('BEGIN')
-    cur.execute("INSERT INTO fts_issues(fts_issues, rank) VALUES('merge', 16)")
-    cur.execute("INSERT INTO fts_issues(fts_issues) VALUES('optimize')")
-    check_integrity(cur)
+    with profiler.stage('optimize'):
+        maintain_fts(con, changed + len(removed), total, args, logger, metrics, cid)
+    with profiler.stage('integrity'):
+        check_integrity(con, args.integrity_tier, logger, cid)
     con.commit()
     con.close()
 
+    if shadow is not None:
+        with profiler.stage('publish'):
+            index_generations.publish(DB, shadow)
+        logger.info('published generation path=%s', shadow)
     save_state(new_state)
+    save_bytes_per_doc(governor.bytes_per_doc)
+    if args.serving_snapshot:
+        write_snapshot(args.serving_snapshot, logger, profiler)
+    metrics.record(
+        'build_index',
+        'ok',
+        duration_ms=round((time.time() - start) * 1000),
+        details={'total': total, 'updated': changed, 'removed': len(removed)},
+        cid=cid,
+    )
+    REGISTRY.export(metrics, cid)
     logger.info(
         'index build complete updated=%s removed=%s seconds=%s',
         changed,
@@ -278,5 +686,5 @@ def main(argv: Optional[List[str]] = None) -> None:
 
 
 if __name__ == '__main__':
-    main()
+    main(sys.argv[1:])
 
@@ -5,42 +5,57 @@ import json
 import logging
 import os
 import sqlite3
+import sys
+import tempfile
+import time
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Optional
 
-from monitoring.alert_manager import AlertManager
-from monitoring.metrics_collector import MetricsCollector
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from monitoring.alert_manager import AlertManager  # noqa: E402
+from monitoring.metrics_collector import MetricsCollector  # noqa: E402
+
+import build_index  # noqa: E402
+from integrity import TIERS, CheckResult, CheckTimeout, run_check  # noqa: E402
+from reconcile import reconcile  # noqa: E402
+import sqlite_profile  # noqa: E402
 
 logger = logging.getLogger(__name__)
 
 HEALTH_STATUS_PATH = Path('metrics/health_status.json')
+RECONCILE_STATUS_PATH = Path('metrics/reconcile_status.json')
 
 
-def check_fts5_integrity(db_path: Path) -> None:
+def run_health_check(
+    db_path: Path,
+    tier: str = 'full',
+    *,
+    budget_seconds: Optional[float] = None,
+    sample_size: Optional[int] = None,
+) -> CheckResult:
     if not db_path.exists():
         raise FileNotFoundError(f'{db_path} does not exist')
     con = sqlite3.connect(db_path)
     try:
-        cur = con.cursor()
-        try:
-            cur.execute("INSERT INTO fts_issues(fts_issues) VALUES('integrity-check')")
-            if cur.fetchall():
-                raise RuntimeError('fts_issues integrity check failed')
-            if cur.execute('PRAGMA integrity_check').fetchone()[0] != 'ok':
-                raise RuntimeError('database integrity check failed')
-        except sqlite3.DatabaseError as exc:
-            raise RuntimeError(str(exc)) from exc
+        sqlite_profile.apply_reader(con, query_only=False)
+        kwargs = {} if sample_size is None else {'sample_size': sample_size}
+        return run_check(con, tier, budget_seconds=budget_seconds, **kwargs)
     finally:
         con.close()
 
 
-def _write_status(data: dict) -> None:
-    HEALTH_STATUS_PATH.parent.mkdir(parents=True, exist_ok=True)
-    tmp = HEALTH_STATUS_PATH.with_suffix(HEALTH_STATUS_PATH.suffix + '.tmp')
+def check_fts5_integrity(db_path: Path) -> None:
+    run_health_check(db_path, 'full')
+
+
+def _write_status(data: dict, path: Optional[Path] = None) -> None:
+    path = path or HEALTH_STATUS_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + '.tmp')
     with tmp.open('w', encoding='utf-8') as fh:
         json.dump(data, fh, ensure_ascii=False)
-    tmp.replace(HEALTH_STATUS_PATH)
+    tmp.replace(path)
 
 
 def _should_skip(path: Path, interval_min: int) -> bool:
@@ -58,12 +73,72 @@ def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
     ap = argparse.ArgumentParser()
     ap.add_argument('--db-path', type=Path, default=Path('issuesdb/issues.sqlite'))
     ap.add_argument('--check-health', action='store_true')
-    return ap.parse_args(argv)
+    ap.add_argument('--tier', choices=TIERS, default='full')
+    ap.add_argument('--budget-seconds', type=float, help='abort the check after this long (0 disables)')
+    ap.add_argument('--sample-size', type=int)
+    ap.add_argument('--reconcile', action='store_true', help='compare issue files against the index')
+    ap.add_argument('--repair', action='store_true', help='re-index drift found by --reconcile')
+    ap.add_argument('--issues-dir', type=Path, default=Path('issuesdb/issues'))
+    args = ap.parse_args(argv)
+    if args.repair and not args.reconcile:
+        raise ValueError('--repair requires --reconcile')
+    if args.budget_seconds is not None and args.budget_seconds < 0:
+        raise ValueError('--budget-seconds must not be negative')
+    if args.sample_size is not None and args.sample_size <= 0:
+        raise ValueError('--sample-size must be positive')
+    return args
+
+
+def run_reconcile(args: argparse.Namespace, metrics: MetricsCollector) -> None:
+    if not args.db_path.exists():
+        raise FileNotFoundError(f'{args.db_path} does not exist')
+    start = time.monotonic()
+    with tempfile.TemporaryDirectory(prefix='reconcile-') as tmp:
+        # Only --repair needs the full drift set; it is streamed from disk, not held in memory.
+        spill = Path(tmp) / 'drift.tsv' if args.repair else None
+        con = sqlite_profile.connect_reader(args.db_path)
+        try:
+            report = reconcile(args.issues_dir, con, spill=spill)
+        finally:
+            con.close()
+        summary = report.summary()
+        status = 'ok' if report.ok else 'drift'
+        if args.repair and not report.ok:
+            updated, removed = build_index.reindex(
+                args.db_path,
+                (d.path for d in report.drift('missing', 'stale')),
+                (d.issue_id for d in report.drift('extra')),
+                root=args.issues_dir.parent,
+                state_path=args.issues_dir.parent / 'index_state.json',
+            )
+            summary['repaired'] = {'updated': updated, 'removed': removed}
+            # Re-indexing cannot pick between duplicate files; those need a person.
+            status = 'drift' if report.counts['duplicate'] else 'repaired'
+    duration_ms = round((time.monotonic() - start) * 1000)
+    metrics.record('reconcile', status, duration_ms=duration_ms, details=summary)
+    _write_status(
+        {'ts': datetime.now(timezone.utc).isoformat(), 'status': status, **summary},
+        RECONCILE_STATUS_PATH,
+    )
+    logger.info(
+        'reconcile status=%s files=%s indexed=%s missing=%s extra=%s stale=%s duplicate=%s',
+        status,
+        summary['files'],
+        summary['indexed'],
+        summary['missing'],
+        summary['extra'],
+        summary['stale'],
+        summary['duplicate'],
+    )
+    if status == 'drift':
+        raise SystemExit(1)
 
 
 def main(argv: Optional[list[str]] = None) -> None:
     args = parse_args(argv)
     logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    if args.reconcile:
+        run_reconcile(args, MetricsCollector())
     if not args.check_health:
         return
 
@@ -78,23 +153,46 @@ def main(argv: Optional[list[str]] = None) -> None:
         return
 
     try:
-        check_fts5_integrity(args.db_path)
+        result = run_health_check(
+            args.db_path,
+            args.tier,
+            budget_seconds=args.budget_seconds,
+            sample_size=args.sample_size,
+        )
+    except CheckTimeout as exc:
+        metrics.record('check_health', 'timeout', details={'tier': args.tier, 'error': str(exc)})
+        _write_status(
+            {
+                'ts': datetime.now(timezone.utc).isoformat(),
+                'status': 'timeout',
+                'tier': args.tier,
+                'message': str(exc),
+            }
+        )
+        logger.warning('health check timed out: %s', exc)
+        raise SystemExit(2)
     except Exception as exc:  # pragma: no cover - defensive
-        metrics.record('check_health', 'failure', details={'error': str(exc)})
+        metrics.record('check_health', 'failure', details={'tier': args.tier, 'error': str(exc)})
         alerts.critical(f'health check failed: {exc}')
         data = {
             'ts': datetime.now(timezone.utc).isoformat(),
             'status': 'error',
+            'tier': args.tier,
             'message': str(exc),
         }
         _write_status(data)
         logger.error('health check failed: %s', exc)
         raise SystemExit(1)
 
-    metrics.record('check_health', 'success')
-    data = {'ts': datetime.now(timezone.utc).isoformat(), 'status': 'ok'}
+    metrics.record(
+        'check_health',
+        'success',
+        duration_ms=round(result.seconds * 1000),
+        details={'tier': result.tier, 'samples': result.samples, **result.details},
+    )
+    data = {'ts': datetime.now(timezone.utc).isoformat(), 'status': 'ok', 'tier': result.tier}
     _write_status(data)
-    logger.info('database health OK')
+    logger.info('database health OK tier=%s seconds=%s', result.tier, round(result.seconds, 3))
 
 
 if __name__ == '__main__':
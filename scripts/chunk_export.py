@@ -1,11 +1,20 @@
-import json, pathlib
-from json_utils import load_json
+import argparse, pathlib, sys, time, uuid
+from issue_model import Issue
+from json_utils import dumps, load_json
+from profiling import Profiler, add_profile_arguments
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+from monitoring.metrics_collector import MetricsCollector  # noqa: E402
+from monitoring.registry import REGISTRY  # noqa: E402
 
 ROOT = pathlib.Path('issuesdb/issues')
-OUTD = pathlib.Path('exports'); OUTD.mkdir(parents=True, exist_ok=True)
+OUTD = pathlib.Path('exports')
 OUTF = OUTD / 'chunks.jsonl'
 MAX_CHARS = 1400
 
+DOC_SECONDS = REGISTRY.histogram('export_doc_seconds', 'Seconds to chunk and write one issue')
+EXPORTED = REGISTRY.counter('export_items_total', 'Exported issues and chunks', ('kind',))
+
 def chunks(text: str, max_chars=MAX_CHARS):
     if not text: return []
     text = text.strip()
@@ -26,32 +35,55 @@ def chunks(text: str, max_chars=MAX_CHARS):
 
 def iter_issues():
     for p in ROOT.glob('*/*/*.json'):
-        yield load_json(p)
-
-with OUTF.open('w', encoding='utf-8') as out:
-    for doc in iter_issues():
-        base_text = []
-        base_text.append(f"# {doc['title']}")
-        if doc.get('summary'): base_text.append(doc['summary'])
-        if doc.get('root_cause'): base_text.append('Root cause: ' + (doc.get('root_cause') or ''))
-        if doc.get('fix_steps'): base_text.append('Fix: ' + (doc.get('fix_steps') or ''))
-        body = '\n\n'.join([t for t in base_text if t])
-        sigs = [s['value'] for s in doc.get('signals', [])]
-        refs = [r['url'] for r in doc.get('references', [])]
-        for ix, ch in enumerate(chunks(body)):
-            rec = {
-                'id': f"{doc['issue_id']}:{ix}",
-                'doc_id': doc['issue_id'],
-                'chunk_ix': ix,
-                'text': ch,
-                'metadata': {
-                    'source': doc['source'],
-                    'language': doc.get('language'),
-                    'severity': doc.get('severity'),
-                    'signals': sigs,
-                    'references': refs,
-                    'updated_at': doc.get('updated_at')
+        yield Issue.from_dict(load_json(p))
+
+def export(outf=OUTF, profiler=None):
+    profiler = profiler or Profiler('chunk_export', '', enabled=False)
+    outf.parent.mkdir(parents=True, exist_ok=True)
+    n = 0
+    with outf.open('w', encoding='utf-8') as out:
+        for doc in iter_issues():
+            start = time.perf_counter()
+            base_text = []
+            base_text.append(f"# {doc.title}")
+            if doc.summary: base_text.append(doc.summary)
+            if doc.root_cause: base_text.append('Root cause: ' + doc.root_cause)
+            if doc.fix_steps: base_text.append('Fix: ' + doc.fix_steps)
+            body = '\n\n'.join([t for t in base_text if t])
+            sigs = [s.value for s in doc.signals]
+            refs = [r.url for r in doc.references]
+            with profiler.stage('chunk'):
+                parts = chunks(body)
+            for ix, ch in enumerate(parts):
+                rec = {
+                    'id': f"{doc.issue_id}:{ix}",
+                    'doc_id': doc.issue_id,
+                    'chunk_ix': ix,
+                    'text': ch,
+                    'metadata': {
+                        'source': doc.source,
+                        'language': doc.language,
+                        'severity': doc.severity,
+                        'signals': sigs,
+                        'references': refs,
+                        'updated_at': doc.updated_at
+                    }
                 }
-            }
-            out.write(json.dumps(rec, ensure_ascii=False) + '\n')
-print(f'Wrote {OUTF}')
+                out.write(dumps(rec) + '\n')
+            EXPORTED.inc(kind='issue'); EXPORTED.inc(len(parts), kind='chunk')
+            DOC_SECONDS.observe(time.perf_counter() - start)
+            n += 1
+    return n
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    add_profile_arguments(ap)
+    args = ap.parse_args(argv)
+    cid = uuid.uuid4().hex[:8]
+    with Profiler.from_args('chunk_export', cid, args) as profiler:
+        export(profiler=profiler)
+    REGISTRY.export(MetricsCollector(), cid)
+    print(f'Wrote {OUTF}')
+
+if __name__ == '__main__':
+    main()
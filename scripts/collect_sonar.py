@@ -2,8 +2,10 @@ import argparse
 import html
 import logging
 import re
+import sys
 import time
 import uuid
+from pathlib import Path
 from typing import Any, Dict, List, Optional
 from urllib.parse import urljoin, urlparse
 
@@ -11,10 +13,19 @@ import requests
 from requests.adapters import HTTPAdapter
 
 from emit_issue import sha1, write_issues_batch
+from issue_model import Issue, Reference, Signal
+from profiling import Profiler, add_profile_arguments
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from monitoring.metrics_collector import MetricsCollector  # noqa: E402
+from monitoring.registry import REGISTRY  # noqa: E402
 
 
 ALLOWED_LANGS = {'java', 'js', 'ts', 'py'}
 
+REQUEST_SECONDS = REGISTRY.histogram('sonar_request_seconds', 'Sonar API request latency in seconds')
+REQUESTS = REGISTRY.counter('sonar_requests_total', 'Sonar API request attempts by outcome', ('outcome',))
+
 
 def clean_html(s: str) -> str:
     if not s:
@@ -40,13 +51,29 @@ def fetch_with_retry(
     logger: logging.LoggerAdapter,
     max_attempts: int = 5,
     backoff_factor: float = 0.5,
+    metrics: Optional[MetricsCollector] = None,
 ) -> requests.Response:
     for attempt in range(1, max_attempts + 1):
+        start = time.perf_counter()
         try:
             resp = session.get(url, params=params, timeout=10)
+            REQUEST_SECONDS.observe(time.perf_counter() - start)
             resp.raise_for_status()
+            REQUESTS.inc(outcome='ok')
+            if metrics is not None:
+                metrics.record('collect', 'ok', duration_ms=round((time.perf_counter() - start) * 1000))
             return resp
         except requests.RequestException as exc:
+            status = getattr(exc.response, 'status_code', None)
+            outcome = 'rate_limited' if status == 429 else 'error'
+            REQUESTS.inc(outcome=outcome)
+            if metrics is not None:
+                metrics.record(
+                    'collect',
+                    outcome,
+                    duration_ms=round((time.perf_counter() - start) * 1000),
+                    details={'attempt': attempt},
+                )
             logger.warning('request failed: %s', exc, extra={'attempt': attempt})
             if attempt == max_attempts:
                 raise
@@ -60,6 +87,7 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     ap.add_argument('--langs', default='java,js,ts,py')
     ap.add_argument('--page-size', type=int, default=500)
     ap.add_argument('--limit', type=int, default=1000)
+    add_profile_arguments(ap)
     args = ap.parse_args(argv)
 
     parsed = urlparse(args.base)
@@ -87,7 +115,19 @@ def main() -> None:
 
     cid = uuid.uuid4().hex
     logger = get_logger(cid)
+    metrics = MetricsCollector(buffered=True)
+    with Profiler.from_args('collect_sonar', cid, args) as profiler:
+        collect(args, logger, metrics, profiler)
+    REGISTRY.export(metrics, cid)
+    metrics.close()
 
+
+def collect(
+    args: argparse.Namespace,
+    logger: logging.LoggerAdapter,
+    metrics: MetricsCollector,
+    profiler: Profiler,
+) -> None:
     session = requests.Session()
     adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8)  # connection pooling
     session.mount('http://', adapter)
@@ -98,15 +138,17 @@ def main() -> None:
         p = 1
         seen = 0
         while True:
-            resp = fetch_with_retry(
-                session,
-                urljoin(args.base, '/api/rules/search'),
-                {'languages': lang, 'ps': args.page_size, 'p': p},
-                logger,
-            )
-            data = resp.json()
+            with profiler.stage('fetch'):
+                resp = fetch_with_retry(
+                    session,
+                    urljoin(args.base, '/api/rules/search'),
+                    {'languages': lang, 'ps': args.page_size, 'p': p},
+                    logger,
+                    metrics=metrics,
+                )
+                data = resp.json()
             rules = data.get('rules', [])
-            batch: List[Dict[str, Any]] = []
+            batch: List[Issue] = []
             for rule in rules:
                 key = rule.get('key') or ''
                 title = rule.get('name') or key
@@ -114,34 +156,28 @@ def main() -> None:
                 cwe = rule.get('cwe') or []
                 owasp = rule.get('owaspTop10') or []
                 issue_id = sha1(f'sonar|{key}')
-                doc = {
-                    'issue_id': issue_id,
-                    'source': 'sonar',
-                    'source_rule_id': key,
-                    'language': rule.get('lang'),
-                    'title': title[:240],
-                    'summary': (desc[:1000] if desc else None),
-                    'root_cause': None,
-                    'fix_steps': None,
-                    'autofix_snippet': None,
-                    'severity': rule.get('severity'),
-                    'confidence': None,
-                    'taxonomy': {'cwe': cwe, 'owasp': owasp},
-                    'frequency': None,
-                    'signals': [{'kind': 'rule_id', 'value': key}],
-                    'references': [
-                        {
-                            'label': 'Sonar API (rule show)',
-                            'url': urljoin(args.base, f'/api/rules/show?key={key}'),
-                            'license': None,
-                        }
+                doc = Issue(
+                    issue_id,
+                    'sonar',
+                    title[:240],
+                    source_rule_id=key,
+                    language=rule.get('lang'),
+                    summary=(desc[:1000] if desc else None),
+                    severity=rule.get('severity'),
+                    taxonomy={'cwe': cwe, 'owasp': owasp},
+                    signals=[Signal('rule_id', key)],
+                    references=[
+                        Reference(
+                            'Sonar API (rule show)',
+                            urljoin(args.base, f'/api/rules/show?key={key}'),
+                        )
                     ],
-                    'metadata': {
+                    metadata={
                         'type': rule.get('type'),
                         'tags': rule.get('sysTags'),
                         'remediation': rule.get('remediation'),
                     },
-                }
+                )
                 batch.append(doc)
                 seen += 1
                 total += 1
@@ -149,7 +185,8 @@ def main() -> None:
                     break
             if batch:
                 # Batched writes reduce N+1 file operations for ~5x faster collection.
-                write_issues_batch(batch)
+                with profiler.stage('write'):
+                    write_issues_batch(batch)
             if args.limit and seen >= args.limit:
                 break
             if p * args.page_size >= data.get('total', 0):
@@ -0,0 +1,222 @@
+"""Near-duplicate issue clusters from MinHash signatures and an LSH index.
+
+``build_index`` signs each upserted issue inside the batch transaction. The
+signature covers the word 3-shingles of title, summary and fix_steps. The
+stored ``text_hash`` lets an issue whose text did not change skip re-signing.
+Signatures use one-permutation hashing with densification: each shingle is
+hashed once into one of ``NUM_HASHES`` bins. That costs one hash per shingle
+instead of one per shingle per permutation.
+
+The ``BANDS`` x ``ROWS`` LSH buckets in ``lsh_buckets`` find candidates. A
+candidate joins the issue's cluster when its estimated Jaccard similarity is
+at least ``THRESHOLD``. Clusters are single-link. A new issue that matches
+several clusters merges them. Removing a member does not split its cluster.
+``cluster_id`` is always the ``issue_id`` of a current member, and it is
+relabelled when that member leaves.
+
+An index built before signatures existed has issues without a ``minhash`` row.
+``build_index`` then signs them from the ``issues`` table (``backfill``) on
+its next run, so collapsing works without touching every file.
+
+Usage:
+    python scripts/dedup.py [--db-path issuesdb/issues.sqlite] [--min-size 2]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sqlite3
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from fts_query import tokenize
+
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+THRESHOLD = 0.7
+SHINGLE = 3
+TEXT_FIELDS = ('title', 'summary', 'fix_steps')
+
+_EMPTY = (1 << 64) - 1
+# One indexed (band, bucket) probe per band; row-value IN (VALUES ...) is not index-assisted.
+_BAND_LOOKUP = ' UNION ALL '.join(['SELECT issue_id FROM lsh_buckets WHERE band=? AND bucket=?'] * BANDS)
+
+
+def issue_text(doc: Mapping[str, Any]) -> str:
+    return '\n'.join(str(doc.get(f) or '') for f in TEXT_FIELDS)
+
+
+def _hash64(data: str) -> int:
+    return int.from_bytes(hashlib.blake2b(data.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def signature(text: str) -> List[int]:
+    """``NUM_HASHES`` MinHash values of the word shingles of ``text``."""
+
+    tokens = tokenize(text)
+    width = min(SHINGLE, len(tokens)) or 1
+    bins = [_EMPTY] * NUM_HASHES
+    for i in range(max(1, len(tokens) - width + 1)):
+        h = _hash64(' '.join(tokens[i:i + width]))
+        b, v = h % NUM_HASHES, h // NUM_HASHES
+        if v < bins[b]:
+            bins[b] = v
+    # Densify: an empty bin borrows the next non-empty bin's value (circularly),
+    # offset by the distance so borrowed values differ from the originals.
+    filled = bins[:]
+    if any(v != _EMPTY for v in filled):
+        for b in range(NUM_HASHES):
+            hop = 1
+            while bins[b] == _EMPTY:
+                donor = filled[(b + hop) % NUM_HASHES]
+                if donor != _EMPTY:
+                    bins[b] = donor + hop
+                hop += 1
+    return bins
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Estimated Jaccard similarity: the share of equal signature positions."""
+
+    return sum(x == y for x, y in zip(a, b)) / NUM_HASHES
+
+
+def band_keys(sig: Sequence[int]) -> List[int]:
+    """One signed 63-bit bucket key per band, for the ``lsh_buckets`` table."""
+
+    keys = []
+    for band in range(BANDS):
+        rows = array('Q', sig[band * ROWS:(band + 1) * ROWS]).tobytes()
+        keys.append(int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), 'little') >> 1)
+    return keys
+
+
+def _load(blob: bytes) -> array:
+    sig = array('Q')
+    sig.frombytes(blob)
+    return sig
+
+
+def remove_issue(cur: sqlite3.Cursor, issue_id: str) -> None:
+    """Drop ``issue_id`` from the LSH index and hand its cluster label to a remaining member."""
+
+    row = cur.execute('SELECT cluster_id FROM minhash WHERE issue_id=?', (issue_id,)).fetchone()
+    cur.execute('DELETE FROM lsh_buckets WHERE issue_id=?', (issue_id,))
+    cur.execute('DELETE FROM minhash WHERE issue_id=?', (issue_id,))
+    if row and row[0] == issue_id:
+        heir = cur.execute('SELECT MIN(issue_id) FROM minhash WHERE cluster_id=?', (issue_id,)).fetchone()[0]
+        if heir is not None:
+            cur.execute('UPDATE minhash SET cluster_id=? WHERE cluster_id=?', (heir, issue_id))
+
+
+def sign_issue(cur: sqlite3.Cursor, issue_id: str, text: str) -> str:
+    """(Re)sign ``issue_id`` if its text changed; returns its ``cluster_id``."""
+
+    text_hash = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    row = cur.execute('SELECT text_hash, cluster_id FROM minhash WHERE issue_id=?', (issue_id,)).fetchone()
+    if row and row[0] == text_hash:
+        return row[1]
+    remove_issue(cur, issue_id)
+
+    sig = signature(text)
+    keys = band_keys(sig)
+    candidates = cur.execute(
+        'SELECT m.signature, m.cluster_id FROM minhash AS m WHERE m.issue_id IN'
+        ' (' + _BAND_LOOKUP + ')',
+        [v for pair in enumerate(keys) for v in pair],
+    ).fetchall()
+    clusters = {cluster for blob, cluster in candidates if similarity(sig, _load(blob)) >= THRESHOLD}
+    cluster_id = min(clusters | {issue_id})
+    for other in clusters - {cluster_id}:
+        cur.execute('UPDATE minhash SET cluster_id=? WHERE cluster_id=?', (cluster_id, other))
+    cur.execute(
+        'INSERT INTO minhash(issue_id, text_hash, signature, cluster_id) VALUES (?,?,?,?)',
+        (issue_id, text_hash, array('Q', sig).tobytes(), cluster_id),
+    )
+    cur.executemany(
+        'INSERT INTO lsh_buckets(band, bucket, issue_id) VALUES (?,?,?)',
+        [(band, key, issue_id) for band, key in enumerate(keys)],
+    )
+    return cluster_id
+
+
+def needs_backfill(cur: sqlite3.Cursor) -> bool:
+    """True if some indexed issue has no signature."""
+
+    row = cur.execute(
+        'SELECT 1 FROM issues AS i WHERE NOT EXISTS (SELECT 1 FROM minhash AS m WHERE m.issue_id = i.issue_id) LIMIT 1'
+    ).fetchone()
+    return row is not None
+
+
+def backfill(cur: sqlite3.Cursor, batch_size: int = 1000) -> int:
+    """Sign every indexed issue that has no signature; returns how many were signed.
+
+    Text is read from the ``issues`` rows in ``issue_id`` pages of ``batch_size``.
+    The caller owns the transaction.
+    """
+
+    signed = 0
+    last = ''
+    while True:
+        rows = cur.execute(
+            'SELECT i.issue_id, i.title, i.summary, i.fix_steps FROM issues AS i'
+            ' WHERE i.issue_id > ?'
+            ' AND NOT EXISTS (SELECT 1 FROM minhash AS m WHERE m.issue_id = i.issue_id)'
+            ' ORDER BY i.issue_id LIMIT ?',
+            (last, batch_size),
+        ).fetchall()
+        for issue_id, *text in rows:
+            sign_issue(cur, issue_id, issue_text(dict(zip(TEXT_FIELDS, text))))
+        signed += len(rows)
+        if len(rows) < batch_size:
+            return signed
+        last = rows[-1][0]
+
+
+def clusters(con: sqlite3.Connection, min_size: int = 2) -> List[Dict[str, Any]]:
+    """Clusters with at least ``min_size`` members, largest first."""
+
+    rows = con.execute(
+        "SELECT cluster_id, GROUP_CONCAT(issue_id, ' '), COUNT(*) AS n FROM minhash"
+        ' GROUP BY cluster_id HAVING n >= ? ORDER BY n DESC, cluster_id',
+        (min_size,),
+    ).fetchall()
+    return [{'cluster_id': c, 'size': n, 'issue_ids': sorted(ids.split())} for c, ids, n in rows]
+
+
+def cluster_ids(con: sqlite3.Connection, issue_ids: Sequence[str]) -> Dict[str, str]:
+    """``issue_id -> cluster_id`` for the given issues; unsigned issues are omitted."""
+
+    if not issue_ids:
+        return {}
+    marks = ','.join('?' * len(issue_ids))
+    try:
+        return dict(con.execute(f'SELECT issue_id, cluster_id FROM minhash WHERE issue_id IN ({marks})', list(issue_ids)))
+    except sqlite3.OperationalError:  # index built before dedup existed
+        return {}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description='List near-duplicate issue clusters')
+    ap.add_argument('--db-path', type=Path, default=Path('issuesdb/issues.sqlite'))
+    ap.add_argument('--min-size', type=int, default=2)
+    return ap.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    con = sqlite3.connect(args.db_path)
+    try:
+        for cluster in clusters(con, args.min_size):
+            print(json.dumps(cluster))
+    finally:
+        con.close()
+
+
+if __name__ == '__main__':
+    main()
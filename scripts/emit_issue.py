@@ -1,11 +1,12 @@
 import datetime
 import hashlib
-import json
 import pathlib
 import re
-from typing import Any, Dict, Iterable, List
+from typing import Any, Dict, Iterable, List, Tuple, Union
 
-from json_utils import MAX_JSON_BYTES
+from issue_model import Issue, IssueValidationError
+from json_utils import MAX_JSON_BYTES, dumps_canonical
+from schema_validator import format_errors, validate_issue
 
 ROOT = pathlib.Path('issuesdb/issues').resolve()
 ISSUE_ID_PATTERN = re.compile(r'^[a-f0-9]{40}$')
@@ -15,34 +16,59 @@ def sha1(s: str) -> str:
     return hashlib.sha1(s.encode('utf-8')).hexdigest()
 
 
-def write_issue(doc: Dict[str, Any]) -> pathlib.Path:
-    """Write issue document to canonical JSON file."""
-    assert 'issue_id' in doc and 'source' in doc and 'title' in doc, 'minimum fields missing'
-    issue_id = doc['issue_id']
+IssueLike = Union[Issue, Dict[str, Any]]
+
+
+def _now() -> str:
+    return datetime.datetime.utcnow().replace(microsecond=0).isoformat() + 'Z'
+
+
+def _render(doc: IssueLike) -> Tuple[pathlib.Path, str]:
+    """Target path and canonical JSON for ``doc``.
+
+    Both dicts and ``Issue`` objects (whose constructor does not check types)
+    are validated against the issue schema; violations raise
+    ``IssueValidationError``, a ``ValueError``.
+    """
+    if isinstance(doc, Issue):
+        if doc.updated_at is None:
+            doc.updated_at = _now()
+        data = doc.to_dict()
+    else:
+        data = doc
+        if 'updated_at' not in data:
+            data['updated_at'] = _now()
+    errors = validate_issue(data)
+    if errors:
+        raise IssueValidationError(format_errors(errors))
+    issue_id = data['issue_id']
     if not ISSUE_ID_PATTERN.fullmatch(issue_id):
         raise ValueError('issue_id must be a 40-character hexadecimal string')
-    src = doc['source']
-    lang = (doc.get('language') or 'unknown').lower()
-    out = (ROOT / src / lang).resolve()
-    out.mkdir(parents=True, exist_ok=True)
-    if 'updated_at' not in doc:
-        doc['updated_at'] = datetime.datetime.utcnow().replace(microsecond=0).isoformat() + 'Z'
+    lang = (data.get('language') or 'unknown').lower()
+    out = (ROOT / data['source'] / lang).resolve()
     path = (out / f'{issue_id}.json').resolve()
     try:
         path.relative_to(out)
     except ValueError as exc:
         raise ValueError('resolved path escapes target directory') from exc
-    json_blob = json.dumps(doc, ensure_ascii=False, indent=2, sort_keys=True)
+    json_blob = dumps_canonical(data)
     if len(json_blob) > MAX_JSON_BYTES:
         raise ValueError(
             f'document exceeds {MAX_JSON_BYTES} bytes (size={len(json_blob)})'
         )
+    out.mkdir(parents=True, exist_ok=True)
+    return path, json_blob
+
+
+def write_issue(doc: IssueLike) -> pathlib.Path:
+    """Write issue document to canonical JSON file."""
+    path, json_blob = _render(doc)
     with path.open('w', encoding='utf-8') as f:
         f.write(json_blob)
     return path
 
 
-def write_issues_batch(docs: Iterable[Dict[str, Any]]) -> List[pathlib.Path]:
+def write_issues_batch(docs: Iterable[IssueLike]) -> List[pathlib.Path]:
     """Write multiple issue documents atomically.
 
     Files are first written to temporary paths and then moved into place to emulate
@@ -55,24 +81,8 @@ def write_issues_batch(docs: Iterable[Dict[str, Any]]) -> List[pathlib.Path]:
     temp_paths: List[pathlib.Path] = []
     try:
         for doc in docs_list:
-            assert 'issue_id' in doc and 'source' in doc and 'title' in doc, 'minimum fields missing'
-            issue_id = doc['issue_id']
-            if not ISSUE_ID_PATTERN.fullmatch(issue_id):
-                raise ValueError('issue_id must be a 40-character hexadecimal string')
-            src = doc['source']
-            lang = (doc.get('language') or 'unknown').lower()
-            out = (ROOT / src / lang).resolve()
-            out.mkdir(parents=True, exist_ok=True)
-            if 'updated_at' not in doc:
-                doc['updated_at'] = datetime.datetime.utcnow().replace(microsecond=0).isoformat() + 'Z'
-            path = (out / f'{issue_id}.json').resolve()
-            path.relative_to(out)
+            path, json_blob = _render(doc)
             tmp = path.with_suffix('.json.tmp')
-            json_blob = json.dumps(doc, ensure_ascii=False, indent=2, sort_keys=True)
-            if len(json_blob) > MAX_JSON_BYTES:
-                raise ValueError(
-                    f'document exceeds {MAX_JSON_BYTES} bytes (size={len(json_blob)})'
-                )
             with tmp.open('w', encoding='utf-8') as f:
                 f.write(json_blob)
             paths.append(path)
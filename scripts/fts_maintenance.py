@@ -0,0 +1,161 @@
+"""FTS5 merge/optimize scheduling for ``build_index``.
+
+A full ``'optimize'`` rewrites every segment of ``fts_issues``, so an
+incremental build that changed one issue still paid for the whole index. The
+scheduler reads the FTS5 structure record (``integrity.read_structure``) after
+the updates and picks one action:
+
+* ``optimize``: the index has more than ``Policy.optimize_segments`` segments,
+  the build rewrote at least ``Policy.bulk_fraction`` of the issues (a cold
+  build or ``--rebuild``, where one more pass is cheap by comparison), the
+  build runs inside ``Policy.window``, or ``--fts-maintenance optimize`` was
+  requested (for example from a nightly job);
+* ``merge``: after an update, up to ``Policy.merge_steps`` ``'merge'`` commands
+  of ``Policy.merge_pages`` pages each. They finish merges already under way and
+  merge levels that hold ``usermerge`` (4) segments, so the work is bounded no
+  matter how large the index is;
+* ``none``: the index is a single segment, or nothing changed.
+
+``automerge`` still merges small segments during writes. The scheduler only
+bounds how much extra work a build does. Each decision is logged and recorded
+as an ``fts_maintenance`` metric with the segment counts before and after.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Tuple
+
+from integrity import FTS_TABLE, read_structure
+
+MODES = ('auto', 'merge', 'optimize', 'none')
+
+
+@dataclass(frozen=True)
+class Policy:
+    merge_pages: int = 256
+    merge_steps: int = 8
+    optimize_segments: int = 12
+    bulk_fraction: float = 0.25
+    # Local hours [start, end) in which any fragmentation is optimized, e.g. (2, 5).
+    window: Optional[Tuple[int, int]] = None
+
+
+DEFAULT_POLICY = Policy()
+
+
+@dataclass
+class Decision:
+    action: str
+    reason: str
+    segments: int
+    levels: int
+
+
+@dataclass
+class Outcome:
+    action: str
+    reason: str
+    segments_before: int
+    segments_after: int
+    levels: int
+    merge_steps: int
+    seconds: float
+
+
+def in_window(window: Optional[Tuple[int, int]], now: Optional[datetime] = None) -> bool:
+    if window is None:
+        return False
+    start, end = window
+    hour = (now or datetime.now()).hour
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+def decide(
+    segments: int,
+    levels: int,
+    changed: int,
+    indexed: int,
+    policy: Policy = DEFAULT_POLICY,
+    *,
+    mode: str = 'auto',
+    now: Optional[datetime] = None,
+) -> Decision:
+    """Choose the action after ``changed`` of ``indexed`` issues were written or removed."""
+
+    if mode not in MODES:
+        raise ValueError(f'unknown FTS maintenance mode {mode!r}')
+
+    def decision(action: str, reason: str) -> Decision:
+        return Decision(action, reason, segments, levels)
+
+    if mode == 'none':
+        return decision('none', 'disabled')
+    if segments <= 1:
+        return decision('none', 'compact')
+    if mode == 'optimize':
+        return decision('optimize', 'requested')
+    if mode == 'auto':
+        if segments > policy.optimize_segments:
+            return decision('optimize', 'fragmented')
+        if changed >= policy.bulk_fraction * indexed:
+            return decision('optimize', 'bulk')
+        if in_window(policy.window, now):
+            return decision('optimize', 'window')
+    if mode == 'merge':
+        return decision('merge', 'requested')
+    if changed:
+        return decision('merge', 'updated')
+    return decision('none', 'unchanged')
+
+
+def merge(con: sqlite3.Connection, pages: int, steps: int) -> int:
+    """Run up to ``steps`` bounded ``'merge'`` commands; returns how many did work.
+
+    FTS5 changes ``total_changes`` by at least 2 when a ``'merge'`` wrote
+    anything, and by less when there was nothing eligible to merge.
+    """
+
+    done = 0
+    for _ in range(steps):
+        before = con.total_changes
+        con.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES('merge', ?)", (pages,))
+        if con.total_changes - before < 2:
+            break
+        done += 1
+    return done
+
+
+def run(
+    con: sqlite3.Connection,
+    changed: int,
+    indexed: int,
+    policy: Policy = DEFAULT_POLICY,
+    *,
+    mode: str = 'auto',
+    now: Optional[datetime] = None,
+) -> Outcome:
+    """Decide and carry out FTS maintenance inside the caller's transaction."""
+
+    start = time.perf_counter()
+    before = read_structure(con)
+    levels = sum(1 for n in before.segments_per_level if n)
+    decision = decide(before.segments, levels, changed, indexed, policy, mode=mode, now=now)
+    steps = 0
+    if decision.action == 'merge':
+        steps = merge(con, policy.merge_pages, policy.merge_steps)
+    elif decision.action == 'optimize':
+        con.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('optimize')")
+    after = read_structure(con) if decision.action != 'none' else before
+    return Outcome(
+        decision.action,
+        decision.reason,
+        before.segments,
+        after.segments,
+        levels,
+        steps,
+        time.perf_counter() - start,
+    )
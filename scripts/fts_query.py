@@ -0,0 +1,270 @@
+"""Compile user search text into a safe FTS5 MATCH expression.
+
+Raw input is never passed to MATCH: error strings are full of FTS5 syntax
+(``"``, ``-``, ``:``, parentheses, ``NEAR``). The compiler splits each word
+into tokens the way the ``unicode61``/``porter`` tokenizer does and emits them
+as quoted strings, so punctuation only separates tokens. Supported syntax:
+
+* ``"exact phrase"``; an unterminated quote runs to the end of the input;
+* column filters ``title:word``, ``summary:"a phrase"`` and ``fix:(a OR b)``
+  for the columns in ``COLUMN_ALIASES``; other ``name:value`` words such as
+  ``python:S1234`` stay literal;
+* ``AND`` (also implicit), ``OR``, ``NOT`` or a leading ``-``, and parentheses;
+  only upper-case operators count;
+* ``word*`` for an explicit prefix.
+
+In queries of up to ``PREFIX_MAX_WORDS`` words, a bare single-token word of
+``PREFIX_MIN_LEN`` to ``PREFIX_MAX_LEN`` characters is prefix-expanded. Those
+lengths are served by the ``prefix='2 3 4'`` indexes. Shorter prefixes would
+expand to a large part of the vocabulary. Longer words, and every word of a
+pasted message, match whole porter-stemmed tokens. The
+compiler never raises. Stray operators and unbalanced parentheses are dropped,
+and a group of only negations is ignored, because FTS5 ``NOT`` needs a left
+operand.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+COLUMNS = ('title', 'summary', 'fix_steps', 'signals_concat', 'language')
+COLUMN_ALIASES: Dict[str, str] = {
+    'title': 'title',
+    'summary': 'summary',
+    'fix': 'fix_steps',
+    'fix_steps': 'fix_steps',
+    'signal': 'signals_concat',
+    'signals': 'signals_concat',
+    'lang': 'language',
+    'language': 'language',
+}
+# bm25() weights in COLUMNS order: a hit in the title or a signal says more
+# than one in long free text, and language names are near-constant.
+COLUMN_WEIGHTS: Dict[str, float] = {
+    'title': 2.0,
+    'summary': 1.0,
+    'fix_steps': 1.0,
+    'signals_concat': 2.0,
+    'language': 0.5,
+}
+PREFIX_MIN_LEN = 2
+PREFIX_MAX_LEN = 4
+# Longer inputs are pasted text (error messages) made of whole words.
+PREFIX_MAX_WORDS = 3
+
+_LEX = re.compile(r'\s*(?:(-(?=\())|(\()|(\))|"([^"]*)"?|([^\s()"]+))')
+_TOKEN = re.compile(r'[^\W_]+')  # unicode61: letters and digits; everything else separates
+_OPERATORS = {'AND', 'OR', 'NOT'}
+
+# AST: ('terms', column, tokens, prefix) | ('and'|'or', [nodes]) | ('not', node)
+#      | ('scope', column, node)
+Node = Tuple[Any, ...]
+Lexeme = Tuple[str, str]
+
+
+def tokenize(text: str) -> List[str]:
+    """Index tokens of ``text`` (case-folded; stemming is left to FTS5)."""
+
+    return [t.lower() for t in _TOKEN.findall(text)]
+
+
+def phrase(text: str) -> str:
+    """``text`` as one quoted FTS5 phrase, or ``''`` if it has no tokens."""
+
+    tokens = tokenize(text)
+    return f'"{" ".join(tokens)}"' if tokens else ''
+
+
+def bm25_expr(table: str = 'fts_issues') -> str:
+    weights = ', '.join(str(COLUMN_WEIGHTS[c]) for c in COLUMNS)
+    return f'bm25({table}, {weights})'
+
+
+def _lex(text: str) -> List[Lexeme]:
+    out: List[Lexeme] = []
+    pos = 0
+    while pos < len(text):
+        m = _LEX.match(text, pos)
+        if m is None or m.end() == pos:
+            break
+        pos = m.end()
+        minus, lparen, rparen, quoted, word = m.groups()
+        if minus:
+            out.append(('NOT', minus))
+        elif lparen:
+            out.append(('(', lparen))
+        elif rparen:
+            out.append((')', rparen))
+        elif quoted is not None:
+            out.append(('phrase', quoted))
+        elif word in _OPERATORS:
+            out.append((word, word))
+        elif word:
+            out.append(('word', word))
+    return out
+
+
+class _Parser:
+    def __init__(self, lexemes: List[Lexeme]) -> None:
+        self.lexemes = lexemes
+        self.pos = 0
+        words = sum(1 for kind, _ in lexemes if kind in ('word', 'phrase'))
+        self.implicit_prefix = words <= PREFIX_MAX_WORDS
+
+    def peek(self) -> Optional[str]:
+        return self.lexemes[self.pos][0] if self.pos < len(self.lexemes) else None
+
+    def take(self) -> Lexeme:
+        lexeme = self.lexemes[self.pos]
+        self.pos += 1
+        return lexeme
+
+    def parse(self) -> Optional[Node]:
+        node = None
+        while self.pos < len(self.lexemes):
+            node = _join('and', node, self.parse_or())
+            if self.peek() == ')':
+                self.take()  # stray closing parenthesis
+        return node
+
+    def parse_or(self) -> Optional[Node]:
+        node = self.parse_and()
+        while self.peek() == 'OR':
+            self.take()
+            node = _join('or', node, self.parse_and())
+        return node
+
+    def parse_and(self) -> Optional[Node]:
+        node = None
+        while self.peek() not in (None, ')', 'OR'):
+            if self.peek() == 'AND':
+                self.take()
+                continue
+            node = _join('and', node, self.parse_unary())
+        return node
+
+    def parse_unary(self) -> Optional[Node]:
+        if self.peek() == 'NOT':
+            self.take()
+            operand = self.parse_unary()
+            return ('not', operand) if operand else None
+        if self.peek() == 'word':
+            word = self.lexemes[self.pos][1]
+            if word.startswith('-') and len(word) > 1:
+                self.lexemes[self.pos] = ('word', word[1:])
+                operand = self.parse_unary()
+                return ('not', operand) if operand else None
+        return self.parse_primary()
+
+    def parse_primary(self, column: Optional[str] = None) -> Optional[Node]:
+        if self.peek() in (None, ')', 'OR'):
+            return None
+        kind, value = self.take()
+        if kind == '(':
+            node = self.parse_or()
+            if self.peek() == ')':
+                self.take()
+            return _scope(node, column)
+        if kind == 'phrase':
+            return _terms(column, value, prefix=False)
+        if kind == 'word':
+            name, sep, rest = value.partition(':')
+            if sep and column is None and name.lower() in COLUMN_ALIASES:
+                col = COLUMN_ALIASES[name.lower()]
+                if rest:
+                    return self._word(col, rest)
+                if self.peek() in ('(', 'phrase', 'word'):
+                    return self.parse_primary(col)
+                return None
+            return self._word(column, value)
+        return None  # AND/NOT with nothing to apply to
+
+    def _word(self, column: Optional[str], word: str) -> Optional[Node]:
+        explicit = word.endswith('*')
+        node = _terms(column, word.rstrip('*'), prefix=explicit)
+        if node and not explicit and self.implicit_prefix and len(node[2]) == 1:
+            length = len(node[2][0])
+            node = node[:3] + (PREFIX_MIN_LEN <= length <= PREFIX_MAX_LEN,)
+        return node
+
+
+def _terms(column: Optional[str], text: str, prefix: bool) -> Optional[Node]:
+    tokens = tuple(tokenize(text))
+    if not tokens:
+        return None
+    return ('terms', column, tokens, prefix and len(tokens[-1]) >= PREFIX_MIN_LEN)
+
+
+def _join(op: str, left: Optional[Node], right: Optional[Node]) -> Optional[Node]:
+    if left is None or right is None:
+        return left or right
+    items = (list(left[1]) if left[0] == op else [left]) + (list(right[1]) if right[0] == op else [right])
+    return (op, items)
+
+
+def _scope(node: Optional[Node], column: Optional[str]) -> Optional[Node]:
+    if node is None or column is None:
+        return node
+    return ('scope', column, node)
+
+
+def _emit(node: Node) -> str:
+    kind = node[0]
+    if kind == 'terms':
+        _, column, tokens, prefix = node
+        text = f'"{" ".join(tokens)}"' + ('*' if prefix else '')
+        return f'{column} : {text}' if column else text
+    if kind == 'scope':
+        inner = _emit(node[2])
+        return f'{node[1]} : ({inner})' if inner else ''
+    if kind == 'or':
+        return _join_text(' OR ', node[1])
+    if kind == 'and':
+        positive = _join_text(' AND ', [n for n in node[1] if n[0] != 'not'])
+        negative = _join_text(' OR ', [n[1] for n in node[1] if n[0] == 'not'])
+        if positive and negative:
+            return f'{_group(positive)} NOT {_group(negative)}'
+        return positive
+    return ''  # a bare NOT has no left operand
+
+
+def _join_text(sep: str, nodes: List[Node]) -> str:
+    parts = [(n[0] in ('and', 'or'), _emit(n)) for n in nodes]
+    parts = [(compound, text) for compound, text in parts if text]
+    if len(parts) == 1:
+        return parts[0][1]
+    return sep.join(f'({text})' if compound else text for compound, text in parts)
+
+
+def _group(text: str) -> str:
+    return f'({text})' if ' AND ' in text or ' OR ' in text or ' NOT ' in text else text
+
+
+def compile_query(text: str) -> str:
+    """FTS5 MATCH expression for ``text``; ``''`` when nothing is searchable."""
+
+    node = _Parser(_lex(text)).parse()
+    return _emit(node) if node else ''
+
+
+def query_terms(text: str) -> List[Tuple[str, bool]]:
+    """``(token, prefix)`` pairs a hit can contain, i.e. outside ``NOT``; for highlighting."""
+
+    terms: List[Tuple[str, bool]] = []
+
+    def walk(node: Optional[Node]) -> None:
+        if node is None or node[0] == 'not':
+            return
+        if node[0] == 'terms':
+            tokens, prefix = node[2], node[3]
+            terms.extend((t, prefix and i == len(tokens) - 1) for i, t in enumerate(tokens))
+        elif node[0] == 'scope':
+            walk(node[2])
+        else:
+            for child in node[1]:
+                walk(child)
+
+    walk(_Parser(_lex(text)).parse())
+    return list(dict.fromkeys(terms))
+
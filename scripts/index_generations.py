@@ -0,0 +1,257 @@
+"""Blue/green index generations: build in a shadow file, verify, swap atomically.
+
+In the generational layout, ``issues.sqlite`` is a symlink to one file in
+``generations/``:
+
+    issuesdb/issues.sqlite -> generations/issues-000007.sqlite
+
+``build_index.py --shadow`` (and ``--rebuild``) never writes to the published
+file. The build copies the current generation into a new one with the SQLite
+backup API, or starts empty for a full rebuild. It indexes the changes into
+that copy and verifies it with the integrity tier. ``publish`` then switches the
+symlink with ``os.replace``, which is atomic. A search that starts before the
+swap finishes on the old file and one that starts after it opens the new one.
+A crashed or failed build leaves the published index and ``index_state.json``
+untouched.
+
+Published generations are never modified in place, so readers may open them
+with ``immutable=1`` (no locks, no change detection). Once an index is
+generational, ``build_index`` and ``check_health --repair`` always go through a
+shadow. Connections that stay open across builds use ``Reader``, which reopens
+when ``generation_token`` changes.
+
+Usage:
+    python scripts/index_generations.py status --db-path issuesdb/issues.sqlite
+    python scripts/index_generations.py prune --db-path issuesdb/issues.sqlite --keep 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import sqlite_profile
+
+GENERATIONS_DIR = 'generations'
+# Generations kept on disk, the published one included; older ones are pruned on publish.
+KEEP = 2
+_SIDECARS = ('-wal', '-shm', '-journal')
+
+
+def is_managed(db_path: Path) -> bool:
+    """True if ``db_path`` is a generation symlink rather than a plain file."""
+
+    return Path(db_path).is_symlink()
+
+
+def generation_token(db_path: Path) -> Optional[Tuple[int, int]]:
+    """``(st_dev, st_ino)`` of the published file; changes on every swap."""
+
+    try:
+        st = os.stat(db_path)
+    except FileNotFoundError:
+        return None
+    return st.st_dev, st.st_ino
+
+
+def _pattern(db_path: Path) -> 're.Pattern[str]':
+    return re.compile(rf'^{re.escape(db_path.stem)}-(\d+){re.escape(db_path.suffix)}$')
+
+
+def generations(db_path: Path) -> List[Tuple[int, Path]]:
+    """``(number, path)`` of every generation file, oldest first."""
+
+    directory = db_path.parent / GENERATIONS_DIR
+    if not directory.is_dir():
+        return []
+    pattern = _pattern(db_path)
+    found = []
+    for path in directory.iterdir():
+        match = pattern.match(path.name)
+        if match:
+            found.append((int(match.group(1)), path))
+    return sorted(found)
+
+
+def current(db_path: Path) -> Optional[Path]:
+    """The generation file ``db_path`` points to; ``None`` for a plain file."""
+
+    if not is_managed(db_path):
+        return None
+    return (db_path.parent / os.readlink(db_path)).resolve()
+
+
+def _number(db_path: Path, path: Optional[Path]) -> int:
+    match = _pattern(db_path).match(path.name) if path is not None else None
+    return int(match.group(1)) if match else 0
+
+
+def discard(path: Path) -> None:
+    """Remove a generation file and its journal files, if present."""
+
+    for name in (path.name, *(path.name + s for s in _SIDECARS)):
+        (path.parent / name).unlink(missing_ok=True)
+
+
+def new_shadow(db_path: Path, *, fresh: bool = False) -> Path:
+    """Create the next generation file for a build.
+
+    It is a copy of the published index made with the backup API, or an empty
+    file when ``fresh`` is set or nothing is published yet. A leftover file with
+    the same number, from a build that crashed, is replaced.
+    """
+
+    db_path = Path(db_path)
+    directory = db_path.parent / GENERATIONS_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    shadow = directory / f'{db_path.stem}-{_number(db_path, current(db_path)) + 1:06d}{db_path.suffix}'
+    discard(shadow)
+    if not fresh and db_path.exists():
+        src = sqlite3.connect(f'{db_path.resolve().as_uri()}?mode=ro', uri=True)
+        dst = sqlite3.connect(shadow)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+    return shadow
+
+
+def _fsync(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def publish(db_path: Path, shadow: Path, *, keep: int = KEEP) -> Path:
+    """Point ``db_path`` at ``shadow`` atomically and prune old generations.
+
+    The shadow is switched to rollback-journal mode first, so the published file
+    is self-contained with no ``-wal``. A plain ``db_path`` from before the
+    generational layout is replaced by the symlink, and its journal files are
+    removed.
+    """
+
+    db_path = Path(db_path)
+    con = sqlite3.connect(shadow)
+    try:
+        con.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        con.close()
+    _fsync(shadow)
+    legacy = db_path.exists() and not is_managed(db_path)
+    link = db_path.with_name(f'.{db_path.name}.next')
+    link.unlink(missing_ok=True)
+    os.symlink(os.path.relpath(shadow, db_path.parent), link)
+    os.replace(link, db_path)
+    _fsync(db_path.parent)
+    if legacy:
+        for suffix in _SIDECARS:
+            db_path.with_name(db_path.name + suffix).unlink(missing_ok=True)
+    prune(db_path, keep)
+    return shadow
+
+
+def prune(db_path: Path, keep: int = KEEP) -> List[Path]:
+    """Delete generations older than the newest ``keep`` up to the published one.
+
+    Readers that still have a pruned file open keep reading it until they close.
+    """
+
+    live = _number(db_path, current(db_path))
+    older = [path for number, path in generations(db_path) if number < live]
+    doomed = older[: max(0, len(older) - (keep - 1))]
+    for path in doomed:
+        discard(path)
+    return doomed
+
+
+class Reader:
+    """A long-lived read connection that follows the published generation.
+
+    ``connection()`` stats ``db_path`` and reopens when the generation changed,
+    so callers holding a ``Reader`` across builds never query a retired file.
+    Generations are opened ``immutable``. Like any ``sqlite3`` connection, use
+    one ``Reader`` per thread.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        profile: sqlite_profile.Profile = sqlite_profile.SERVING,
+        *,
+        on_connect: Optional[Callable[[sqlite3.Connection], None]] = None,
+    ) -> None:
+        self.db_path = Path(db_path)
+        self.profile = profile
+        self.on_connect = on_connect
+        self.reopened = 0
+        self._con: Optional[sqlite3.Connection] = None
+        self._token: Optional[Tuple[int, int]] = None
+
+    def connection(self) -> sqlite3.Connection:
+        token = generation_token(self.db_path)
+        if self._con is None or token != self._token:
+            self.close()
+            # Token first: if a swap lands in between, the next call reopens again.
+            self._con = sqlite_profile.connect_reader(
+                self.db_path, self.profile, immutable=is_managed(self.db_path)
+            )
+            self._token = token
+            self.reopened += 1
+            if self.on_connect is not None:
+                self.on_connect(self._con)
+        return self._con
+
+    def close(self) -> None:
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+
+    def __enter__(self) -> 'Reader':
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def status(db_path: Path) -> dict:
+    live = current(db_path)
+    return {
+        'db_path': str(db_path),
+        'managed': is_managed(db_path),
+        'current': str(live) if live else None,
+        'generations': [{'number': n, 'path': str(p), 'bytes': p.stat().st_size} for n, p in generations(db_path)],
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description='Inspect and prune blue/green index generations')
+    sub = ap.add_subparsers(dest='command', required=True)
+    for name, text in (('status', 'show the published generation'), ('prune', 'delete old generations')):
+        cmd = sub.add_parser(name, help=text)
+        cmd.add_argument('--db-path', type=Path, default=Path('issuesdb/issues.sqlite'))
+    sub.choices['prune'].add_argument('--keep', type=int, default=KEEP)
+    args = ap.parse_args(argv)
+    if getattr(args, 'keep', 1) < 1:
+        ap.error('--keep must be at least 1')
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.command == 'prune':
+        print(json.dumps({'pruned': [str(p) for p in prune(args.db_path, args.keep)]}))
+        return
+    print(json.dumps(status(args.db_path)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Materialized corpus aggregates kept in the ``stats`` table of the index.
+
+``build_index`` applies count deltas inside the same transaction that writes the
+issues, so readers get exact totals by source, language, severity, CWE and signal
+kind without scanning. ``last_updated_at`` is served from the ``updated_at`` index.
+
+Usage:
+    python scripts/index_stats.py [--db-path issuesdb/issues.sqlite]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+DIMENSIONS = {
+    'source': 'by_source',
+    'language': 'by_language',
+    'severity': 'by_severity',
+    'cwe': 'by_cwe',
+    'signals': 'signals',
+}
+
+StatKey = Tuple[str, str]
+
+
+def _cwes(taxonomy: Any) -> List[str]:
+    if not isinstance(taxonomy, dict):
+        return []
+    return [str(c) for c in taxonomy.get('cwe') or []]
+
+
+def doc_contributions(doc: Mapping[str, Any]) -> Counter:
+    """Return the stats rows a single issue document contributes to."""
+
+    contrib: Counter = Counter()
+    contrib[('total', '')] += 1
+    contrib[('source', doc['source'])] += 1
+    contrib[('language', (doc.get('language') or 'unknown').lower())] += 1
+    contrib[('severity', doc.get('severity') or 'unknown')] += 1
+    for cwe in _cwes(doc.get('taxonomy')):
+        contrib[('cwe', cwe)] += 1
+    for s in doc.get('signals') or []:
+        contrib[('signals', s.get('kind') or 'unknown')] += 1
+    return contrib
+
+
+def row_contributions(cur: sqlite3.Cursor, issue_id: str) -> Counter:
+    """Return the contributions of the currently indexed row, empty if absent."""
+
+    row = cur.execute(
+        'SELECT source, language, severity, taxonomy_json FROM issues WHERE issue_id=?',
+        (issue_id,),
+    ).fetchone()
+    if not row:
+        return Counter()
+    try:
+        taxonomy = json.loads(row[3]) if row[3] else {}
+    except ValueError:
+        taxonomy = {}
+    signals = [
+        {'kind': kind}
+        for (kind,) in cur.execute('SELECT kind FROM signals WHERE issue_id=?', (issue_id,))
+    ]
+    return doc_contributions(
+        {
+            'source': row[0],
+            'language': row[1],
+            'severity': row[2],
+            'taxonomy': taxonomy,
+            'signals': signals,
+        }
+    )
+
+
+def apply_delta(cur: sqlite3.Cursor, delta: Mapping[StatKey, int]) -> None:
+    """Add ``delta`` to the stats table; the caller owns the transaction."""
+
+    rows = [(dim, key, n) for (dim, key), n in delta.items() if n]
+    if not rows:
+        return
+    cur.executemany(
+        """
+        INSERT INTO stats(dimension, key, count) VALUES (?,?,?)
+        ON CONFLICT(dimension, key) DO UPDATE SET count = count + excluded.count
+        """,
+        rows,
+    )
+    cur.execute('DELETE FROM stats WHERE count = 0')
+
+
+def rebuild(cur: sqlite3.Cursor) -> None:
+    """Recompute the stats table from scratch with ``GROUP BY`` queries.
+
+    Empty values are bucketed as ``'unknown'``, like ``doc_contributions``.
+    """
+
+    cur.execute('DELETE FROM stats')
+    cur.execute("INSERT INTO stats SELECT 'total', '', COUNT(*) FROM issues")
+    cur.execute("INSERT INTO stats SELECT 'source', source, COUNT(*) FROM issues GROUP BY source")
+    cur.execute(
+        "INSERT INTO stats SELECT 'language', LOWER(COALESCE(NULLIF(language,''),'unknown')) AS k, COUNT(*)"
+        ' FROM issues GROUP BY k'
+    )
+    cur.execute(
+        "INSERT INTO stats SELECT 'severity', COALESCE(NULLIF(severity,''),'unknown') AS k, COUNT(*)"
+        ' FROM issues GROUP BY k'
+    )
+    cur.execute(
+        "INSERT INTO stats SELECT 'cwe', CAST(j.value AS TEXT) AS k, COUNT(*)"
+        " FROM issues, json_each(issues.taxonomy_json, '$.cwe') AS j"
+        ' WHERE json_valid(issues.taxonomy_json) GROUP BY k'
+    )
+    cur.execute(
+        "INSERT INTO stats SELECT 'signals', COALESCE(NULLIF(kind,''),'unknown') AS k, COUNT(*)"
+        ' FROM signals GROUP BY k'
+    )
+    cur.execute('DELETE FROM stats WHERE count = 0')
+
+
+def needs_backfill(cur: sqlite3.Cursor) -> bool:
+    """True for an index built before the stats table existed."""
+
+    if cur.execute('SELECT 1 FROM stats LIMIT 1').fetchone():
+        return False
+    return cur.execute('SELECT 1 FROM issues LIMIT 1').fetchone() is not None
+
+
+def has_stats_table(con: sqlite3.Connection) -> bool:
+    row = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='stats'"
+    ).fetchone()
+    return row is not None
+
+
+def read_stats(con: sqlite3.Connection) -> Dict[str, Any]:
+    """Return exact corpus aggregates without scanning the issues table."""
+
+    stats: Dict[str, Any] = {name: {} for name in DIMENSIONS.values()}
+    stats['total'] = 0
+    for dim, key, count in con.execute('SELECT dimension, key, count FROM stats'):
+        if dim == 'total':
+            stats['total'] = count
+        elif dim in DIMENSIONS:
+            stats[DIMENSIONS[dim]][key] = count
+    stats['signals_total'] = sum(stats['signals'].values())
+    stats['last_updated_at'] = con.execute('SELECT MAX(updated_at) FROM issues').fetchone()[0]
+    return stats
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--db-path', type=Path, default=Path('issuesdb/issues.sqlite'))
+    return ap.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    con = sqlite3.connect(f'file:{args.db_path}?mode=ro', uri=True)
+    try:
+        print(json.dumps(read_stats(con), ensure_ascii=False, indent=2, sort_keys=True))
+    finally:
+        con.close()
+
+
+if __name__ == '__main__':
+    main()
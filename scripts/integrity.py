@@ -0,0 +1,238 @@
+"""Tiered integrity checks for the SQLite index.
+
+Tiers trade coverage for time:
+
+* ``quick``: ``PRAGMA quick_check`` plus FTS5 structure checks (shadow tables,
+  config version, decodable structure record, segments present in ``_idx``).
+* ``sampled``: ``quick`` plus N random issues verified to round-trip through
+  ``fts_issues MATCH`` on their title.
+* ``full``: FTS5 ``integrity-check`` plus ``PRAGMA integrity_check``.
+
+Every tier runs under an optional time budget enforced with a progress handler,
+so a check never holds its read transaction longer than allowed.
+"""
+
+from __future__ import annotations
+
+import random
+import re
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+TIERS = ('quick', 'sampled', 'full')
+DEFAULT_BUDGET_SECONDS = {'quick': 10.0, 'sampled': 30.0, 'full': None}
+DEFAULT_SAMPLE_SIZE = 50
+
+FTS_TABLE = 'fts_issues'
+STRUCTURE_ROWID = 10
+FTS5_STRUCTURE_V2 = b'\xff\x00\x00\x01'
+# FTS5 config versions with the same on-disk format: 5 is written once
+# 'secure-delete' is enabled (SQLite 3.42+).
+FTS5_CONFIG_VERSIONS = (4, 5)
+PROGRESS_OPS = 1000
+
+_WORD = re.compile(r'\w', re.UNICODE)
+
+
+class IntegrityError(RuntimeError):
+    """Raised when a check finds corruption or an inconsistency."""
+
+
+class CheckTimeout(RuntimeError):
+    """Raised when a check exceeds its time budget before reaching a verdict."""
+
+
+@dataclass
+class CheckResult:
+    tier: str
+    seconds: float
+    samples: int = 0
+    details: Dict[str, object] = field(default_factory=dict)
+
+
+@dataclass
+class FtsStructure:
+    levels: int
+    segments: int
+    write_counter: int
+    segments_per_level: List[int]
+    segment_ids: List[int]
+
+
+def _varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    """Decode a SQLite varint at ``pos`` returning ``(value, next_pos)``."""
+
+    value = 0
+    for i in range(8):
+        byte = buf[pos + i]
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos + i + 1
+    return (value << 8) | buf[pos + 8], pos + 9
+
+
+def decode_structure(block: bytes) -> FtsStructure:
+    """Decode an FTS5 structure record (``<table>_data`` row id 10)."""
+
+    try:
+        pos = 4  # cookie
+        v2 = block[pos:pos + 4] == FTS5_STRUCTURE_V2
+        if v2:
+            pos += 4
+        levels, pos = _varint(block, pos)
+        segments, pos = _varint(block, pos)
+        write_counter, pos = _varint(block, pos)
+        per_level: List[int] = []
+        seg_ids: List[int] = []
+        for _ in range(levels):
+            _merge, pos = _varint(block, pos)
+            n_seg, pos = _varint(block, pos)
+            per_level.append(n_seg)
+            for _ in range(n_seg):
+                seg_id, pos = _varint(block, pos)
+                seg_ids.append(seg_id)
+                for _ in range(7 if v2 else 2):
+                    _, pos = _varint(block, pos)
+    except IndexError as exc:
+        raise IntegrityError(f'{FTS_TABLE} structure record truncated') from exc
+    if sum(per_level) != segments:
+        raise IntegrityError(f'{FTS_TABLE} structure record segment count mismatch')
+    return FtsStructure(levels, segments, write_counter, per_level, seg_ids)
+
+
+def read_structure(con: sqlite3.Connection, table: str = FTS_TABLE) -> FtsStructure:
+    row = con.execute(
+        f'SELECT block FROM {table}_data WHERE id=?', (STRUCTURE_ROWID,)
+    ).fetchone()
+    if row is None or row[0] is None:
+        raise IntegrityError(f'{table} structure record missing')
+    return decode_structure(bytes(row[0]))
+
+
+def _quick(con: sqlite3.Connection) -> Dict[str, object]:
+    status = con.execute('PRAGMA quick_check').fetchone()[0]
+    if status != 'ok':
+        raise IntegrityError(f'database quick check failed: {status}')
+    names = {
+        r[0]
+        for r in con.execute(
+            "SELECT name FROM sqlite_master WHERE name LIKE ? ESCAPE '\\'",
+            (FTS_TABLE.replace('_', '\\_') + '%',),
+        )
+    }
+    for suffix in ('', '_data', '_idx', '_config'):
+        if FTS_TABLE + suffix not in names:
+            raise IntegrityError(f'{FTS_TABLE}{suffix} table missing')
+    version = con.execute(
+        f"SELECT v FROM {FTS_TABLE}_config WHERE k='version'"
+    ).fetchone()
+    if version is None or version[0] not in FTS5_CONFIG_VERSIONS:
+        raise IntegrityError(f'{FTS_TABLE} config version unexpected: {version}')
+    structure = read_structure(con)
+    indexed = {r[0] for r in con.execute(f'SELECT DISTINCT segid FROM {FTS_TABLE}_idx')}
+    missing = set(structure.segment_ids) - indexed
+    if missing:
+        raise IntegrityError(f'{FTS_TABLE} segments missing from index: {sorted(missing)}')
+    return {'levels': structure.levels, 'segments': structure.segments}
+
+
+def _sample_rowids(con: sqlite3.Connection, n: int, rng: random.Random) -> List[int]:
+    lo, hi = con.execute('SELECT MIN(rowid), MAX(rowid) FROM issues').fetchone()
+    if lo is None:
+        return []
+    picked = set()
+    for _ in range(n):
+        row = con.execute(
+            'SELECT rowid FROM issues WHERE rowid >= ? ORDER BY rowid LIMIT 1',
+            (rng.randint(lo, hi),),
+        ).fetchone()
+        if row:
+            picked.add(row[0])
+    return sorted(picked)
+
+
+def _sampled(
+    con: sqlite3.Connection,
+    sample_size: int,
+    deadline: Optional[float],
+    rng: random.Random,
+) -> Tuple[int, List[int]]:
+    checked = 0
+    failed: List[int] = []
+    for rowid in _sample_rowids(con, sample_size, rng):
+        if deadline is not None and time.monotonic() > deadline:
+            # A truncated sample is not a pass.
+            raise CheckTimeout(f'sampled check verified {checked} of {sample_size} issues before its budget ran out')
+        title = con.execute('SELECT title FROM issues WHERE rowid=?', (rowid,)).fetchone()[0]
+        if not title or not _WORD.search(title):
+            continue
+        phrase = '"' + title.replace('"', '""') + '"'
+        hit = con.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ? AND rowid = ?',
+            ('title : ' + phrase, rowid),
+        ).fetchone()
+        checked += 1
+        if hit is None:
+            failed.append(rowid)
+    return checked, failed
+
+
+def _full(con: sqlite3.Connection) -> None:
+    cur = con.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('integrity-check')")
+    if cur.fetchall():
+        raise IntegrityError(f'{FTS_TABLE} integrity check failed')
+    status = con.execute('PRAGMA integrity_check').fetchone()[0]
+    if status != 'ok':
+        raise IntegrityError(f'database integrity check failed: {status}')
+
+
+def run_check(
+    con: sqlite3.Connection,
+    tier: str = 'quick',
+    *,
+    budget_seconds: Optional[float] = None,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    seed: Optional[int] = None,
+) -> CheckResult:
+    """Run ``tier`` on ``con`` and return timings, raising on failure or timeout.
+
+    ``budget_seconds`` defaults to :data:`DEFAULT_BUDGET_SECONDS` for the tier;
+    ``0`` disables the budget.
+    """
+
+    if tier not in TIERS:
+        raise ValueError(f'tier must be one of {", ".join(TIERS)}')
+    if budget_seconds is None:
+        budget_seconds = DEFAULT_BUDGET_SECONDS[tier]
+    start = time.monotonic()
+    deadline = start + budget_seconds if budget_seconds else None
+
+    def _progress() -> int:
+        return int(deadline is not None and time.monotonic() > deadline)
+
+    con.set_progress_handler(_progress, PROGRESS_OPS)
+    result = CheckResult(tier, 0.0)
+    try:
+        if tier == 'full':
+            _full(con)
+        else:
+            result.details.update(_quick(con))
+        if tier == 'sampled':
+            checked, failed = _sampled(con, sample_size, deadline, random.Random(seed))
+            result.samples = checked
+            if failed:
+                raise IntegrityError(
+                    f'{len(failed)} of {checked} sampled issues missing from {FTS_TABLE}: {failed[:10]}'
+                )
+    except sqlite3.OperationalError as exc:
+        if deadline is not None and time.monotonic() > deadline:
+            raise CheckTimeout(f'{tier} check exceeded budget of {budget_seconds}s') from exc
+        raise IntegrityError(str(exc)) from exc
+    except sqlite3.DatabaseError as exc:
+        raise IntegrityError(str(exc)) from exc
+    finally:
+        con.set_progress_handler(None, PROGRESS_OPS)
+    result.seconds = time.monotonic() - start
+    return result
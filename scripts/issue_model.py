@@ -0,0 +1,250 @@
+"""Typed issue records shared by the collector, indexer and exporter.
+
+``Issue``, ``Signal`` and ``Reference`` use ``__slots__``, so a batch of
+loaded issues holds no per-document ``dict`` and fields are plain attribute
+reads. ``Issue.from_dict`` validates once, at the boundary where untrusted
+JSON comes in, with the validator ``schema_validator`` compiles from
+``schemas/issue.schema.json``. Code that builds an ``Issue`` itself calls the
+constructor and skips the checks.
+
+``get``/``__getitem__`` give read access by key. Helpers that also take plain
+dicts, such as ``index_stats.doc_contributions`` or ``dedup.issue_text``, can
+therefore take either.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from json_utils import dumps, dumps_canonical, loads
+from schema_validator import format_errors, load_schema, validate_issue
+
+_SCHEMA = load_schema()
+FIELDS: Tuple[str, ...] = tuple(_SCHEMA['properties'])
+_FIELD_SET = frozenset(FIELDS)
+_NULLABLE = frozenset(
+    name for name, spec in _SCHEMA['properties'].items()
+    if isinstance(spec.get('type'), list) and 'null' in spec['type']
+)
+
+
+class IssueValidationError(ValueError):
+    """An issue document does not match ``schemas/issue.schema.json``."""
+
+
+def _dumps(obj: Any) -> str:
+    return dumps(obj) if obj else '{}'
+
+
+class Signal:
+    __slots__ = ('kind', 'value')
+
+    def __init__(self, kind: Optional[str], value: str) -> None:
+        self.kind = kind
+        self.value = value
+
+    @classmethod
+    def from_dict(cls, data: Any) -> 'Signal':
+        if not isinstance(data, dict) or not isinstance(data.get('value'), str):
+            raise IssueValidationError(f'signal needs a string value: {data!r}')
+        kind = data.get('kind')
+        if kind is not None and not isinstance(kind, str):
+            raise IssueValidationError(f'signal kind must be a string: {data!r}')
+        return cls(kind, data['value'])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'kind': self.kind, 'value': self.value}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Signal) and (self.kind, self.value) == (other.kind, other.value)
+
+    def __repr__(self) -> str:
+        return f'Signal({self.kind!r}, {self.value!r})'
+
+
+class Reference:
+    __slots__ = ('label', 'url', 'license')
+
+    def __init__(self, label: Optional[str], url: str, license: Optional[str] = None) -> None:
+        self.label = label
+        self.url = url
+        self.license = license
+
+    @classmethod
+    def from_dict(cls, data: Any) -> 'Reference':
+        if not isinstance(data, dict) or not isinstance(data.get('url'), str):
+            raise IssueValidationError(f'reference needs a string url: {data!r}')
+        return cls(data.get('label'), data['url'], data.get('license'))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'label': self.label, 'url': self.url, 'license': self.license}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Reference) and (self.label, self.url, self.license) == (
+            other.label,
+            other.url,
+            other.license,
+        )
+
+    def __repr__(self) -> str:
+        return f'Reference({self.label!r}, {self.url!r}, {self.license!r})'
+
+
+class Issue:
+    __slots__ = (
+        'issue_id',
+        'source',
+        'source_rule_id',
+        'language',
+        'title',
+        'summary',
+        'root_cause',
+        'fix_steps',
+        'autofix_snippet',
+        'severity',
+        'confidence',
+        'taxonomy',
+        'frequency',
+        'signals',
+        'references',
+        'metadata',
+        'updated_at',
+    )
+
+    def __init__(
+        self,
+        issue_id: str,
+        source: str,
+        title: str,
+        *,
+        source_rule_id: Optional[str] = None,
+        language: Optional[str] = None,
+        summary: Optional[str] = None,
+        root_cause: Optional[str] = None,
+        fix_steps: Optional[str] = None,
+        autofix_snippet: Optional[str] = None,
+        severity: Optional[str] = None,
+        confidence: Optional[float] = None,
+        taxonomy: Optional[Dict[str, Any]] = None,
+        frequency: Optional[int] = None,
+        signals: Iterable[Signal] = (),
+        references: Iterable[Reference] = (),
+        metadata: Optional[Dict[str, Any]] = None,
+        updated_at: Optional[str] = None,
+    ) -> None:
+        self.issue_id = issue_id
+        self.source = source
+        self.title = title
+        self.source_rule_id = source_rule_id
+        self.language = language
+        self.summary = summary
+        self.root_cause = root_cause
+        self.fix_steps = fix_steps
+        self.autofix_snippet = autofix_snippet
+        self.severity = severity
+        self.confidence = confidence
+        self.taxonomy = taxonomy if taxonomy is not None else {}
+        self.frequency = frequency
+        self.signals: List[Signal] = list(signals)
+        self.references: List[Reference] = list(references)
+        self.metadata = metadata if metadata is not None else {}
+        self.updated_at = updated_at
+
+    # -- (de)serialization -----------------------------------------------------
+    @classmethod
+    def from_dict(cls, data: Any) -> 'Issue':
+        """Validate ``data`` against the schema and build an ``Issue``."""
+
+        errors = validate_issue(data)
+        if errors:
+            raise IssueValidationError(format_errors(errors))
+        kwargs = dict(data)
+        kwargs['signals'] = [Signal(s.get('kind'), s['value']) for s in data.get('signals', ())]
+        kwargs['references'] = [
+            Reference(r.get('label'), r['url'], r.get('license')) for r in data.get('references', ())
+        ]
+        return cls(**kwargs)
+
+    @classmethod
+    def from_json(cls, raw: Union[bytes, str]) -> 'Issue':
+        try:
+            data = loads(raw)
+        except ValueError as exc:
+            raise IssueValidationError(f'invalid JSON: {exc}') from exc
+        return cls.from_dict(data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Schema-ordered document; unset non-nullable fields are left out."""
+
+        out: Dict[str, Any] = {}
+        for name in FIELDS:
+            value = getattr(self, name)
+            if name == 'signals' or name == 'references':
+                value = [item.to_dict() for item in value]
+            elif value is None and name not in _NULLABLE:
+                continue
+            out[name] = value
+        return out
+
+    def to_json(self) -> str:
+        """Canonical file form, as written by ``emit_issue``."""
+
+        return dumps_canonical(self.to_dict())
+
+    # -- index rows ------------------------------------------------------------
+    def db_row(self, content_hash: Optional[str] = None) -> Tuple[Any, ...]:
+        """Parameters for the ``issues`` upsert in ``build_index``."""
+
+        return (
+            self.issue_id,
+            self.source,
+            self.source_rule_id,
+            self.language,
+            self.title,
+            self.summary,
+            self.fix_steps,
+            self.severity,
+            self.confidence,
+            _dumps(self.taxonomy),
+            self.frequency,
+            _dumps(self.metadata),
+            self.updated_at,
+            content_hash,
+        )
+
+    def signal_rows(self) -> List[Tuple[str, Optional[str], str]]:
+        return [(self.issue_id, s.kind, s.value) for s in self.signals]
+
+    def reference_rows(self) -> List[Tuple[str, Optional[str], str, Optional[str]]]:
+        return [(self.issue_id, r.label, r.url, r.license) for r in self.references]
+
+    # -- mapping-style access ----------------------------------------------------
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in _FIELD_SET else default
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Issue) and all(getattr(self, n) == getattr(other, n) for n in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f'Issue({self.issue_id!r}, {self.source!r}, {self.title!r})'
+
+
+if set(Issue.__slots__) != set(FIELDS):
+    raise RuntimeError('Issue fields drifted from schemas/issue.schema.json')
+
+
+def load_issues(docs: Sequence[Any]) -> List[Issue]:
+    """Validate a batch of documents; ``Issue`` instances pass through."""
+
+    return [d if isinstance(d, Issue) else Issue.from_dict(d) for d in docs]
@@ -1,13 +1,172 @@
+"""JSON codec layer: bounded file reads plus a backend chosen at import.
+
+The fastest installed backend wins: ``orjson``, then ``msgspec``, then the
+standard library. ``ISSUES_KB_JSON_BACKEND=json|orjson|msgspec`` forces one.
+Every backend exposes the same three functions:
+
+* ``loads(data)`` parses ``bytes`` or ``str`` and raises ``ValueError`` on bad input;
+* ``dumps(obj)`` gives compact one-line JSON (``ensure_ascii=False``) for
+  JSONL and SQLite columns. Number formatting may differ between backends;
+* ``dumps_canonical(obj)`` gives the stored-file form. It is byte-identical to
+  ``json.dumps(obj, ensure_ascii=False, indent=2, sort_keys=True)`` whatever the
+  backend. Documents that a fast backend would print differently fall back to
+  the standard library: floats outside ``[1e-4, 1e16)``, ``NaN``/``inf``,
+  integers beyond 64 bits, non-string keys and lone surrogates.
+
+With ``indent`` set, the standard library encodes in pure Python rather than C,
+so canonical dumps gain the most from a fast backend.
+"""
+
 import json
+import os
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Dict, Optional, Union
 
 MAX_JSON_BYTES = 1_000_000
+BACKENDS = ('orjson', 'msgspec', 'json')
+
+_INT_RANGE = (-(2 ** 63), 2 ** 64)
+
+
+@dataclass(frozen=True)
+class Codec:
+    name: str
+    loads: Callable[[Union[bytes, bytearray, str]], Any]
+    dumps: Callable[[Any], str]
+    dumps_canonical: Callable[[Any], str]
+
+
+def _stdlib_dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def _stdlib_canonical(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def _canonical_safe(obj: Any) -> bool:
+    """True if fast backends print ``obj`` exactly like ``_stdlib_canonical``."""
+
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        kind = type(value)
+        if kind is str or kind is bool or value is None:
+            continue
+        if kind is dict:
+            if any(type(k) is not str for k in value):
+                return False
+            stack.extend(value.values())
+        elif kind is list or kind is tuple:
+            stack.extend(value)
+        elif kind is int:
+            if not _INT_RANGE[0] <= value < _INT_RANGE[1]:
+                return False
+        elif kind is float:
+            # repr switches to exponent notation outside this range; NaN fails both tests.
+            if not (value == 0.0 or 1e-4 <= abs(value) < 1e16):
+                return False
+        else:
+            return False
+    return True
+
+
+def _stdlib_codec() -> Codec:
+    return Codec('json', json.loads, _stdlib_dumps, _stdlib_canonical)
+
+
+def _orjson_codec() -> Codec:
+    import orjson
+
+    option = orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode('utf-8')
+
+    def dumps_canonical(obj: Any) -> str:
+        if _canonical_safe(obj):
+            try:
+                return orjson.dumps(obj, option=option).decode('utf-8')
+            except TypeError:  # lone surrogate
+                pass
+        return _stdlib_canonical(obj)
+
+    return Codec('orjson', orjson.loads, dumps, dumps_canonical)
+
+
+def _msgspec_codec() -> Codec:
+    import msgspec
+
+    decode = msgspec.json.Decoder().decode
+    encoder = msgspec.json.Encoder()
+    sorted_encoder = msgspec.json.Encoder(order='sorted')
+
+    def dumps(obj: Any) -> str:
+        return encoder.encode(obj).decode('utf-8')
+
+    def dumps_canonical(obj: Any) -> str:
+        if _canonical_safe(obj):
+            try:
+                return msgspec.json.format(sorted_encoder.encode(obj), indent=2).decode('utf-8')
+            except UnicodeEncodeError:  # lone surrogate
+                pass
+        return _stdlib_canonical(obj)
+
+    def loads(data: Union[bytes, bytearray, str]) -> Any:
+        try:
+            return decode(data)
+        except msgspec.DecodeError as exc:  # callers catch ValueError, as for json.loads
+            raise ValueError(str(exc)) from exc
+
+    return Codec('msgspec', loads, dumps, dumps_canonical)
+
+
+_FACTORIES: Dict[str, Callable[[], Codec]] = {
+    'orjson': _orjson_codec,
+    'msgspec': _msgspec_codec,
+    'json': _stdlib_codec,
+}
+
+
+def get_codec(name: Optional[str] = None) -> Codec:
+    """Codec for backend ``name``, or the fastest installed one.
+
+    Raises ``ImportError`` when a named backend is not installed.
+    """
+
+    if name is not None:
+        if name not in _FACTORIES:
+            raise ValueError(f'unknown JSON backend {name!r}; choose from {", ".join(BACKENDS)}')
+        return _FACTORIES[name]()
+    for candidate in BACKENDS:
+        try:
+            return _FACTORIES[candidate]()
+        except ImportError:
+            continue
+    return _stdlib_codec()
+
+
+CODEC = get_codec(os.environ.get('ISSUES_KB_JSON_BACKEND') or None)
+BACKEND = CODEC.name
+loads = CODEC.loads
+dumps = CODEC.dumps
+dumps_canonical = CODEC.dumps_canonical
+
+
+def read_json_bytes(path: Path) -> bytes:
+    """Return the raw bytes of a JSON file, enforcing ``MAX_JSON_BYTES``.
+
+    One unbuffered open, ``fstat`` on the descriptor, and one read of exactly
+    that many bytes. Issue files are replaced atomically, so an open descriptor
+    never sees a partial write.
+    """
+    with open(path, 'rb', buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if size > MAX_JSON_BYTES:
+            raise ValueError(f'JSON file {path} exceeds {MAX_JSON_BYTES} bytes (size={size})')
+        return f.read(size) if size else f.read()
 
 
 def load_json(path: Path) -> Any:
-    size = path.stat().st_size
-    if size > MAX_JSON_BYTES:
-        raise ValueError(f'JSON file {path} exceeds {MAX_JSON_BYTES} bytes (size={size})')
-    with path.open('r', encoding='utf-8') as f:
-        return json.load(f)
+    return loads(read_json_bytes(path))
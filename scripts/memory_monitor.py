@@ -1,12 +1,17 @@
 from __future__ import annotations
 
-"""Track process RSS memory usage."""
+"""Track process RSS memory usage and adapt batch sizes to it."""
 
 import os
-from typing import Optional
+import threading
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Tuple
 
 import psutil
 
+MB = 1024 ** 2
+
 
 class MemoryMonitor:
     """Monitor resident set size (RSS) memory usage.
@@ -27,3 +32,191 @@ class MemoryMonitor:
         """Return current RSS memory usage in megabytes."""
 
         return self.process.memory_info().rss / (1024 ** 2)
+
+
+@dataclass
+class GovernorDecision:
+    action: str
+    batch_size: int
+    previous: int
+    rss_mb: float
+    bytes_per_doc: float
+
+
+def measure_bytes_per_doc(loader: Callable[[], List[Tuple[Any, int]]]) -> Optional[float]:
+    """Measure Python heap bytes per loaded document with ``tracemalloc``.
+
+    ``loader`` loads a small sample and returns ``(document, raw_size)`` pairs; the
+    result is the traced allocation while they are alive divided by the sample size.
+    """
+
+    already = tracemalloc.is_tracing()
+    if not already:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        sample = loader()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        if not already:
+            tracemalloc.stop()
+    if not sample:
+        return None
+    raw = sum(size for _, size in sample)
+    return max(after - before, raw) / len(sample)
+
+
+class MemoryGovernor:
+    """Resize batches so RSS stays inside a target band.
+
+    RSS is sampled on a background daemon thread every ``interval_s`` seconds, so
+    the hot loop only reads :attr:`rss_mb`. The band's upper edge is ``target_mb``,
+    or 80% of the monitor's limit, or its warn level; the lower edge is 60% of it.
+    Without a limit or warn level the governor only observes. Batches shrink by
+    half above the hard limit, by a quarter above the band, and grow (at most 2x,
+    bounded by measured bytes per document) below it. Every resize is passed to
+    ``on_decision``.
+    """
+
+    SAFETY = 0.8
+    LOW_FRACTION = 0.6
+    EMA_WEIGHT = 0.3
+    # RSS growth over fewer documents is mostly noise floored at their raw size.
+    MIN_OBSERVE_DOCS = 20
+
+    def __init__(
+        self,
+        monitor: MemoryMonitor,
+        batch_size: int,
+        *,
+        min_batch: int = 1,
+        max_batch: int = 10000,
+        target_mb: Optional[float] = None,
+        interval_s: float = 0.25,
+        on_decision: Optional[Callable[[GovernorDecision], None]] = None,
+    ) -> None:
+        self.monitor = monitor
+        self.batch_size = batch_size
+        self.min_batch = min_batch
+        self.max_batch = max(max_batch, batch_size)
+        if target_mb is None:
+            if monitor.limit_mb:
+                target_mb = monitor.limit_mb * self.SAFETY
+            elif monitor.warn_mb:
+                target_mb = float(monitor.warn_mb)
+        self.high_mb = target_mb
+        self.low_mb = target_mb * self.LOW_FRACTION if target_mb else None
+        self.interval_s = interval_s
+        self.on_decision = on_decision
+        self.bytes_per_doc: float = 0.0
+        self.rss_mb = monitor.rss_mb()
+        self.peak_rss_mb = self.rss_mb
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # -- sampling -----------------------------------------------------------
+    def sample(self) -> float:
+        rss = self.monitor.rss_mb()
+        self.rss_mb = rss
+        if rss > self.peak_rss_mb:
+            self.peak_rss_mb = rss
+        return rss
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.sample()
+
+    def start(self) -> 'MemoryGovernor':
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='memory-governor', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'MemoryGovernor':
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
+
+    # -- decisions ----------------------------------------------------------
+    @property
+    def over_limit(self) -> bool:
+        return bool(self.monitor.limit_mb and self.rss_mb >= self.monitor.limit_mb)
+
+    def observe(self, bytes_per_doc: float) -> None:
+        """Fold a bytes-per-document measurement into the running estimate."""
+
+        if bytes_per_doc <= 0:
+            return
+        if not self.bytes_per_doc:
+            self.bytes_per_doc = bytes_per_doc
+        else:
+            w = self.EMA_WEIGHT
+            self.bytes_per_doc = (1 - w) * self.bytes_per_doc + w * bytes_per_doc
+
+    def observe_batch(self, n_docs: int, raw_bytes: int, rss_before_mb: float) -> None:
+        """Record a filled batch: RSS growth while filling it, floored at its raw size.
+
+        Batches under ``MIN_OBSERVE_DOCS`` documents are ignored.
+        """
+
+        if n_docs < self.MIN_OBSERVE_DOCS:
+            return
+        grown = max(0.0, (self.rss_mb - rss_before_mb) * MB)
+        self.observe(max(grown, float(raw_bytes)) / n_docs)
+
+    def projected_mb(self, batch_size: Optional[int] = None) -> float:
+        size = self.batch_size if batch_size is None else batch_size
+        return self.rss_mb + size * self.bytes_per_doc / MB
+
+    def fit_batch(self) -> int:
+        """Largest batch whose projected footprint stays under the band."""
+
+        if not self.high_mb or not self.bytes_per_doc:
+            return self.max_batch
+        headroom = (self.high_mb - self.rss_mb) * MB
+        return max(self.min_batch, min(self.max_batch, int(headroom // self.bytes_per_doc)))
+
+    def _decide(self, action: str, new_size: int) -> Optional[GovernorDecision]:
+        new_size = max(self.min_batch, min(self.max_batch, new_size))
+        if new_size == self.batch_size:
+            return None
+        decision = GovernorDecision(
+            action, new_size, self.batch_size, round(self.rss_mb, 1), round(self.bytes_per_doc, 1)
+        )
+        self.batch_size = new_size
+        if self.on_decision is not None:
+            self.on_decision(decision)
+        return decision
+
+    def clamp(self) -> Optional[GovernorDecision]:
+        """Shrink the initial batch size if its projection exceeds the band.
+
+        When RSS is already above the band there is nothing to fit; :meth:`adjust`
+        shrinks step by step instead.
+        """
+
+        if self.high_mb and self.rss_mb < self.high_mb and self.projected_mb() > self.high_mb:
+            return self._decide('clamp', min(self.batch_size, self.fit_batch()))
+        return None
+
+    def adjust(self) -> Optional[GovernorDecision]:
+        """Pick the next batch size from the latest RSS sample."""
+
+        if not self.high_mb:
+            return None
+        if self.over_limit:
+            return self._decide('shrink_limit', self.batch_size // 2)
+        if self.rss_mb > self.high_mb:
+            return self._decide('shrink', self.batch_size - max(1, self.batch_size // 4))
+        if self.low_mb is not None and self.rss_mb < self.low_mb:
+            grow = min(self.batch_size * 2, self.fit_batch())
+            if grow > self.batch_size:
+                return self._decide('grow', grow)
+        return None
@@ -0,0 +1,156 @@
+"""Opt-in profiling shared by the pipeline scripts.
+
+Enable with ``--profile`` or ``ISSUES_KB_PROFILE=1``. A run then writes, under
+``profiles/`` (``--profile-dir`` / ``ISSUES_KB_PROFILE_DIR``):
+
+* ``<script>-<cid>.prof``: cProfile stats, readable with ``python -m pstats`` or snakeviz;
+* ``<script>-<cid>.json``: total and per-stage wall/CPU seconds, SQLite statement
+  counts (via ``set_trace_callback``) and the top functions by cumulative time.
+
+When disabled every hook is a no-op, so instrumented code paths stay cheap.
+"""
+
+from __future__ import annotations
+
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sqlite3
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+PROFILE_DIR = Path('profiles')
+ENV_ENABLED = 'ISSUES_KB_PROFILE'
+ENV_DIR = 'ISSUES_KB_PROFILE_DIR'
+TOP_STATEMENTS = 20
+TOP_FUNCTIONS = 25
+
+_NULL = nullcontext()
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--profile', action='store_true', help=f'write a profile to profiles/ (or set {ENV_ENABLED}=1)')
+    parser.add_argument('--profile-dir', type=Path, default=None)
+
+
+def env_enabled() -> bool:
+    return os.getenv(ENV_ENABLED, '').lower() in {'1', 'true', 'yes'}
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse literals and whitespace so statements group by shape."""
+
+    return ' '.join(_LITERALS.sub('?', sql).split())[:200]
+
+
+class Profiler:
+    """cProfile plus stage timers and SQLite statement counts for one script run.
+
+    ``enabled=None`` defers to ``ISSUES_KB_PROFILE``.
+    """
+
+    def __init__(
+        self,
+        script: str,
+        cid: str,
+        enabled: Optional[bool] = None,
+        out_dir: Optional[Path] = None,
+    ) -> None:
+        self.script = script
+        self.cid = cid
+        self.enabled = env_enabled() if enabled is None else enabled
+        self.out_dir = Path(out_dir or os.getenv(ENV_DIR) or PROFILE_DIR)
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.statements: Counter = Counter()
+        self._profile: Optional[cProfile.Profile] = None
+        self._wall = 0.0
+        self._cpu = 0.0
+
+    @classmethod
+    def from_args(cls, script: str, cid: str, args: argparse.Namespace) -> 'Profiler':
+        return cls(script, cid, getattr(args, 'profile', False) or None, getattr(args, 'profile_dir', None))
+
+    # -- hooks ----------------------------------------------------------------
+    def stage(self, name: str) -> Any:
+        """Context manager accumulating wall/CPU seconds under ``name``."""
+
+        if not self.enabled:
+            return _NULL
+        return self._stage(name)
+
+    @contextmanager
+    def _stage(self, name: str) -> Iterator[None]:
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0})
+            entry['calls'] += 1
+            entry['wall_s'] += time.perf_counter() - wall
+            entry['cpu_s'] += time.process_time() - cpu
+
+    def trace(self, con: sqlite3.Connection) -> None:
+        """Count statements executed on ``con``."""
+
+        if self.enabled:
+            con.set_trace_callback(self._on_statement)
+
+    def _on_statement(self, sql: str) -> None:
+        self.statements[normalize_sql(sql)] += 1
+
+    # -- lifecycle ------------------------------------------------------------
+    def start(self) -> 'Profiler':
+        if self.enabled and self._profile is None:
+            self._wall, self._cpu = time.perf_counter(), time.process_time()
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def stop(self) -> Optional[Path]:
+        """Stop profiling and write the outputs; returns the JSON summary path."""
+
+        if self._profile is None:
+            return None
+        self._profile.disable()
+        wall, cpu = time.perf_counter() - self._wall, time.process_time() - self._cpu
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        stem = self.out_dir / f'{self.script}-{self.cid}'
+        self._profile.dump_stats(str(stem.with_suffix('.prof')))
+        summary = {
+            'script': self.script,
+            'cid': self.cid,
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+            'stages': {
+                k: {'calls': v['calls'], 'wall_s': round(v['wall_s'], 6), 'cpu_s': round(v['cpu_s'], 6)}
+                for k, v in self.stages.items()
+            },
+            'sqlite': {
+                'statements': sum(self.statements.values()),
+                'top': self.statements.most_common(TOP_STATEMENTS),
+            },
+            'top_functions': self._top_functions(),
+        }
+        path = stem.with_suffix('.json')
+        path.write_text(json.dumps(summary, indent=2), encoding='utf-8')
+        self._profile = None
+        return path
+
+    def _top_functions(self) -> List[str]:
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        return [line for line in out.getvalue().splitlines() if line.strip()]
+
+    def __enter__(self) -> 'Profiler':
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
@@ -0,0 +1,192 @@
+"""Compare the issue files against the SQLite index.
+
+Both sides are streamed in ``issue_id`` order and merge-joined:
+
+* file side: ``<issue_id>.json`` names under ``issuesdb/issues``, externally sorted
+  in runs of ``RUN_SIZE`` spilled to temporary files, so memory stays bounded;
+* index side: ``SELECT issue_id, content_hash FROM issues ORDER BY issue_id``,
+  served by the primary key index.
+
+Files are only read (and hashed) when both sides contain the issue. Drift is
+reported as ``missing`` (file not indexed), ``extra`` (indexed without a file),
+``stale`` (content hash differs; rows indexed before hashes were recorded count
+as stale until re-indexed) or ``duplicate`` (a second file with the same
+``issue_id`` under another source/language directory; one per extra copy).
+
+The report keeps counts and the first ``SAMPLE_LIMIT`` issue ids of each kind.
+The full drift set, which can be the whole corpus for an empty or badly stale
+index, is written to the ``spill`` file when one is given and streamed back with
+``ReconcileReport.drift``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import itertools
+import sqlite3
+import tempfile
+from dataclasses import dataclass, field
+from operator import itemgetter
+from pathlib import Path
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+RUN_SIZE = 100_000
+SAMPLE_LIMIT = 20
+
+
+KINDS = ('missing', 'extra', 'stale', 'duplicate')
+
+
+@dataclass
+class Drift:
+    kind: str
+    issue_id: str
+    path: Optional[Path] = None
+
+
+@dataclass
+class ReconcileReport:
+    files: int = 0
+    indexed: int = 0
+    counts: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(KINDS, 0))
+    samples: Dict[str, List[str]] = field(default_factory=lambda: {kind: [] for kind in KINDS})
+    spill: Optional[Path] = None
+
+    @property
+    def ok(self) -> bool:
+        return not any(self.counts.values())
+
+    def add(self, drift: Drift, out: Optional[IO[str]] = None) -> None:
+        self.counts[drift.kind] += 1
+        sample = self.samples[drift.kind]
+        if len(sample) < SAMPLE_LIMIT:
+            sample.append(drift.issue_id)
+        if out is not None:
+            out.write(f'{drift.kind}\t{drift.issue_id}\t{drift.path or ""}\n')
+
+    def drift(self, *kinds: str) -> Iterator[Drift]:
+        """Stream the spilled drift of ``kinds`` (all kinds by default) in ``issue_id`` order."""
+
+        if self.spill is None:
+            raise ValueError('reconcile ran without a spill file')
+        with self.spill.open('r', encoding='utf-8') as fh:
+            for line in fh:
+                kind, issue_id, path = line.rstrip('\n').split('\t', 2)
+                if not kinds or kind in kinds:
+                    yield Drift(kind, issue_id, Path(path) if path else None)
+
+    def summary(self) -> dict:
+        return {
+            'files': self.files,
+            'indexed': self.indexed,
+            **self.counts,
+            'sample': {kind: list(ids) for kind, ids in self.samples.items()},
+        }
+
+
+def _spill(run: List[Tuple[str, str]], directory: Path, n: int) -> Path:
+    run.sort()
+    path = directory / f'run-{n}.tsv'
+    with path.open('w', encoding='utf-8') as fh:
+        fh.writelines(f'{issue_id}\t{rel}\n' for issue_id, rel in run)
+    return path
+
+
+def _read_run(path: Path) -> Iterator[Tuple[str, str]]:
+    with path.open('r', encoding='utf-8') as fh:
+        for line in fh:
+            issue_id, rel = line.rstrip('\n').split('\t', 1)
+            yield issue_id, rel
+
+
+def iter_file_side(issues_dir: Path, run_size: int = RUN_SIZE) -> Iterator[Tuple[str, Path]]:
+    """Yield ``(issue_id, path)`` for every issue file in ``issue_id`` order."""
+
+    issues_dir = issues_dir.resolve()
+    run: List[Tuple[str, str]] = []
+    with tempfile.TemporaryDirectory(prefix='reconcile-') as tmp:
+        runs: List[Path] = []
+        for path in issues_dir.glob('*/*/*.json'):
+            run.append((path.stem, str(path.relative_to(issues_dir))))
+            if len(run) >= run_size:
+                runs.append(_spill(run, Path(tmp), len(runs)))
+                run = []
+        if not runs:
+            run.sort()
+            merged: Iterable[Tuple[str, str]] = run
+        else:
+            if run:
+                runs.append(_spill(run, Path(tmp), len(runs)))
+                run = []
+            merged = heapq.merge(*(_read_run(p) for p in runs))
+        for issue_id, rel in merged:
+            yield issue_id, issues_dir / rel
+
+
+def iter_index_side(con: sqlite3.Connection) -> Iterator[Tuple[str, Optional[str]]]:
+    """Yield ``(issue_id, content_hash)`` for every indexed issue in ``issue_id`` order."""
+
+    columns = {row[1] for row in con.execute('PRAGMA table_info(issues)')}
+    hash_col = 'content_hash' if 'content_hash' in columns else 'NULL'
+    yield from con.execute(f'SELECT issue_id, {hash_col} FROM issues ORDER BY issue_id')
+
+
+def file_hash(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+def reconcile(
+    issues_dir: Path,
+    con: sqlite3.Connection,
+    *,
+    run_size: int = RUN_SIZE,
+    spill: Optional[Path] = None,
+) -> ReconcileReport:
+    """Merge-join files and index rows and count the drift between them.
+
+    With ``spill``, every drifted issue is also written to that file.
+    """
+
+    report = ReconcileReport(spill=spill)
+    out = spill.open('w', encoding='utf-8') if spill is not None else None
+    try:
+        _merge_join(report, iter_file_side(issues_dir, run_size), iter_index_side(con), out)
+    finally:
+        if out is not None:
+            out.close()
+    return report
+
+
+def _merge_join(
+    report: ReconcileReport,
+    files: Iterator[Tuple[str, Path]],
+    rows: Iterator[Tuple[str, Optional[str]]],
+    out: Optional[IO[str]],
+) -> None:
+    # Files sharing an issue_id (under two source/language directories) arrive together.
+    groups = ((issue_id, [path for _, path in group]) for issue_id, group in itertools.groupby(files, itemgetter(0)))
+    f = next(groups, None)
+    r = next(rows, None)
+    while f is not None or r is not None:
+        if f is not None and len(f[1]) > 1:
+            # build_index keeps whichever copy it wrote last, which depends on file order
+            # and on which copy changed; the extra copies are drift of their own.
+            for path in f[1][1:]:
+                report.add(Drift('duplicate', f[0], path), out)
+        if r is None or (f is not None and f[0] < r[0]):
+            report.files += 1
+            report.add(Drift('missing', f[0], f[1][0]), out)
+            f = next(groups, None)
+        elif f is None or r[0] < f[0]:
+            report.indexed += 1
+            report.add(Drift('extra', r[0]), out)
+            r = next(rows, None)
+        else:
+            report.files += 1
+            report.indexed += 1
+            # The row is current if it matches any copy, since that copy is the one the build indexed.
+            if r[1] is None or all(file_hash(path) != r[1] for path in f[1]):
+                report.add(Drift('stale', f[0], f[1][0]), out)
+            f = next(groups, None)
+            r = next(rows, None)
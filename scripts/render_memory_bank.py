@@ -1,19 +1,102 @@
-import pathlib, json, datetime
+import argparse, pathlib, json, datetime, heapq, os, sqlite3, uuid
+from concurrent.futures import ProcessPoolExecutor
+import index_stats
 from json_utils import load_json
+from profiling import Profiler, add_profile_arguments
 
 ROOT = pathlib.Path('.')
 MB   = ROOT / 'memory_bank'
 ISS  = ROOT / 'issuesdb' / 'issues'
+DB   = ROOT / 'issuesdb' / 'issues.sqlite'
+STATE = ROOT / 'issuesdb' / 'index_state.json'
 
-def count_docs():
-    total = 0; by_source = {}; by_lang = {}
-    for p in ISS.glob('*/*/*.json'):
-        total += 1
-        doc = load_json(p)
-        src = doc['source']; by_source[src] = by_source.get(src,0)+1
-        lang = (doc.get('language') or 'unknown').lower()
-        by_lang[lang] = by_lang.get(lang,0)+1
-    return total, by_source, by_lang
+TOP_N = 5
+# Below this many files a process pool costs more than it saves.
+PARALLEL_MIN_FILES = 2000
+
+def _empty_stats():
+    return {'total': 0, 'by_source': {}, 'by_language': {}, 'by_severity': {}, 'top_cwe': [], 'recent': []}
+
+def index_is_fresh(db=None, state_path=None, issues_dir=None):
+    """True when the index state matches the issue files on disk (stat only, no parsing)."""
+    db = db or DB; state_path = state_path or STATE; issues_dir = issues_dir or ISS
+    if not db.exists() or not state_path.exists():
+        return False
+    try:
+        state = json.loads(state_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return False
+    seen = 0
+    for p in issues_dir.glob('*/*/*.json'):
+        seen += 1
+        if state.get(str(p.relative_to(issues_dir.parent))) != p.stat().st_mtime_ns:
+            return False
+    return seen == len(state)
+
+def stats_from_index(db=None, profiler=None):
+    """Snapshot stats from the materialized `stats` table, or GROUP BY queries on older indexes."""
+    con = sqlite3.connect(f'file:{db or DB}?mode=ro', uri=True)
+    if profiler: profiler.trace(con)
+    try:
+        cur = con.cursor()
+        stats = _empty_stats()
+        if index_stats.has_stats_table(con):
+            agg = index_stats.read_stats(con)
+            for k in ('total', 'by_source', 'by_language', 'by_severity'):
+                stats[k] = agg[k]
+            stats['top_cwe'] = sorted(agg['by_cwe'].items(), key=lambda kv: (-kv[1], kv[0]))[:TOP_N]
+        else:
+            stats['total'] = cur.execute('SELECT COUNT(*) FROM issues').fetchone()[0]
+            stats['by_source'] = dict(cur.execute('SELECT source, COUNT(*) FROM issues GROUP BY source'))
+            stats['by_language'] = dict(cur.execute(
+                "SELECT LOWER(COALESCE(NULLIF(language,''),'unknown')) AS lang, COUNT(*) FROM issues GROUP BY lang"))
+            stats['by_severity'] = dict(cur.execute(
+                "SELECT COALESCE(NULLIF(severity,''),'unknown') AS sev, COUNT(*) FROM issues GROUP BY sev"))
+            stats['top_cwe'] = cur.execute(
+                "SELECT j.value, COUNT(*) AS n FROM issues, json_each(issues.taxonomy_json, '$.cwe') AS j"
+                " WHERE json_valid(issues.taxonomy_json) GROUP BY j.value ORDER BY n DESC, j.value LIMIT ?",
+                (TOP_N,)).fetchall()
+        stats['recent'] = cur.execute(
+            'SELECT updated_at, issue_id, title FROM issues WHERE updated_at IS NOT NULL'
+            ' ORDER BY updated_at DESC, issue_id DESC LIMIT ?', (TOP_N,)).fetchall()
+    finally:
+        con.close()
+    return stats
+
+def _summarize(path):
+    doc = load_json(pathlib.Path(path))
+    cwe = (doc.get('taxonomy') or {}).get('cwe') or []
+    return (doc['source'], (doc.get('language') or 'unknown').lower(), doc.get('severity') or 'unknown',
+            tuple(str(c) for c in cwe), doc.get('updated_at'), doc['issue_id'], doc['title'])
+
+def stats_from_files(workers=None):
+    """Fallback: parse every issue file, in parallel once the corpus is large enough."""
+    paths = [str(p) for p in ISS.glob('*/*/*.json')]
+    if len(paths) >= PARALLEL_MIN_FILES and (workers or os.cpu_count() or 1) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(_summarize, paths, chunksize=256))
+    else:
+        rows = [_summarize(p) for p in paths]
+    stats = _empty_stats(); cwes = {}; recent = []
+    for src, lang, sev, cwe, updated, issue_id, title in rows:
+        stats['total'] += 1
+        stats['by_source'][src] = stats['by_source'].get(src,0)+1
+        stats['by_language'][lang] = stats['by_language'].get(lang,0)+1
+        stats['by_severity'][sev] = stats['by_severity'].get(sev,0)+1
+        for c in cwe: cwes[c] = cwes.get(c,0)+1
+        if updated: recent.append((updated, issue_id, title))
+    stats['top_cwe'] = sorted(cwes.items(), key=lambda kv: (-kv[1], kv[0]))[:TOP_N]
+    stats['recent'] = heapq.nlargest(TOP_N, recent)
+    return stats
+
+def count_docs(profiler=None):
+    """Snapshot stats from the index when it is fresh, otherwise from the files."""
+    if index_is_fresh():
+        try:
+            return stats_from_index(profiler=profiler)
+        except sqlite3.Error:
+            pass
+    return stats_from_files()
 
 def frontmatter(title: str):
     now = datetime.datetime.utcnow().replace(microsecond=0).isoformat() + 'Z'
@@ -33,12 +116,19 @@ def render_product_context():
         '**Constraints:** Local-only, auditable, license-aware; files are the source of truth; SQLite FTS for fast search.\n'
     )
 
-def render_system_patterns(total, by_source, by_lang):
-    rows = '\n'.join([f'- {k}: {v}' for k,v in sorted(by_source.items())]) or '- (none)'
-    langs = '\n'.join([f'- {k}: {v}' for k,v in sorted(by_lang.items())]) or '- (none)'
+def _bullets(items):
+    return '\n'.join([f'- {k}: {v}' for k,v in items]) or '- (none)'
+
+def render_system_patterns(stats):
+    rows = _bullets(sorted(stats['by_source'].items()))
+    langs = _bullets(sorted(stats['by_language'].items()))
+    sevs = _bullets(sorted(stats['by_severity'].items()))
+    cwes = _bullets(stats['top_cwe'])
+    recent = '\n'.join([f'- {u}: {t} (`{i}`)' for u,i,t in stats['recent']]) or '- (none)'
     return frontmatter('System Patterns') + (
         '# System Patterns\n\n'
-        f'## Dataset Snapshot\n- Total issues: {total}\n- By source:\n{rows}\n- By language:\n{langs}\n\n'
+        f'## Dataset Snapshot\n- Total issues: {stats["total"]}\n- By source:\n{rows}\n- By language:\n{langs}\n'
+        f'- By severity:\n{sevs}\n- Top CWE:\n{cwes}\n- Recently updated:\n{recent}\n\n'
         '## Access Patterns\n'
         '1. Search via `issuesdb/issues.sqlite` (FTS5) → `issue_id` → open JSON.\n'
         '2. File-first reads for deterministic traversal.\n'
@@ -60,12 +150,19 @@ def render_progress():
         '- [ ] Wire into SPARC ingest\n- [ ] Add SO/other sources with attribution\n- [ ] Set up refresh\n'
     )
 
-def main():
-    total, by_source, by_lang = count_docs()
-    (MB / 'productContext.md').write_text(render_product_context(), encoding='utf-8')
-    (MB / 'systemPatterns.md').write_text(render_system_patterns(total, by_source, by_lang), encoding='utf-8')
-    (MB / 'decisionLog.md').write_text(render_decision_log(), encoding='utf-8')
-    (MB / 'progress.md').write_text(render_progress(), encoding='utf-8')
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    add_profile_arguments(ap)
+    args = ap.parse_args(argv)
+    with Profiler.from_args('render_memory_bank', uuid.uuid4().hex[:8], args) as profiler:
+        with profiler.stage('stats'):
+            stats = count_docs(profiler)
+        with profiler.stage('render'):
+            MB.mkdir(parents=True, exist_ok=True)
+            (MB / 'productContext.md').write_text(render_product_context(), encoding='utf-8')
+            (MB / 'systemPatterns.md').write_text(render_system_patterns(stats), encoding='utf-8')
+            (MB / 'decisionLog.md').write_text(render_decision_log(), encoding='utf-8')
+            (MB / 'progress.md').write_text(render_progress(), encoding='utf-8')
     print('Rendered memory_bank/*.md')
 
 if __name__ == '__main__':
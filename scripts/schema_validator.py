@@ -0,0 +1,299 @@
+"""Validate issue documents against ``schemas/issue.schema.json``.
+
+``compile_schema`` turns a JSON Schema into the source of one Python function,
+with a branch per property, and compiles it once. Validating a document then
+runs straight-line checks: ``type(v) is str`` tests, dict lookups and loops
+over arrays. It never walks the schema per call. Types are matched exactly,
+as ``json.loads`` produces them, so ``true`` is not accepted as a number.
+
+Supported keywords: ``type``, ``enum``, ``const``, ``required``,
+``properties``, ``additionalProperties``, ``items``, ``minItems``,
+``maxItems``, ``minLength``, ``maxLength``, ``pattern``, ``minimum`` and
+``maximum``. Annotations such as ``title`` and ``format`` are ignored. Any
+other keyword is rejected at compile time, so it is never silently skipped.
+
+Errors are ``SchemaError(path, message)``, and ``path`` is a JSON Pointer into
+the document. The CLI validates the whole corpus in parallel and prints one
+line per error:
+
+Usage:
+    python scripts/schema_validator.py [--root issuesdb/issues] [--workers N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from json_utils import load_json
+
+SCHEMA_PATH = Path(__file__).resolve().parents[1] / 'schemas' / 'issue.schema.json'
+ROOT = Path('issuesdb/issues')
+CHUNK_FILES = 512
+PARALLEL_MIN_FILES = 2000
+
+_JSON_TYPES: Dict[str, Tuple[type, ...]] = {
+    'string': (str,),
+    'number': (int, float),
+    'integer': (int,),
+    'boolean': (bool,),
+    'object': (dict,),
+    'array': (list,),
+    'null': (type(None),),
+}
+_ANNOTATIONS = {'$schema', '$id', '$comment', 'title', 'description', 'default', 'examples', 'format'}
+_KEYWORDS = _ANNOTATIONS | {
+    'type', 'enum', 'const', 'required', 'properties', 'additionalProperties', 'items',
+    'minItems', 'maxItems', 'minLength', 'maxLength', 'pattern', 'minimum', 'maximum',
+}
+_MISSING = object()
+
+
+@dataclass(frozen=True)
+class SchemaError:
+    path: str
+    message: str
+
+    def __str__(self) -> str:
+        return f'{self.path or "/"}: {self.message}'
+
+
+Validator = Callable[[Any], List[SchemaError]]
+
+
+class _Compiler:
+    """Emit Python source for one schema; constants go to a shared namespace."""
+
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+        self.namespace: Dict[str, Any] = {'SchemaError': SchemaError, '_MISSING': _MISSING}
+        self.depth = 0
+
+    def const(self, value: Any) -> str:
+        name = f'_C{len(self.namespace)}'
+        self.namespace[name] = value
+        return name
+
+    def line(self, indent: int, text: str) -> None:
+        self.lines.append('    ' * indent + text)
+
+    def error(self, indent: int, path: Sequence[str], message: str) -> None:
+        self.line(indent, f'errors.append(SchemaError({_path_expr(path)}, {message}))')
+
+    def emit(self, schema: Mapping[str, Any], var: str, path: List[str], indent: int) -> None:
+        unknown = set(schema) - _KEYWORDS
+        if unknown:
+            raise ValueError(f'unsupported schema keywords at {"".join(path) or "/"}: {sorted(unknown)}')
+        types = schema.get('type')
+        names = [types] if isinstance(types, str) else list(types or _JSON_TYPES)
+        allowed = tuple(dict.fromkeys(t for n in names for t in _JSON_TYPES[n]))
+        if types is not None:
+            if len(allowed) == 1:
+                test = f'type({var}) is not {self.const(allowed[0])}'
+            else:
+                test = f'type({var}) not in {self.const(frozenset(allowed))}'
+            self.line(indent, f'if {test}:')
+            expected = ' or '.join(names)
+            self.error(indent + 1, path, f"f'expected {expected}, got {{_jtype({var})}}'")
+            before = len(self.lines)
+            self.line(indent, 'else:')
+            self.body(schema, var, path, indent + 1, allowed)
+            if len(self.lines) == before + 1:
+                self.lines.pop()  # nothing beyond the type test
+        else:
+            self.body(schema, var, path, indent, allowed)
+
+    def body(self, schema: Mapping[str, Any], var: str, path: List[str], indent: int, allowed: Tuple[type, ...]) -> None:
+        if 'enum' in schema:
+            self.line(indent, f'if {var} not in {self.const(list(schema["enum"]))}:')
+            self.error(indent + 1, path, repr(f'not one of {schema["enum"]!r}'))
+        if 'const' in schema:
+            self.line(indent, f'if {var} != {self.const(schema["const"])}:')
+            self.error(indent + 1, path, repr(f'must be {schema["const"]!r}'))
+        self.guarded((str,), allowed, var, indent, lambda i: self.string(schema, var, path, i),
+                     ('minLength', 'maxLength', 'pattern'), schema)
+        self.guarded((int, float), allowed, var, indent, lambda i: self.number(schema, var, path, i),
+                     ('minimum', 'maximum'), schema)
+        self.guarded((dict,), allowed, var, indent, lambda i: self.object(schema, var, path, i),
+                     ('required', 'properties', 'additionalProperties'), schema)
+        self.guarded((list,), allowed, var, indent, lambda i: self.array(schema, var, path, i),
+                     ('items', 'minItems', 'maxItems'), schema)
+
+    def guarded(self, kinds: Tuple[type, ...], allowed: Tuple[type, ...], var: str, indent: int,
+                emit: Callable[[int], None], keywords: Tuple[str, ...], schema: Mapping[str, Any]) -> None:
+        """Emit keyword checks that apply to one JSON type, behind a type test if needed."""
+
+        if not any(k in schema for k in keywords) or not set(kinds) & set(allowed):
+            return
+        if set(allowed) <= set(kinds):
+            emit(indent)
+            return
+        self.line(indent, f'if type({var}) in {self.const(frozenset(kinds))}:')
+        emit(indent + 1)
+
+    def string(self, schema: Mapping[str, Any], var: str, path: List[str], indent: int) -> None:
+        if 'minLength' in schema:
+            self.line(indent, f'if len({var}) < {int(schema["minLength"])}:')
+            self.error(indent + 1, path, repr(f'shorter than {schema["minLength"]} characters'))
+        if 'maxLength' in schema:
+            self.line(indent, f'if len({var}) > {int(schema["maxLength"])}:')
+            self.error(indent + 1, path, repr(f'longer than {schema["maxLength"]} characters'))
+        if 'pattern' in schema:
+            self.line(indent, f'if {self.const(re.compile(schema["pattern"]))}.search({var}) is None:')
+            self.error(indent + 1, path, repr(f'does not match {schema["pattern"]!r}'))
+
+    def number(self, schema: Mapping[str, Any], var: str, path: List[str], indent: int) -> None:
+        if 'minimum' in schema:
+            self.line(indent, f'if {var} < {self.const(schema["minimum"])}:')
+            self.error(indent + 1, path, repr(f'less than {schema["minimum"]}'))
+        if 'maximum' in schema:
+            self.line(indent, f'if {var} > {self.const(schema["maximum"])}:')
+            self.error(indent + 1, path, repr(f'greater than {schema["maximum"]}'))
+
+    def object(self, schema: Mapping[str, Any], var: str, path: List[str], indent: int) -> None:
+        for name in schema.get('required', ()):
+            self.line(indent, f'if {name!r} not in {var}:')
+            self.error(indent + 1, path, repr(f'missing required property {name!r}'))
+        properties = schema.get('properties', {})
+        for name, sub in properties.items():
+            child = self.fresh()
+            self.line(indent, f'{child} = {var}.get({name!r}, _MISSING)')
+            self.line(indent, f'if {child} is not _MISSING:')
+            before = len(self.lines)
+            self.emit(sub, child, path + [repr('/' + _escape(name))], indent + 1)
+            if len(self.lines) == before:
+                self.lines[-2:] = []  # unconstrained property
+        extra = schema.get('additionalProperties', True)
+        if extra is True:
+            return
+        key = self.fresh()
+        self.line(indent, f'for {key} in {var}.keys() - {self.const(frozenset(properties))}:')
+        if extra is False:
+            self.error(indent + 1, path + [f"'/' + _escape({key})"], repr('unexpected property'))
+        else:
+            self.emit(extra, f'{var}[{key}]', path + [f"'/' + _escape({key})"], indent + 1)
+
+    def array(self, schema: Mapping[str, Any], var: str, path: List[str], indent: int) -> None:
+        if 'minItems' in schema:
+            self.line(indent, f'if len({var}) < {int(schema["minItems"])}:')
+            self.error(indent + 1, path, repr(f'fewer than {schema["minItems"]} items'))
+        if 'maxItems' in schema:
+            self.line(indent, f'if len({var}) > {int(schema["maxItems"])}:')
+            self.error(indent + 1, path, repr(f'more than {schema["maxItems"]} items'))
+        if 'items' in schema:
+            index, item = self.fresh(), self.fresh()
+            self.line(indent, f'for {index}, {item} in enumerate({var}):')
+            self.emit(schema['items'], item, path + [f"'/' + str({index})"], indent + 1)
+
+    def fresh(self) -> str:
+        self.depth += 1
+        return f'v{self.depth}'
+
+
+def _path_expr(path: Sequence[str]) -> str:
+    return ' + '.join(path) if path else "''"
+
+
+def _escape(name: str) -> str:
+    return name.replace('~', '~0').replace('/', '~1')
+
+
+def _jtype(value: Any) -> str:
+    for name, types in _JSON_TYPES.items():
+        if type(value) in types:
+            return name
+    return type(value).__name__
+
+
+def compile_schema(schema: Mapping[str, Any]) -> Validator:
+    """Compile ``schema`` into ``validate(doc) -> [SchemaError, ...]``."""
+
+    compiler = _Compiler()
+    compiler.namespace.update(_escape=_escape, _jtype=_jtype)
+    compiler.line(0, 'def validate(v0):')
+    compiler.line(1, 'errors = []')
+    compiler.emit(schema, 'v0', [], 1)
+    compiler.line(1, 'return errors')
+    source = '\n'.join(compiler.lines) + '\n'
+    exec(compile(source, f'<schema {schema.get("title", "")}>', 'exec'), compiler.namespace)
+    validate = compiler.namespace['validate']
+    validate.source = source
+    return validate
+
+
+def load_schema(path: Path = SCHEMA_PATH) -> Dict[str, Any]:
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+validate_issue = compile_schema(load_schema())
+
+
+def format_errors(errors: Iterable[SchemaError], limit: int = 5) -> str:
+    errors = list(errors)
+    text = '; '.join(str(e) for e in errors[:limit])
+    return text + (f' (+{len(errors) - limit} more)' if len(errors) > limit else '')
+
+
+def validate_file(path: Path, validate: Validator = validate_issue) -> List[SchemaError]:
+    """Errors for one issue file; unreadable or malformed JSON is reported at ``/``."""
+
+    try:
+        doc = load_json(path)
+    except (OSError, ValueError) as exc:
+        return [SchemaError('', f'unreadable: {exc}')]
+    return validate(doc)
+
+
+def _validate_chunk(paths: List[str]) -> List[Tuple[str, List[SchemaError]]]:
+    out = []
+    for p in paths:
+        errors = validate_file(Path(p))
+        if errors:
+            out.append((p, errors))
+    return out
+
+
+def validate_files(paths: Sequence[Path], workers: Optional[int] = None) -> List[Tuple[str, List[SchemaError]]]:
+    """``(path, errors)`` for every invalid file, in ``paths`` order.
+
+    Files are handed to worker processes in chunks of ``CHUNK_FILES`` so each
+    task returns only the failures, not the parsed documents.
+    """
+
+    names = [str(p) for p in paths]
+    chunks = [names[i:i + CHUNK_FILES] for i in range(0, len(names), CHUNK_FILES)]
+    if len(names) >= PARALLEL_MIN_FILES and (workers or os.cpu_count() or 1) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_validate_chunk, chunks))
+    else:
+        results = [_validate_chunk(c) for c in chunks]
+    return [failure for chunk in results for failure in chunk]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description='Validate issue files against schemas/issue.schema.json')
+    ap.add_argument('--root', type=Path, default=ROOT)
+    ap.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    return ap.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    paths = sorted(args.root.glob('*/*/*.json'))
+    failures = validate_files(paths, workers=args.workers)
+    for path, errors in failures:
+        for error in errors:
+            print(f'{path}: {error}')
+    print(f'{len(paths)} files, {len(failures)} invalid', file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
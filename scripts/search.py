@@ -1,46 +1,171 @@
 from __future__ import annotations
 
+import argparse
+import json
 import logging
+import re
 import sqlite3
+import sys
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import dedup
+import index_generations
+import shards
+import sqlite_profile
+from fts_query import COLUMN_ALIASES, bm25_expr, compile_query, phrase, query_terms
+from profiling import Profiler, add_profile_arguments
+from snippets import SNIPPET_TOKENS, excerpt
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from monitoring.registry import REGISTRY  # noqa: E402
 
 DB = Path('issuesdb/issues.sqlite')
+# Reader settings (see sqlite_profile.py); IMMUTABLE is only safe for serving snapshots.
+PROFILE = sqlite_profile.SERVING
+IMMUTABLE = False
 logger = logging.getLogger(__name__)
 
 _metrics = {'queries': 0, 'seconds_total': 0.0}
+QUERY_SECONDS = REGISTRY.histogram('search_query_seconds', 'Search query latency in seconds', ('plan',))
+QUERIES = REGISTRY.counter('search_queries_total', 'Search queries by plan and outcome', ('plan', 'outcome'))
+
+# Rows fetched per requested hit when collapsing near-duplicate clusters.
+COLLAPSE_OVERFETCH = 3
+# Threads for query_shards; SQLite releases the GIL while a statement runs.
+SHARD_WORKERS = 8
+SIGNAL_COLUMNS = '{signals_concat title}'
+
+# Shapes that name one signal value exactly.
+_SIGNAL_SHAPES = (
+    ('rule_id', re.compile(r'^[A-Za-z][\w.-]*:[\w.-]+$')),  # python:S1234, eslint:no-undef
+    ('error_code', re.compile(r'^[A-Z]{1,6}-?\d{2,}$')),  # E501, TS2345, CWE-79
+    ('signature', re.compile(r'^[A-Za-z_$][\w$]*(?:[.#][A-Za-z_$][\w$]*)+(?:\(.*\))?$|^[A-Za-z_$][\w$]*\(.*\)$')),
+)
+
+_COLUMNS = 'i.issue_id, i.title, i.summary, i.fix_steps, i.language'
+_FTS_SQL = (
+    f'SELECT {_COLUMNS}, {bm25_expr()} AS score'
+    '  FROM fts_issues'
+    '  JOIN issues AS i ON i.rowid = fts_issues.rowid'
+    ' WHERE fts_issues MATCH ?'
+    ' ORDER BY score'
+    ' LIMIT ?'
+)
+# Exact signal hits carry no bm25 score; query_shards ranks them first.
+_SIGNAL_SQL = (
+    f'SELECT {_COLUMNS}, NULL AS score'
+    '  FROM issues AS i'
+    ' WHERE i.issue_id IN (SELECT issue_id FROM signals WHERE value = ?)'
+    ' ORDER BY i.frequency DESC, i.issue_id'
+    ' LIMIT ?'
+)
+
+
+@dataclass(frozen=True)
+class Plan:
+    """How a query is served.
+
+    ``signal``: exact ``signals.value`` lookup, then a phrase match scoped to the
+    signal and title columns if the lookup finds nothing. ``fts``: the query
+    compiled by ``fts_query.compile_query``.
+    """
+
+    kind: str
+    shape: Optional[str]
+    match: str
+    value: Optional[str] = None
+
+
+def plan_query(query: str) -> Plan:
+    text = query.strip()
+    # ``title:word`` is a column filter for compile_query, not a rule id.
+    if text and len(text.split()) == 1 and text.split(':', 1)[0].lower() not in COLUMN_ALIASES:
+        for shape, pattern in _SIGNAL_SHAPES:
+            if pattern.match(text):
+                return Plan('signal', shape, f'{SIGNAL_COLUMNS} : {phrase(text)}', text)
+    return Plan('fts', None, compile_query(text))
+
 
+def _execute(cur: sqlite3.Cursor, plan: Plan, limit: int) -> Tuple[str, list]:
+    """Run ``plan``; returns the step that produced the rows and the rows."""
 
-def _prepare_query(query: str) -> str:
-    return ' '.join(f"{term}*" for term in query.split())
+    if plan.value is not None:
+        try:
+            rows = cur.execute(_SIGNAL_SQL, (plan.value, limit)).fetchall()
+        except sqlite3.OperationalError:
+            # Indexes built before the signals table existed; the FTS fallback covers them.
+            rows = []
+        if rows:
+            return 'signal', rows
+        return 'signal_fts', cur.execute(_FTS_SQL, (plan.match, limit)).fetchall()
+    return 'fts', cur.execute(_FTS_SQL, (plan.match, limit)).fetchall()
 
 
-def query_fts(db_path: Path | str, query: str, limit: int) -> List[Dict[str, str]]:
+def _collapse(con: sqlite3.Connection, rows: List[Dict], limit: int) -> List[Dict]:
+    """Keep the best-ranked row per near-duplicate cluster (see ``dedup.py``)."""
+
+    clusters = dedup.cluster_ids(con, [r['issue_id'] for r in rows])
+    kept: Dict[str, Dict] = {}
+    for row in rows:
+        cluster = clusters.get(row['issue_id'], row['issue_id'])
+        if cluster in kept:
+            kept[cluster]['duplicates'] += 1
+        elif len(kept) < limit:
+            kept[cluster] = {**row, 'cluster_id': cluster, 'duplicates': 0}
+    return list(kept.values())
+
+
+def query_fts(
+    db_path: Path | str,
+    query: str,
+    limit: int,
+    *,
+    on_connect: Optional[Callable[[sqlite3.Connection], None]] = None,
+    snippets: bool = False,
+    snippet_tokens: int = SNIPPET_TOKENS,
+    collapse: bool = False,
+    immutable: Optional[bool] = None,
+    reader: Optional[index_generations.Reader] = None,
+    scores: bool = False,
+) -> List[Dict[str, str]]:
+    """Ranked hits for ``query``.
+
+    With ``snippets=True`` each hit is ``issue_id``, a highlighted ``title``,
+    ``language`` and a short highlighted ``snippet`` from the best matching
+    ``field``, instead of the full ``summary``/``fix_steps`` text. With
+    ``collapse=True`` only the best hit of each near-duplicate cluster is kept,
+    with its ``cluster_id`` and the number of ``duplicates`` it stands for.
+    ``immutable`` opens ``db_path`` as a serving snapshot that takes no locks;
+    it defaults to ``IMMUTABLE``, or true for a generational index. A
+    ``reader`` supplies a long-lived connection instead of a new one per query.
+    ``scores=True`` adds each hit's weighted bm25 ``score`` (lower is better;
+    ``None`` for exact signal hits).
+    """
+
     assert limit > 0
     if not query:
         return []
-    fts_query = _prepare_query(query)
-    start = time.time()
-    con = sqlite3.connect(db_path)
+    plan = plan_query(query)
+    if not plan.match:
+        return []
+    step = plan.kind
+    start = time.perf_counter()
+    if reader is not None:
+        con = reader.connection()
+    else:
+        if immutable is None:
+            immutable = IMMUTABLE or index_generations.is_managed(Path(db_path))
+        con = sqlite_profile.connect_reader(db_path, PROFILE, immutable=immutable)
+        if on_connect is not None:
+            on_connect(con)
     try:
-        cur = con.cursor()
-        cur.execute(
-            (
-                'SELECT i.issue_id,'
-                '       i.title,'
-                '       i.summary,'
-                '       i.fix_steps,'
-                '       i.language'
-                '  FROM fts_issues'
-                '  JOIN issues AS i ON i.rowid = fts_issues.rowid'
-                ' WHERE fts_issues MATCH ?'
-                ' ORDER BY bm25(fts_issues)'
-                ' LIMIT ?'
-            ),
-            (fts_query, limit),
-        )
+        step, raw = _execute(con.cursor(), plan, limit * COLLAPSE_OVERFETCH if collapse else limit)
         rows = [
             {
                 'issue_id': r[0],
@@ -48,22 +173,154 @@ def query_fts(db_path: Path | str, query: str, limit: int) -> List[Dict[str, str
                 'summary': r[2],
                 'fix_steps': r[3],
                 'language': r[4],
+                **({'score': r[5]} if scores else {}),
             }
-            for r in cur.fetchall()
+            for r in raw
         ]
+        if collapse:
+            rows = _collapse(con, rows, limit)
+    except sqlite3.Error:
+        QUERIES.inc(plan=step, outcome='error')
+        raise
     finally:
-        con.close()
-    elapsed = time.time() - start
+        if reader is None:
+            con.close()
+    if snippets:
+        terms = query_terms(query)
+        rows = [
+            {
+                **excerpt(r, terms, size=snippet_tokens),
+                **{k: r[k] for k in ('cluster_id', 'duplicates', 'score') if k in r},
+            }
+            for r in rows
+        ]
+    elapsed = time.perf_counter() - start
     _metrics['queries'] += 1
     _metrics['seconds_total'] += elapsed
-    logger.info('search query=%s limit=%s seconds=%s', query, limit, round(elapsed, 4))
+    QUERY_SECONDS.observe(elapsed, plan=step)
+    QUERIES.inc(plan=step, outcome='hit' if rows else 'empty')
+    logger.info('search query=%s plan=%s limit=%s seconds=%s', query, step, limit, round(elapsed, 4))
     return rows
 
 
+def _rank(row: Dict) -> Tuple[bool, float]:
+    return row['score'] is not None, row['score'] or 0.0
+
+
+def query_shards(
+    shards_dir: Path | str,
+    query: str,
+    limit: int,
+    *,
+    languages: Optional[Iterable[str]] = None,
+    sources: Optional[Iterable[str]] = None,
+    workers: Optional[int] = None,
+    snippets: bool = False,
+    snippet_tokens: int = SNIPPET_TOKENS,
+    collapse: bool = False,
+) -> List[Dict[str, str]]:
+    """Fan ``query`` out over the shards of a sharded layout (see ``shards.py``).
+
+    ``languages``/``sources`` prune shards before any is opened. Each remaining
+    shard is queried on a thread pool for its own top ``limit`` hits. The hits
+    are merged by bm25 score, exact signal hits first. bm25 weighs terms by
+    their frequency within each shard, so scores from different shards are not
+    strictly comparable and the merged order can differ from that of one index.
+    ``collapse`` works within a shard only. Each hit carries its ``score``.
+    """
+
+    assert limit > 0
+    targets = shards.discover(Path(shards_dir), languages=languages, sources=sources)
+    if not targets or not query:
+        return []
+
+    def one(shard: shards.Shard) -> List[Dict[str, str]]:
+        return query_fts(
+            shard.db,
+            query,
+            limit,
+            snippets=snippets,
+            snippet_tokens=snippet_tokens,
+            collapse=collapse,
+            scores=True,
+        )
+
+    if len(targets) == 1:
+        results = [one(targets[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(len(targets), workers or SHARD_WORKERS)) as pool:
+            results = list(pool.map(one, targets))
+    return sorted((row for rows in results for row in rows), key=_rank)[:limit]
+
+
 @lru_cache(maxsize=128)
-def search(query: str, limit: int) -> List[Dict[str, str]]:
+def _cached_search(query: str, limit: int, generation: Optional[Tuple[int, int]]) -> List[Dict[str, str]]:
     return query_fts(DB, query, limit)
 
 
+def search(query: str, limit: int) -> List[Dict[str, str]]:
+    """Cached ``query_fts`` on ``DB``; a newly published index generation misses the cache."""
+
+    return _cached_search(query, limit, index_generations.generation_token(DB))
+
+
+search.cache_clear = _cached_search.cache_clear  # type: ignore[attr-defined]
+
+
 def get_metrics() -> Dict[str, float]:
     return dict(_metrics)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description='Search the issue index')
+    ap.add_argument('query')
+    ap.add_argument('--limit', type=int, default=10)
+    ap.add_argument('--db-path', type=Path, default=DB)
+    ap.add_argument('--repeat', type=int, default=1, help='run the query N times (for profiling)')
+    ap.add_argument('--full', action='store_true', help='print whole summary/fix_steps instead of snippets')
+    ap.add_argument('--snippet-tokens', type=int, default=SNIPPET_TOKENS)
+    ap.add_argument('--collapse', action='store_true', help='one hit per near-duplicate cluster')
+    ap.add_argument('--immutable', action='store_true', help='open --db-path as an immutable serving snapshot')
+    ap.add_argument('--shards', type=Path, help='query the sharded layout in this directory instead of --db-path')
+    ap.add_argument('--lang', type=shards.parse_list, help='with --shards: only these languages (comma-separated)')
+    ap.add_argument('--source', type=shards.parse_list, help='with --shards: only these sources (comma-separated)')
+    add_profile_arguments(ap)
+    args = ap.parse_args(argv)
+    if args.limit <= 0 or args.repeat <= 0 or args.snippet_tokens <= 0:
+        ap.error('--limit, --repeat and --snippet-tokens must be positive')
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    with Profiler.from_args('search', uuid.uuid4().hex[:8], args) as profiler:
+        for _ in range(args.repeat):
+            with profiler.stage('query'):
+                if args.shards:
+                    rows = query_shards(
+                        args.shards,
+                        args.query,
+                        args.limit,
+                        languages=args.lang,
+                        sources=args.source,
+                        snippets=not args.full,
+                        snippet_tokens=args.snippet_tokens,
+                        collapse=args.collapse,
+                    )
+                else:
+                    rows = query_fts(
+                        args.db_path,
+                        args.query,
+                        args.limit,
+                        on_connect=profiler.trace,
+                        snippets=not args.full,
+                        snippet_tokens=args.snippet_tokens,
+                        collapse=args.collapse,
+                        immutable=args.immutable or None,
+                    )
+    for row in rows:
+        print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
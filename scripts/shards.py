@@ -0,0 +1,210 @@
+"""Optional sharded layout: one index per ``<source>/<language>`` partition.
+
+The issue files are already partitioned on disk as
+``issues/<source>/<language>/``. ``build`` gives each partition its own
+database with the full schema (FTS, signals, stats, MinHash). Shards are built
+by separate worker processes, so partitions are written in parallel and no
+single B-tree grows with the whole corpus:
+
+    issuesdb/shards/<source>/<language>.sqlite
+    issuesdb/shards/<source>/<language>.state.json
+
+Each worker runs ``build_index.main`` with its paths pointed at one partition,
+so flags such as ``--shadow`` or ``--fts-maintenance`` apply per shard. The
+shard of a partition that no longer exists is removed. Workers send their metrics
+registry back, and ``build`` writes the ``METRICS_PROM_PATH`` textfile once for
+all shards.
+``search.query_shards`` fans queries out across the shards.
+
+Usage:
+    python scripts/shards.py build [--workers N] [-- build_index flags]
+    python scripts/shards.py list [--lang py,ts] [--source sonar]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import index_generations
+
+ROOT = Path('issuesdb')
+SHARDS_DIR = 'shards'
+PROM_ENV = 'METRICS_PROM_PATH'
+_BUILD_GLOBALS = ('ROOT', 'SQL', 'DB', 'STATE', 'PARTITION')
+
+
+@dataclass(frozen=True)
+class Shard:
+    source: str
+    language: str
+    db: Path
+
+    @property
+    def state(self) -> Path:
+        return self.db.with_name(f'{self.language}.state.json')
+
+
+def shard_for(shards_dir: Path, source: str, language: str) -> Shard:
+    return Shard(source, language, Path(shards_dir) / source / f'{language}.sqlite')
+
+
+def partitions(root: Path) -> List[tuple]:
+    """``(source, language)`` of every partition directory under ``root/issues``."""
+
+    issues = Path(root) / 'issues'
+    if not issues.is_dir():
+        return []
+    return sorted((p.parent.name, p.name) for p in issues.glob('*/*') if p.is_dir())
+
+
+def _matches(value: str, allowed: Optional[Iterable[str]]) -> bool:
+    return allowed is None or value in set(allowed)
+
+
+def discover(
+    shards_dir: Path,
+    *,
+    languages: Optional[Iterable[str]] = None,
+    sources: Optional[Iterable[str]] = None,
+) -> List[Shard]:
+    """Built shards under ``shards_dir``, pruned to ``languages``/``sources`` when given."""
+
+    shards_dir = Path(shards_dir)
+    if not shards_dir.is_dir():
+        return []
+    languages = None if languages is None else set(languages)
+    sources = None if sources is None else set(sources)
+    found = []
+    for db in sorted(shards_dir.glob('*/*.sqlite')):
+        shard = Shard(db.parent.name, db.stem, db)
+        if _matches(shard.source, sources) and _matches(shard.language, languages):
+            found.append(shard)
+    return found
+
+
+def _build_one(
+    root: str,
+    shards_dir: str,
+    sql: str,
+    source: str,
+    language: str,
+    argv: List[str],
+    isolated: bool = False,
+) -> Dict:
+    """Build one shard. ``isolated`` (a pool worker) returns its metrics under ``'metrics'``."""
+
+    import build_index
+
+    shard = shard_for(Path(shards_dir), source, language)
+    shard.db.parent.mkdir(parents=True, exist_ok=True)
+    saved = {name: getattr(build_index, name) for name in _BUILD_GLOBALS}
+    build_index.ROOT = Path(root)
+    build_index.SQL = Path(sql)
+    build_index.DB = shard.db
+    build_index.STATE = shard.state
+    build_index.PARTITION = (source, language)
+    # build() writes the textfile once; concurrent per-shard writes would leave only the last shard.
+    prom_path = os.environ.pop(PROM_ENV, None)
+    if isolated:
+        # A pool worker may have built another shard before this one.
+        build_index.REGISTRY.reset()
+    start = time.perf_counter()
+    try:
+        build_index.main(argv)
+    finally:
+        # Without a pool, shards are built in this process.
+        for name, value in saved.items():
+            setattr(build_index, name, value)
+        if prom_path is not None:
+            os.environ[PROM_ENV] = prom_path
+    result = {'source': source, 'language': language, 'seconds': round(time.perf_counter() - start, 3)}
+    if isolated:
+        result['metrics'] = build_index.REGISTRY
+    return result
+
+
+def remove(shard: Shard) -> None:
+    """Delete a shard's database, state and any generations."""
+
+    for _, path in index_generations.generations(shard.db):
+        index_generations.discard(path)
+    index_generations.discard(shard.db)
+    shard.state.unlink(missing_ok=True)
+    shard.state.with_suffix('.governor.json').unlink(missing_ok=True)
+
+
+def build(
+    root: Path,
+    argv: Sequence[str] = (),
+    *,
+    workers: Optional[int] = None,
+    shards_dir: Optional[Path] = None,
+) -> List[Dict]:
+    """Build or update every shard; one worker process per partition at a time."""
+
+    import build_index  # sibling script; imported lazily so search can import this module cheaply
+
+    root = Path(root)
+    shards_dir = Path(shards_dir) if shards_dir is not None else root / SHARDS_DIR
+    parts = partitions(root)
+    live = set(parts)
+    for shard in discover(shards_dir):
+        if (shard.source, shard.language) not in live:
+            remove(shard)
+    jobs = [(str(root), str(shards_dir), str(build_index.SQL.resolve()), s, l, list(argv)) for s, l in parts]
+    if len(jobs) > 1 and (workers or os.cpu_count() or 1) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_build_one, *zip(*jobs), [True] * len(jobs)))
+        for result in results:
+            build_index.REGISTRY.merge(result.pop('metrics'))
+    else:
+        results = [_build_one(*job) for job in jobs]
+    prom_path = os.getenv(PROM_ENV)
+    if prom_path:
+        build_index.REGISTRY.write_textfile(Path(prom_path))
+    return results
+
+
+def parse_list(value: Optional[str]) -> Optional[List[str]]:
+    return [v.strip() for v in value.split(',') if v.strip()] if value else None
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description='Build and list per-partition index shards')
+    sub = ap.add_subparsers(dest='command', required=True)
+    build_p = sub.add_parser('build', help='build one index per <source>/<language> in parallel')
+    build_p.add_argument('--root', type=Path, default=ROOT)
+    build_p.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    build_p.add_argument('build_args', nargs=argparse.REMAINDER, help='flags passed to build_index.py after --')
+    list_p = sub.add_parser('list', help='list built shards')
+    list_p.add_argument('--root', type=Path, default=ROOT)
+    list_p.add_argument('--lang', help='comma-separated languages')
+    list_p.add_argument('--source', help='comma-separated sources')
+    args = ap.parse_args(argv)
+    if args.command == 'build':
+        if args.workers is not None and args.workers <= 0:
+            ap.error('--workers must be positive')
+        if args.build_args[:1] == ['--']:
+            args.build_args = args.build_args[1:]
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.command == 'build':
+        for result in build(args.root, args.build_args, workers=args.workers):
+            print(json.dumps(result))
+        return
+    for shard in discover(args.root / SHARDS_DIR, languages=parse_list(args.lang), sources=parse_list(args.source)):
+        print(json.dumps({'source': shard.source, 'language': shard.language, 'db': str(shard.db)}))
+
+
+if __name__ == '__main__':
+    main()
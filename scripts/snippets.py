@@ -0,0 +1,122 @@
+"""Highlighted excerpts of search hits, cut from the indexed row text.
+
+``fts_issues`` is contentless, so FTS5 ``snippet()``/``highlight()`` have no
+text to work with. ``issues`` already stores ``title``, ``summary`` and
+``fix_steps``, and ``search.query_fts`` fetches them with each hit. This module
+picks the densest window of query terms from that text, so an agent gets a few
+dozen words per hit instead of the whole JSON file.
+
+Matching approximates the ``porter`` tokenizer: exact tokens, prefixes for
+prefix terms, and a light suffix strip (``-s``, ``-es``, ``-ed``, ``-ing``,
+``-ly``). A missed highlight only affects the excerpt, not which issues match.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+SNIPPET_TOKENS = 24
+MARK = ('**', '**')
+ELLIPSIS = '…'
+FIELDS = ('summary', 'fix_steps')
+
+_TOKEN = re.compile(r'[^\W_]+')
+_SUFFIXES = ('ing', 'es', 'ed', 'ly', 's')
+
+Terms = Sequence[Tuple[str, bool]]
+
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def _matcher(terms: Terms):
+    exact = {_stem(t): n for n, (t, _) in enumerate(terms)}
+    prefixes = [(t, n) for n, (t, prefix) in enumerate(terms) if prefix]
+
+    def match(token: str) -> Optional[int]:
+        token = token.lower()
+        hit = exact.get(_stem(token))
+        if hit is None:
+            hit = next((n for t, n in prefixes if token.startswith(t)), None)
+        return hit
+
+    return match
+
+
+def _render(text: str, spans: List[Tuple[int, int, Optional[int]]], mark: Tuple[str, str]) -> str:
+    out: List[str] = []
+    pos = spans[0][0]
+    for start, end, term in spans:
+        out.append(text[pos:start])
+        out.append(f'{mark[0]}{text[start:end]}{mark[1]}' if term is not None else text[start:end])
+        pos = end
+    return ''.join(out)
+
+
+def _scan(text: str, terms: Terms) -> List[Tuple[int, int, Optional[int]]]:
+    match = _matcher(terms)
+    return [(m.start(), m.end(), match(m.group())) for m in _TOKEN.finditer(text)]
+
+
+def highlight(text: Optional[str], terms: Terms, *, mark: Tuple[str, str] = MARK) -> str:
+    """``text`` with every query-term token wrapped in ``mark``."""
+
+    if not text:
+        return text or ''
+    spans = _scan(text, terms)
+    if not spans:
+        return text
+    return text[: spans[0][0]] + _render(text, spans, mark) + text[spans[-1][1]:]
+
+
+def snippet(
+    text: Optional[str],
+    terms: Terms,
+    *,
+    size: int = SNIPPET_TOKENS,
+    mark: Tuple[str, str] = MARK,
+    ellipsis: str = ELLIPSIS,
+) -> Tuple[str, int]:
+    """Best ``size``-token window of ``text``; returns it and its distinct term count.
+
+    Windows are ranked by distinct terms, then total hits. A window starts a
+    quarter of its size before a hit so the match has leading context.
+    """
+
+    spans = _scan(text or '', terms)
+    if not spans:
+        return '', 0
+    hits = [i for i, (_, _, term) in enumerate(spans) if term is not None]
+    best, best_score = 0, (0, 0)
+    for start in dict.fromkeys(max(0, h - size // 4) for h in hits):
+        window = [spans[i][2] for i in range(start, min(len(spans), start + size)) if spans[i][2] is not None]
+        score = (len(set(window)), len(window))
+        if score > best_score:
+            best, best_score = start, score
+    window = spans[best:best + size]
+    body = _render(text or '', window, mark)
+    lead = ellipsis if best > 0 else ''
+    tail = ellipsis if best + size < len(spans) else ''
+    return f'{lead}{body}{tail}', best_score[0]
+
+
+def excerpt(row: Dict[str, Optional[str]], terms: Terms, *, size: int = SNIPPET_TOKENS) -> Dict[str, str]:
+    """Compact hit: highlighted title plus the best snippet across ``FIELDS``."""
+
+    field, text, best = FIELDS[0], '', -1
+    for name in FIELDS:
+        candidate, score = snippet(row.get(name), terms, size=size)
+        if candidate and score > best:
+            field, text, best = name, candidate, score
+    return {
+        'issue_id': row['issue_id'],
+        'title': highlight(row.get('title'), terms),
+        'language': row.get('language') or '',
+        'field': field,
+        'snippet': text,
+    }
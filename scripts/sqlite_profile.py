@@ -0,0 +1,142 @@
+"""SQLite serving profile: page size at build time and pragmas on read connections.
+
+``build_index`` creates a new database with ``Profile.page_size`` and can
+write a serving snapshot with ``VACUUM INTO``. A snapshot is one compact,
+defragmented file in rollback-journal mode, with fresh ``ANALYZE`` statistics,
+so it needs no ``-wal``/``-shm`` files. Readers (``search``, ``check_health``)
+open the database through ``connect_reader``, which applies:
+
+* ``mmap_size``: pages are read through a memory map instead of ``read()``
+  copies into the page cache;
+* ``cache_size``: a larger page cache, for connections that run more than one
+  statement;
+* ``temp_store=MEMORY``: sorter and temporary b-trees (``ORDER BY bm25``,
+  ``GROUP BY``) stay off disk;
+* ``query_only``: accidental writes fail.
+
+``immutable=True`` opens the file with ``?immutable=1``, so SQLite takes no
+locks and does no change detection. Use it only for a snapshot that is never
+modified in place. ``snapshot`` swaps in a new file with ``os.replace``, so the
+old inode is never modified and that holds.
+
+Usage:
+    python scripts/sqlite_profile.py snapshot --db-path issuesdb/issues.sqlite --out issuesdb/serving.sqlite
+    python scripts/sqlite_profile.py show --db-path issuesdb/serving.sqlite [--immutable]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+PathLike = Union[str, Path]
+
+
+@dataclass(frozen=True)
+class Profile:
+    page_size: int = 8192
+    mmap_size: int = 256 * 1024 * 1024
+    cache_kib: int = 32 * 1024
+    temp_store: str = 'MEMORY'
+
+
+SERVING = Profile()
+# SQLite's own defaults, for comparison in benchmarks.
+DEFAULTS = Profile(page_size=4096, mmap_size=0, cache_kib=2000, temp_store='DEFAULT')
+
+
+def apply_build(con: sqlite3.Connection, profile: Profile = SERVING) -> None:
+    """Set the page size; it only takes effect before the first table is created."""
+
+    con.execute(f'PRAGMA page_size={int(profile.page_size)}')
+
+
+def apply_reader(con: sqlite3.Connection, profile: Profile = SERVING, *, query_only: bool = True) -> None:
+    """Reader pragmas; ``query_only=False`` for checks that issue FTS5 commands (``INSERT``)."""
+
+    con.execute(f'PRAGMA mmap_size={int(profile.mmap_size)}')
+    con.execute(f'PRAGMA cache_size=-{int(profile.cache_kib)}')
+    con.execute(f'PRAGMA temp_store={profile.temp_store}')
+    if query_only:
+        con.execute('PRAGMA query_only=ON')
+
+
+def connect_reader(db_path: PathLike, profile: Profile = SERVING, *, immutable: bool = False) -> sqlite3.Connection:
+    """Read-only connection with ``profile`` applied; see the module docstring for ``immutable``."""
+
+    uri = f'{Path(db_path).resolve().as_uri()}?mode=ro'
+    if immutable:
+        uri += '&immutable=1'
+    con = sqlite3.connect(uri, uri=True)
+    try:
+        apply_reader(con, profile)
+    except sqlite3.Error:
+        con.close()
+        raise
+    return con
+
+
+def snapshot(db_path: PathLike, dest: PathLike, profile: Profile = SERVING) -> Path:
+    """``VACUUM INTO`` a read-optimized copy of ``db_path`` and move it to ``dest`` atomically."""
+
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(dest.name + '.tmp')
+    if tmp.exists():
+        tmp.unlink()
+    src = sqlite3.connect(db_path)
+    try:
+        apply_build(src, profile)
+        src.execute('VACUUM INTO ?', (str(tmp),))
+    finally:
+        src.close()
+    con = sqlite3.connect(tmp)
+    try:
+        con.execute('ANALYZE')
+        con.commit()
+    finally:
+        con.close()
+    os.replace(tmp, dest)
+    return dest
+
+
+def describe(con: sqlite3.Connection) -> Dict[str, Any]:
+    """Effective settings of ``con`` (for ``show`` and tests)."""
+
+    names = ('page_size', 'journal_mode', 'mmap_size', 'cache_size', 'temp_store', 'query_only')
+    return {name: con.execute(f'PRAGMA {name}').fetchone()[0] for name in names}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description='SQLite serving profile')
+    sub = ap.add_subparsers(dest='command', required=True)
+    snap = sub.add_parser('snapshot', help='write a read-optimized copy with VACUUM INTO')
+    snap.add_argument('--db-path', type=Path, default=Path('issuesdb/issues.sqlite'))
+    snap.add_argument('--out', type=Path, required=True)
+    snap.add_argument('--page-size', type=int, default=SERVING.page_size)
+    show = sub.add_parser('show', help='print the settings a reader connection gets')
+    show.add_argument('--db-path', type=Path, default=Path('issuesdb/issues.sqlite'))
+    show.add_argument('--immutable', action='store_true')
+    return ap.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.command == 'snapshot':
+        out = snapshot(args.db_path, args.out, replace(SERVING, page_size=args.page_size))
+        print(json.dumps({'snapshot': str(out), 'bytes': out.stat().st_size}))
+        return
+    con = connect_reader(args.db_path, immutable=args.immutable)
+    try:
+        print(json.dumps({'profile': asdict(SERVING), 'effective': describe(con)}))
+    finally:
+        con.close()
+
+
+if __name__ == '__main__':
+    main()
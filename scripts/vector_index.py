@@ -0,0 +1,392 @@
+"""Dense similarity index over ``exports/chunks.jsonl`` for hybrid retrieval.
+
+Lexical bm25 misses paraphrased error messages. This index adds an offline, CPU-only
+dense layer:
+
+* the default vectorizer hashes word unigrams and character trigrams into
+  ``dim`` signed buckets. Each vector is weighted with log-TF times IDF and
+  L2-normalised, so no model download is involved;
+* ``--embedder module:function`` plugs in a local embedding function instead.
+  It takes ``List[str]`` and returns an ``(n, d)`` array;
+* vectors are stored as a float32 ``matrix.npy`` opened with ``mmap_mode='r'``,
+  so queries page in only what they touch. Search is a batched brute-force
+  matmul, or an IVF (spherical k-means) probe when built with ``--ivf-lists``;
+* ``hybrid_search`` fuses the ranked issues with ``search.query_fts`` bm25 hits
+  by reciprocal rank fusion.
+
+Requires ``numpy`` (optional; nothing else in the pipeline imports this module).
+
+Usage:
+    python scripts/vector_index.py build [--chunks exports/chunks.jsonl] [--ivf-lists 64]
+    python scripts/vector_index.py query "connection was refused" [--hybrid] [--limit 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from fts_query import tokenize
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from monitoring.registry import REGISTRY  # noqa: E402
+
+CHUNKS = Path('exports/chunks.jsonl')
+INDEX_DIR = Path('exports/vectors')
+DB = Path('issuesdb/issues.sqlite')
+HASHING = 'hashing'
+DEFAULT_DIM = 1024
+BATCH_ROWS = 8192
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 40
+DEFAULT_NPROBE = 8
+RRF_K = 60
+
+QUERY_SECONDS = REGISTRY.histogram('vector_query_seconds', 'Vector index query latency in seconds', ('mode',))
+
+Embedder = Callable[[List[str]], Any]
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError('vector_index needs numpy: pip install numpy')
+
+
+# -- vectorizers --------------------------------------------------------------
+def _features(text: str) -> List[int]:
+    """Hashed word unigrams and character trigrams of ``text``."""
+
+    out: List[int] = []
+    for token in tokenize(text):
+        out.append(zlib.crc32(token.encode('utf-8')))
+        padded = f'<{token}>'
+        for i in range(len(padded) - 2):
+            out.append(zlib.crc32(padded[i:i + 3].encode('utf-8'), 0x9E3779B9))
+    return out
+
+
+class HashingVectorizer:
+    """Signed feature hashing with log-TF and (optionally fitted) IDF weights."""
+
+    def __init__(self, dim: int = DEFAULT_DIM, idf: Optional['np.ndarray'] = None) -> None:
+        _require_numpy()
+        self.dim = dim
+        self.idf = idf
+
+    def _counts(self, text: str) -> 'np.ndarray':
+        row = np.zeros(self.dim, dtype=np.float32)
+        hashes = np.fromiter(_features(text), dtype=np.uint32)
+        if hashes.size:
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(row, (hashes & 0x7FFFFFFF) % self.dim, signs)
+        return row
+
+    def fit(self, texts: Iterator[str]) -> 'HashingVectorizer':
+        df = np.zeros(self.dim, dtype=np.float64)
+        n = 0
+        for text in texts:
+            df += self._counts(text) != 0
+            n += 1
+        self.idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        return self
+
+    def __call__(self, texts: List[str]) -> 'np.ndarray':
+        rows = np.stack([self._counts(t) for t in texts]) if texts else np.zeros((0, self.dim), np.float32)
+        rows = np.sign(rows) * np.log1p(np.abs(rows))
+        if self.idf is not None:
+            rows *= self.idf
+        return _normalize(rows)
+
+
+def _normalize(rows: 'np.ndarray') -> 'np.ndarray':
+    rows = np.asarray(rows, dtype=np.float32)
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    return rows / np.where(norms == 0, 1, norms)
+
+
+def load_embedder(spec: str) -> Embedder:
+    """Import ``module:function``; its output is L2-normalised here."""
+
+    module, _, name = spec.partition(':')
+    if not module or not name:
+        raise ValueError(f'embedder must look like module:function, got {spec!r}')
+    fn = getattr(importlib.import_module(module), name)
+    return lambda texts: _normalize(fn(texts))
+
+
+# -- build --------------------------------------------------------------------
+def _read_chunks(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open(encoding='utf-8') as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _batches(items: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch: List[Dict[str, Any]] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _kmeans(matrix: 'np.ndarray', lists: int, seed: int = 0) -> 'np.ndarray':
+    """Spherical k-means centroids fitted on a sample of ``matrix`` rows."""
+
+    rng = np.random.default_rng(seed)
+    n = matrix.shape[0]
+    sample = np.sort(rng.choice(n, size=min(n, lists * KMEANS_SAMPLE_PER_LIST), replace=False))
+    data = np.asarray(matrix[sample])
+    centroids = data[rng.choice(len(data), size=lists, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assign = np.argmax(data @ centroids.T, axis=1)
+        for c in range(lists):
+            members = data[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = _normalize(centroids)
+    return centroids
+
+
+def build(
+    chunks: Path = CHUNKS,
+    out_dir: Path = INDEX_DIR,
+    *,
+    dim: int = DEFAULT_DIM,
+    ivf_lists: int = 0,
+    embedder: str = HASHING,
+    batch_rows: int = BATCH_ROWS,
+) -> Dict[str, Any]:
+    """Vectorize ``chunks`` into ``out_dir``; returns the written ``meta.json``."""
+
+    _require_numpy()
+    start = time.perf_counter()
+    ids: List[str] = []
+    doc_ids: List[str] = []
+    for rec in _read_chunks(chunks):
+        ids.append(rec['id'])
+        doc_ids.append(rec['doc_id'])
+    if embedder == HASHING:
+        vectorize: Embedder = HashingVectorizer(dim).fit(rec['text'] for rec in _read_chunks(chunks))
+    else:
+        vectorize = load_embedder(embedder)
+        dim = vectorize(['dimension probe']).shape[1]
+
+    tmp = out_dir.with_name(out_dir.name + '.tmp')
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    count = len(ids)
+    matrix = np.lib.format.open_memmap(tmp / 'matrix.npy', mode='w+', dtype=np.float32, shape=(count, dim))
+    row = 0
+    for batch in _batches(_read_chunks(chunks), batch_rows):
+        matrix[row:row + len(batch)] = vectorize([rec['text'] for rec in batch])
+        row += len(batch)
+    matrix.flush()
+
+    meta: Dict[str, Any] = {'count': count, 'dim': dim, 'embedder': embedder, 'ivf_lists': 0, 'chunks': str(chunks)}
+    if isinstance(vectorize, HashingVectorizer):
+        np.save(tmp / 'idf.npy', vectorize.idf)
+    if ivf_lists and count >= ivf_lists:
+        centroids = _kmeans(matrix, ivf_lists)
+        assign = np.concatenate(
+            [np.argmax(matrix[i:i + batch_rows] @ centroids.T, axis=1) for i in range(0, count, batch_rows)]
+        )
+        np.save(tmp / 'centroids.npy', centroids)
+        np.save(tmp / 'ivf_order.npy', np.argsort(assign, kind='stable').astype(np.int32))
+        np.save(tmp / 'ivf_offsets.npy', np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=ivf_lists))]))
+        meta['ivf_lists'] = ivf_lists
+    del matrix
+    (tmp / 'ids.json').write_text(json.dumps({'ids': ids, 'doc_ids': doc_ids}), encoding='utf-8')
+    meta['build_seconds'] = round(time.perf_counter() - start, 3)
+    (tmp / 'meta.json').write_text(json.dumps(meta, indent=2), encoding='utf-8')
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp, out_dir)
+    return meta
+
+
+# -- query --------------------------------------------------------------------
+class VectorIndex:
+    """Read-only view of a built index; the matrix stays memory-mapped."""
+
+    def __init__(self, path: Path = INDEX_DIR) -> None:
+        _require_numpy()
+        self.path = Path(path)
+        self.meta = json.loads((self.path / 'meta.json').read_text(encoding='utf-8'))
+        ids = json.loads((self.path / 'ids.json').read_text(encoding='utf-8'))
+        self.ids: List[str] = ids['ids']
+        self.doc_ids: List[str] = ids['doc_ids']
+        self.matrix = np.load(self.path / 'matrix.npy', mmap_mode='r')
+        if self.meta['embedder'] == HASHING:
+            self.embed: Embedder = HashingVectorizer(self.meta['dim'], np.load(self.path / 'idf.npy'))
+        else:
+            self.embed = load_embedder(self.meta['embedder'])
+        self.centroids = self.order = self.offsets = None
+        if self.meta['ivf_lists']:
+            self.centroids = np.load(self.path / 'centroids.npy')
+            self.order = np.load(self.path / 'ivf_order.npy')
+            self.offsets = np.load(self.path / 'ivf_offsets.npy')
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _top(self, scores: 'np.ndarray', rows: 'np.ndarray', k: int) -> List[Tuple[int, float]]:
+        if len(scores) > k:
+            keep = np.argpartition(-scores, k)[:k]
+            scores, rows = scores[keep], rows[keep]
+        order = np.argsort(-scores, kind='stable')
+        return [(int(rows[i]), float(scores[i])) for i in order]
+
+    def search(self, query: str, k: int = 10, *, nprobe: int = DEFAULT_NPROBE) -> List[Dict[str, Any]]:
+        """Top ``k`` chunks by cosine similarity."""
+
+        if not len(self) or not query.strip():
+            return []
+        start = time.perf_counter()
+        q = self.embed([query])[0]
+        if self.centroids is not None:
+            mode = 'ivf'
+            lists = np.argsort(-(self.centroids @ q))[:nprobe]
+            rows = np.sort(np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in lists]))
+            top = self._top(self.matrix[rows] @ q, rows, k)
+        else:
+            mode = 'brute'
+            top = []
+            for i in range(0, len(self), BATCH_ROWS):
+                scores = self.matrix[i:i + BATCH_ROWS] @ q
+                top = self._top(
+                    np.concatenate([np.array([s for _, s in top], np.float32), scores]),
+                    np.concatenate([np.array([r for r, _ in top], np.int64), np.arange(i, i + len(scores))]),
+                    k,
+                )
+        QUERY_SECONDS.observe(time.perf_counter() - start, mode=mode)
+        return [{'id': self.ids[r], 'doc_id': self.doc_ids[r], 'score': round(s, 6)} for r, s in top]
+
+
+def hybrid_search(
+    query: str,
+    limit: int = 10,
+    *,
+    index: VectorIndex,
+    db_path: Path = DB,
+    rrf_k: int = RRF_K,
+    weights: Tuple[float, float] = (1.0, 1.0),
+    candidates: int = 4,
+) -> List[Dict[str, Any]]:
+    """Fuse bm25 and vector rankings per issue with reciprocal rank fusion.
+
+    Each side contributes ``weight / (rrf_k + rank)``; an issue's vector rank is
+    that of its best chunk. Ranks, not raw scores, are fused because bm25 and
+    cosine values are on unrelated scales.
+    """
+
+    import search  # sibling script; imported lazily so the vector CLI works without a DB
+
+    pool = limit * candidates
+    try:
+        lexical = [r['issue_id'] for r in search.query_fts(db_path, query, pool)]
+    except sqlite3.Error:
+        lexical = []
+    vector: List[str] = []
+    best_chunk: Dict[str, str] = {}
+    for hit in index.search(query, pool * 2):
+        if hit['doc_id'] not in best_chunk:
+            best_chunk[hit['doc_id']] = hit['id']
+            vector.append(hit['doc_id'])
+
+    scores: Dict[str, float] = {}
+    for weight, ranking in zip(weights, (lexical, vector)):
+        for rank, issue_id in enumerate(ranking, 1):
+            scores[issue_id] = scores.get(issue_id, 0.0) + weight / (rrf_k + rank)
+    top = sorted(scores, key=lambda i: (-scores[i], i))[:limit]
+    lex_rank = {i: n for n, i in enumerate(lexical, 1)}
+    vec_rank = {i: n for n, i in enumerate(vector, 1)}
+    titles = _titles(db_path, top)
+    return [
+        {
+            'issue_id': i,
+            'title': titles.get(i),
+            'score': round(scores[i], 6),
+            'bm25_rank': lex_rank.get(i),
+            'vector_rank': vec_rank.get(i),
+            'chunk_id': best_chunk.get(i),
+        }
+        for i in top
+    ]
+
+
+def _titles(db_path: Path, issue_ids: Sequence[str]) -> Dict[str, str]:
+    if not issue_ids or not Path(db_path).exists():
+        return {}
+    con = sqlite3.connect(db_path)
+    try:
+        marks = ','.join('?' * len(issue_ids))
+        return dict(con.execute(f'SELECT issue_id, title FROM issues WHERE issue_id IN ({marks})', list(issue_ids)))
+    except sqlite3.Error:
+        return {}
+    finally:
+        con.close()
+
+
+# -- CLI ----------------------------------------------------------------------
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description='Dense similarity index over exported chunks')
+    sub = ap.add_subparsers(dest='command', required=True)
+    b = sub.add_parser('build', help='vectorize exports/chunks.jsonl')
+    b.add_argument('--chunks', type=Path, default=CHUNKS)
+    b.add_argument('--out', type=Path, default=INDEX_DIR)
+    b.add_argument('--dim', type=int, default=DEFAULT_DIM, help='hashing vectorizer width')
+    b.add_argument('--ivf-lists', type=int, default=0, help='IVF lists; 0 searches by brute force')
+    b.add_argument('--embedder', default=HASHING, help='"hashing" or module:function')
+    q = sub.add_parser('query', help='search the index')
+    q.add_argument('query')
+    q.add_argument('--index', type=Path, default=INDEX_DIR)
+    q.add_argument('--limit', type=int, default=10)
+    q.add_argument('--nprobe', type=int, default=DEFAULT_NPROBE)
+    q.add_argument('--hybrid', action='store_true', help='fuse with bm25 results from the SQLite index')
+    q.add_argument('--db-path', type=Path, default=DB)
+    args = ap.parse_args(argv)
+    if getattr(args, 'dim', 1) <= 0 or getattr(args, 'limit', 1) <= 0:
+        ap.error('--dim and --limit must be positive')
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        _require_numpy()
+    except RuntimeError as exc:
+        print(exc, file=sys.stderr)
+        return 2
+    if args.command == 'build':
+        meta = build(args.chunks, args.out, dim=args.dim, ivf_lists=args.ivf_lists, embedder=args.embedder)
+        print(json.dumps(meta))
+        return 0
+    index = VectorIndex(args.index)
+    if args.hybrid:
+        rows = hybrid_search(args.query, args.limit, index=index, db_path=args.db_path)
+    else:
+        rows = index.search(args.query, args.limit, nprobe=args.nprobe)
+    for row in rows:
+        print(json.dumps(row, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
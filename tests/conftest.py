@@ -0,0 +1,47 @@
+import hashlib
+import json
+import pathlib
+import sys
+from dataclasses import dataclass
+from typing import Tuple
+
+import pytest
+
+REPO = pathlib.Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO / 'scripts'))
+import build_index  # noqa: E402
+
+
+@dataclass
+class IssueTree:
+    """Throwaway ``issuesdb`` root that build_index has been pointed at."""
+    root: pathlib.Path
+
+    def write(self, idx: int, partition: Tuple[str, str] = ('src', 'py'), **fields) -> pathlib.Path:
+        """Write issue ``idx`` under ``issues/<source>/<language>``; ``fields`` override the document."""
+        source, language = partition
+        issue_id = hashlib.sha1(f'{source}/{language}/{idx}'.encode()).hexdigest()
+        doc = {
+            'issue_id': issue_id,
+            'source': source,
+            'language': language,
+            'title': f'Issue {idx}',
+            'signals': [{'kind': 'rule', 'value': 'S1'}],
+        }
+        doc.update(fields)
+        issues_dir = self.root / 'issues' / source / language
+        issues_dir.mkdir(parents=True, exist_ok=True)
+        path = issues_dir / f"{doc['issue_id']}.json"
+        path.write_text(json.dumps(doc), 'utf-8')
+        return path
+
+
+@pytest.fixture
+def indexed_root(monkeypatch, tmp_path) -> IssueTree:
+    root = tmp_path / 'issuesdb'
+    (root / 'issues').mkdir(parents=True)
+    monkeypatch.setattr(build_index, 'ROOT', root)
+    monkeypatch.setattr(build_index, 'DB', root / 'issues.sqlite')
+    monkeypatch.setattr(build_index, 'SQL', REPO / 'issues_index.sql')
+    monkeypatch.setattr(build_index, 'STATE', root / 'index_state.json')
+    return IssueTree(root)
@@ -0,0 +1,119 @@
+import json
+import pathlib
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+
+import pytest
+
+from monitoring.aggregator import Aggregator, LogTailer, Window, alert_metrics, main
+from monitoring.alert_manager import AlertManager, load_thresholds, parse_args
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc).timestamp()
+
+
+def _line(event_type, status, offset_s=0, **extra):
+    ts = datetime.fromtimestamp(NOW - offset_s, timezone.utc).isoformat()
+    return json.dumps({'ts': ts, 'event_type': event_type, 'status': status, **extra}) + '\n'
+
+
+def _append(path, *lines):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('a', encoding='utf-8') as fh:
+        fh.write(''.join(lines))
+
+
+def test_tailer_reads_only_new_complete_lines(tmp_path):
+    day = tmp_path / '2026-03-01.json'
+    _append(day, _line('collect', 'ok'), '{"partial": ')
+    tailer = LogTailer(tmp_path)
+    assert [r['event_type'] for r in tailer.read_new()] == ['collect']
+    offset = tailer.offsets[day.name]
+
+    _append(day, '1}\n', _line('collect', 'error'))
+    resumed = LogTailer(tmp_path, {day.name: offset})
+    assert [r.get('status') for r in resumed.read_new()] == [None, 'error']
+    assert resumed.offsets[day.name] == day.stat().st_size
+
+
+def test_window_rates_percentiles_and_expiry():
+    window = Window(seconds=600)
+    for i in range(100):
+        window.add(json.loads(_line('search', 'ok', offset_s=i, duration_ms=i + 1)))
+    window.add(json.loads(_line('search', 'error', offset_s=10)))
+    window.add(json.loads(_line('search', 'ok', offset_s=3600, duration_ms=99999)))
+
+    summary = window.summary(NOW)['search']
+    assert summary['count'] == 101
+    assert summary['statuses'] == {'ok': 100, 'error': 1}
+    assert summary['failure_ratio'] == pytest.approx(1 / 101, abs=1e-4)
+    assert summary['p50_seconds'] == pytest.approx(0.05, rel=0.07)
+    assert summary['p99_seconds'] == pytest.approx(0.099, rel=0.07)
+
+    restored = Window.from_dict(json.loads(json.dumps(window.to_dict())), seconds=600)
+    assert restored.summary(NOW) == window.summary(NOW)
+
+
+def test_alert_metrics_mapping():
+    window = Window()
+    for line in (
+        _line('collect', 'ok'),
+        _line('collect', 'rate_limited'),
+        _line('build_index', 'ok', offset_s=30, duration_ms=90000),
+        _line('memory_governor', 'summary', details={'peak_rss_mb': 512.0, 'batch_size': 10}),
+        _line('check_health', 'success', offset_s=20),
+        _line('index_integrity', 'failure', offset_s=10),
+    ):
+        window.add(json.loads(line))
+    metrics = alert_metrics(window, window.summary(NOW))
+    assert metrics == {
+        'collection_success_rate': 0.5,
+        'api_rate_limited_ratio': 0.5,
+        'index_build_time_seconds': 90.0,
+        'memory_usage_mb': 512.0,
+        'fts5_integrity_ok': False,
+    }
+
+
+def test_aggregator_feeds_alert_manager_incrementally(tmp_path):
+    daily = tmp_path / 'daily'
+    state = tmp_path / 'state.json'
+    out = tmp_path / 'alerts.json'
+    manager = AlertManager(load_thresholds(parse_args([])), output_path=out)
+    _append(daily / '2026-03-01.json', *(_line('collect', 'ok', offset_s=i) for i in range(9)))
+    _append(daily / '2026-03-01.json', _line('collect', 'error'))
+
+    agg = Aggregator(daily, state, output_path=tmp_path / 'aggregates.json', alerts=manager)
+    aggregates, alerts = agg.run_once(NOW)
+    assert aggregates['records_read'] == 10
+    assert [a.name for a in alerts] == ['collection_success_rate']
+    assert json.loads(out.read_text())[0]['name'] == 'collection_success_rate'
+
+    # A new process resumes from the saved offsets and window; 0.95 is inside the
+    # hysteresis band, so the alert holds until the rate recovers to 0.98.
+    _append(daily / '2026-03-01.json', *(_line('collect', 'ok') for _ in range(10)))
+    agg = Aggregator(daily, state, output_path=None, alerts=manager)
+    aggregates, alerts = agg.run_once(NOW)
+    assert aggregates['records_read'] == 10
+    assert aggregates['events']['collect']['count'] == 20
+    assert [a.name for a in alerts] == ['collection_success_rate']
+
+    _append(daily / '2026-03-01.json', *(_line('collect', 'ok') for _ in range(30)))
+    _, alerts = agg.run_once(NOW)
+    assert alerts == []
+    assert json.loads(out.read_text()) == []
+
+
+def test_main_passes_alert_settings(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    now = datetime.fromtimestamp(time.time(), timezone.utc)
+    record = {'ts': now.isoformat(), 'event_type': 'collect', 'status': 'error'}
+    _append(tmp_path / 'daily' / f'{now.date().isoformat()}.json', json.dumps(record) + '\n')
+    argv = ['--once', '--metrics-dir', 'daily', '--state-path', 'state.json', '--output', 'aggregates.json']
+
+    # The breach must last 10 minutes; the cron-style run only records when it started.
+    assert main(argv + ['--for-seconds', '600']) == 0
+    assert capsys.readouterr().out == ''
+    assert 'collection_success_rate' in json.loads((tmp_path / 'alerts' / 'active_alerts.pending.json').read_text())
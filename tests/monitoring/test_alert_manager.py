@@ -74,3 +74,102 @@ def test_fts5_integrity_failure(tmp_path):
     assert alerts[0].severity == "CRITICAL"
     data = load_file(out)
     assert data[0]["name"] == "fts5_integrity"
+
+
+def test_for_duration_and_identity(tmp_path):
+    args = parse_args([])
+    out = tmp_path / "alerts" / "active_alerts.json"
+    manager = AlertManager(load_thresholds(args), output_path=out, for_seconds={"memory_usage_mb": 60})
+    assert manager.check({"memory_usage_mb": 500}, now=1000) == []
+    assert manager.check({"memory_usage_mb": 500}, now=1030) == []
+    fired = manager.check({"memory_usage_mb": 510}, now=1060)
+    assert [a.id for a in fired] == ["memory_usage_mb"]
+    assert fired[0].first_seen.startswith("1970-01-01T00:16:40")
+
+    # A fresh manager picks up the persisted alert and keeps its first_seen.
+    again = AlertManager(load_thresholds(args), output_path=out)
+    assert again.active["memory_usage_mb"].first_seen == fired[0].first_seen
+
+
+def test_pending_breach_survives_a_new_manager_per_run(tmp_path, monkeypatch):
+    out = tmp_path / "alerts" / "active_alerts.json"
+    pending = out.with_name("active_alerts.pending.json")
+    thresholds = load_thresholds(parse_args(["--for-seconds", "60", "--hysteresis", "0.05"]))
+    assert (thresholds["for_seconds"], thresholds["hysteresis"]) == (60.0, 0.05)
+
+    # One manager per cron run, as in aggregator.py --once.
+    assert AlertManager(thresholds, output_path=out).check({"memory_usage_mb": 500}, now=1000) == []
+    assert json.loads(pending.read_text(encoding="utf-8")) == {"memory_usage_mb": 1000.0}
+    manager = AlertManager(thresholds, output_path=out)
+    assert manager.hysteresis == 0.05
+    assert manager.check({"memory_usage_mb": 500}, now=1030) == []
+    fired = AlertManager(thresholds, output_path=out).check({"memory_usage_mb": 500}, now=1060)
+    assert [a.first_seen for a in fired] == ["1970-01-01T00:16:40+00:00"]
+    assert not pending.exists()
+
+    monkeypatch.setenv("ALERT_FOR_SECONDS", "5")
+    assert load_thresholds(parse_args([]))["for_seconds"] == 5.0
+
+
+def test_hysteresis_and_writes_only_on_change(tmp_path):
+    manager, out = make_manager(tmp_path)
+    manager.check({"disk_usage": 0.85})
+    writes = manager.writes
+    for _ in range(1000):
+        manager.check({"disk_usage": 0.86, "memory_usage_mb": 100})
+    assert manager.writes == writes
+
+    # 0.79 is below warn (0.8) but inside the 2% band: still firing.
+    assert [a.id for a in manager.check({"disk_usage": 0.79})] == ["disk_usage"]
+    manager.check({"disk_usage": 0.97})
+    assert load_file(out)[0]["severity"] == "CRITICAL"
+    # Samples without the metric leave the alert alone.
+    assert manager.check({"memory_usage_mb": 100})
+    assert manager.check({"disk_usage": 0.7}) == []
+    assert load_file(out) == []
+    assert manager.writes == writes + 2
+
+
+def test_pending_breach_survives_samples_without_its_metric(tmp_path):
+    out = tmp_path / "alerts" / "active_alerts.json"
+    pending = out.with_name("active_alerts.pending.json")
+    manager = AlertManager(load_thresholds(parse_args([])), output_path=out, for_seconds={"memory_usage_mb": 60})
+    assert manager.check({"memory_usage_mb": 500}, now=1000) == []
+    # An aggregator window without memory events.
+    assert manager.check({"disk_usage": 0.1}, now=1030) == []
+    assert json.loads(pending.read_text(encoding="utf-8")) == {"memory_usage_mb": 1000.0}
+    fired = manager.check({"memory_usage_mb": 500}, now=1060)
+    assert [a.first_seen for a in fired] == ["1970-01-01T00:16:40+00:00"]
+
+    # A sample where the metric recovered does drop the pending breach.
+    manager = AlertManager(load_thresholds(parse_args([])), output_path=tmp_path / "other.json", for_seconds=60)
+    manager.check({"memory_usage_mb": 500}, now=1000)
+    manager.check({"memory_usage_mb": 100}, now=1030)
+    assert not (tmp_path / "other.pending.json").exists()
+
+
+def test_downgrade_waits_out_hysteresis(tmp_path):
+    manager, out = make_manager(tmp_path)
+    manager.check({"disk_usage": 0.97})
+    writes = manager.writes
+    # Below critical (0.95) but inside the 2% band: still CRITICAL, nothing rewritten.
+    assert [a.severity for a in manager.check({"disk_usage": 0.94})] == ["CRITICAL"]
+    assert manager.writes == writes
+    assert [a.severity for a in manager.check({"disk_usage": 0.90})] == ["WARN"]
+    assert load_file(out)[0]["severity"] == "WARN"
+    assert [a.severity for a in manager.check({"disk_usage": 0.96})] == ["CRITICAL"]
+
+
+def test_critical_adds_to_active_alerts(tmp_path):
+    manager, out = make_manager(tmp_path)
+    manager.check({"disk_usage": 0.85})
+    manager.critical("health check failed: boom")
+    manager.critical("health check failed: boom")
+    data = load_file(out)
+    assert sorted(a["name"] for a in data) == ["disk_usage", "manual"]
+    manual = [a for a in data if a["name"] == "manual"][0]
+    # Manual alerts are not cleared by metric samples.
+    manager.check({"disk_usage": 0.5})
+    assert [a["id"] for a in load_file(out)] == [manual["id"]]
+    assert manager.resolve(manual["id"])
+    assert load_file(out) == []
@@ -1,6 +1,9 @@
 import json
+import os
 import pathlib
 import sys
+import threading
+import time
 
 sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
 from datetime import date
@@ -45,3 +48,96 @@ def test_disabled(tmp_path, monkeypatch):
     collector.record('e', 'ok')
     assert not base.exists()
     monkeypatch.delenv('METRICS_ENABLED', raising=False)
+
+
+def _lines(base):
+    return [
+        json.loads(line)
+        for f in sorted(base.glob('*.json'))
+        for line in f.read_text(encoding='utf-8').splitlines()
+    ]
+
+
+def test_buffered_writes_on_flush(tmp_path):
+    base = tmp_path / 'metrics' / 'daily'
+    collector = MetricsCollector(base, buffered=True, flush_interval_s=60)
+    collector.record('e', 'ok', duration_ms=3, cid='abc')
+    assert _lines(base) == []
+    collector.flush()
+    (record,) = _lines(base)
+    assert (record['event_type'], record['status'], record['duration_ms'], record['cid']) == ('e', 'ok', 3, 'abc')
+    assert record['ts'].endswith('+00:00')
+    collector.close()
+
+
+def test_buffered_flushes_by_size_in_background(tmp_path):
+    base = tmp_path / 'metrics' / 'daily'
+    collector = MetricsCollector(base, buffered=True, flush_size=3, flush_interval_s=60)
+    for i in range(3):
+        collector.record('e', 'ok', details={'i': i})
+    for _ in range(200):
+        if len(_lines(base)) == 3:
+            break
+        time.sleep(0.01)
+    assert [r['details']['i'] for r in _lines(base)] == [0, 1, 2]
+    collector.close()
+
+
+def test_buffered_drops_when_full(tmp_path):
+    base = tmp_path / 'metrics' / 'daily'
+    collector = MetricsCollector(base, buffered=True, max_buffer=2, flush_size=100, flush_interval_s=60)
+    for _ in range(5):
+        collector.record('e', 'ok')
+    assert collector.dropped == 3
+    collector.close()
+    records = _lines(base)
+    assert [r['event_type'] for r in records] == ['e', 'e', 'metrics_collector']
+    assert records[-1]['details'] == {'count': 3}
+
+
+def test_buffered_flush_appends_with_one_write(tmp_path, monkeypatch):
+    base = tmp_path / 'metrics' / 'daily'
+    collector = MetricsCollector(base, buffered=True, flush_size=1000, flush_interval_s=60)
+    for i in range(50):
+        collector.record('big', 'ok', details={'i': i, 'pad': 'x' * 500})
+    writes = []
+    real_write = os.write
+
+    def spy(fd, data):
+        writes.append(len(data))
+        return real_write(fd, data)
+
+    monkeypatch.setattr(os, 'write', spy)
+    collector.flush()
+    # 50 records of ~550 bytes cross the 8 KiB buffer size, but reach the file in one append.
+    assert len(writes) == 1 and writes[0] > 8192
+    collector.close()
+    assert len(_lines(base)) == 50
+
+
+def test_buffered_records_after_close_are_written(tmp_path):
+    base = tmp_path / 'metrics' / 'daily'
+    collector = MetricsCollector(base, buffered=True, flush_interval_s=60)
+    collector.record('before', 'ok')
+    collector.close()
+    collector.record('after', 'ok')
+    assert [r['event_type'] for r in _lines(base)] == ['before', 'after']
+    assert collector.dropped == 0
+
+
+def test_buffered_shared_across_threads(tmp_path):
+    base = tmp_path / 'metrics' / 'daily'
+    collector = MetricsCollector(base, buffered=True, flush_size=50, flush_interval_s=0.01)
+
+    def work(n):
+        for i in range(200):
+            collector.record('t', 'ok', details={'n': n, 'i': i})
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    collector.close()
+    assert len(_lines(base)) == 800
+    assert collector.dropped == 0
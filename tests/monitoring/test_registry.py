@@ -0,0 +1,126 @@
+import json
+import pathlib
+import pickle
+import random
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+
+import pytest
+
+from monitoring.metrics_collector import MetricsCollector
+from monitoring.registry import SUB_BUCKETS, LogBuckets, MetricsRegistry, PeriodicSnapshot
+
+
+def test_counter_and_gauge_labels():
+    reg = MetricsRegistry()
+    c = reg.counter('requests_total', 'Requests', ('outcome',))
+    c.inc(outcome='ok')
+    c.inc(2, outcome='ok')
+    c.inc(outcome='error')
+    assert c.value(outcome='ok') == 3
+    assert reg.counter('requests_total', 'Requests', ('outcome',)) is c
+    with pytest.raises(ValueError):
+        c.inc(-1, outcome='ok')
+    with pytest.raises(ValueError):
+        c.inc(kind='ok')
+    with pytest.raises(ValueError):
+        reg.gauge('requests_total', 'Requests', ('outcome',))
+
+    g = reg.gauge('queue_depth', 'Depth')
+    g.set(5)
+    g.dec(2)
+    assert g.value() == 3
+
+
+def test_log_buckets_relative_error():
+    buckets = LogBuckets(1e-6, 10.0)
+    for value in (1e-6, 3.3e-5, 0.0123, 0.5, 1.0, 7.9):
+        upper = buckets.upper(buckets.index(value))
+        assert value <= upper <= value * (1 + 1 / SUB_BUCKETS) + 1e-12
+    assert buckets.index(1e-9) == 0
+    assert buckets.index(1e9) == buckets.size - 1
+
+
+def test_histogram_percentiles_fixed_memory():
+    reg = MetricsRegistry()
+    h = reg.histogram('latency_seconds', 'Latency')
+    rng = random.Random(7)
+    values = [rng.uniform(0.001, 0.1) for _ in range(20000)]
+    for v in values:
+        h.observe(v)
+    values.sort()
+    for q in (0.5, 0.95, 0.99):
+        exact = values[int(q * len(values)) - 1]
+        assert h.percentile(q) == pytest.approx(exact, rel=1 / SUB_BUCKETS)
+    assert len(h._series[()].counts) == h.buckets.size
+    assert h.count() == 20000
+
+
+def test_prometheus_text_format():
+    reg = MetricsRegistry()
+    reg.counter('search_queries_total', 'Queries', ('outcome',)).inc(outcome='h"it')
+    h = reg.histogram('search_query_seconds', 'Latency')
+    h.observe(0.002)
+    h.observe(0.004)
+    text = reg.to_prometheus()
+    assert '# TYPE search_queries_total counter' in text
+    assert 'search_queries_total{outcome="h\\"it"} 1' in text
+    assert '# TYPE search_query_seconds histogram' in text
+    assert 'search_query_seconds_bucket{le="+Inf"} 2' in text
+    assert 'search_query_seconds_count 2' in text
+    buckets = [line for line in text.splitlines() if line.startswith('search_query_seconds_bucket')]
+    counts = [int(line.rsplit(' ', 1)[1]) for line in buckets]
+    assert counts == sorted(counts)
+
+
+def test_snapshot_written_to_daily_jsonl(tmp_path, monkeypatch):
+    reg = MetricsRegistry()
+    reg.histogram('index_batch_seconds', 'Batch', ('op',)).observe(0.25, op='upsert')
+    base = tmp_path / 'daily'
+    collector = MetricsCollector(base, enabled=True, buffered=False)
+    prom = tmp_path / 'registry.prom'
+    monkeypatch.setenv('METRICS_PROM_PATH', str(prom))
+
+    with PeriodicSnapshot(reg, collector, interval_s=60, cid='abc'):
+        pass
+    reg.export(collector, 'abc')
+
+    records = [json.loads(line) for f in base.glob('*.json') for line in f.read_text().splitlines()]
+    assert [r['event_type'] for r in records] == ['metrics_snapshot', 'metrics_snapshot']
+    series = records[0]['details']['index_batch_seconds']['series'][0]
+    assert series['labels'] == {'op': 'upsert'}
+    assert series['count'] == 1
+    assert series['p99'] == pytest.approx(0.25)
+    assert 'index_batch_seconds_count{op="upsert"} 1' in prom.read_text()
+
+
+def test_merge_pickled_worker_registry_and_unique_textfile_tmp(tmp_path):
+    worker = MetricsRegistry()
+    worker.counter('docs_total', 'Docs', ('op',)).inc(3, op='upsert')
+    worker.gauge('batch_size', 'Batch').set(7)
+    worker.histogram('batch_seconds', 'Batch').observe(0.5)
+    worker = pickle.loads(pickle.dumps(worker))
+
+    parent = MetricsRegistry()
+    docs = parent.counter('docs_total', 'Docs', ('op',))
+    docs.inc(op='upsert')
+    parent.histogram('batch_seconds', 'Batch').observe(0.1)
+    parent.merge(worker)
+    parent.merge(worker)
+    assert docs.value(op='upsert') == 7
+    assert parent.get('batch_size').value() == 7
+    assert parent.get('batch_seconds').count() == 3
+    assert parent.get('batch_seconds').percentile(1.0) == pytest.approx(0.5)
+    with pytest.raises(ValueError):
+        parent.histogram('other_seconds', 'x', lowest=1e-3).merge(worker.get('batch_seconds'))
+
+    worker.reset()
+    assert worker.get('docs_total').value(op='upsert') == 0
+    assert worker.get('batch_seconds').count() == 0
+
+    prom = tmp_path / 'registry.prom'
+    parent.write_textfile(prom)
+    worker.write_textfile(prom)
+    assert 'docs_total' in prom.read_text() and 'docs_total{op="upsert"}' not in prom.read_text()
+    assert [p.name for p in tmp_path.iterdir()] == ['registry.prom']
@@ -0,0 +1,96 @@
+import json
+import pathlib
+import sys
+from datetime import date, datetime, timedelta, timezone
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[2]))
+
+import pytest
+
+from monitoring.rollup import MetricsStore, compact, connect
+
+TODAY = date(2026, 3, 31)
+NOW = datetime(2026, 3, 31, 12, tzinfo=timezone.utc)
+
+
+def _write_day(base: pathlib.Path, day: date, durations, event_type='build_index', status='ok'):
+    base.mkdir(parents=True, exist_ok=True)
+    start = datetime.combine(day, datetime.min.time(), timezone.utc)
+    with (base / f'{day.isoformat()}.json').open('a', encoding='utf-8') as fh:
+        for i, ms in enumerate(durations):
+            ts = (start + timedelta(minutes=7 * i)).isoformat()
+            fh.write(json.dumps({'ts': ts, 'event_type': event_type, 'status': status, 'duration_ms': ms}) + '\n')
+        fh.write(json.dumps({'ts': start.isoformat(), 'event_type': 'metrics_snapshot', 'status': 'ok'}) + '\n')
+
+
+def test_compact_is_incremental_and_applies_retention(tmp_path):
+    base = tmp_path / 'daily'
+    for n in range(1, 11):
+        _write_day(base, TODAY - timedelta(days=n), [1000 * n])
+    _write_day(base, TODAY, [5])
+    con = connect(tmp_path / 'metrics.sqlite')
+
+    stats = compact(con, base, now=NOW, raw_days=3, minute_days=5)
+    assert stats['days'] == 10
+    assert stats['records'] == 20
+    assert stats['raw_deleted'] == 7
+    assert sorted(p.stem for p in base.glob('*.json')) == [
+        (TODAY - timedelta(days=n)).isoformat() for n in (3, 2, 1, 0)
+    ]
+    assert con.execute('SELECT COUNT(*) FROM rollup_hour WHERE event_type = ?', ('build_index',)).fetchone()[0] == 10
+    assert con.execute('SELECT COUNT(*) FROM rollup_minute WHERE event_type = ?', ('build_index',)).fetchone()[0] == 5
+
+    assert compact(con, base, now=NOW, raw_days=3, minute_days=5)['days'] == 0
+    plan = con.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM rollup_hour WHERE event_type = ? AND ts >= ?', ('x', 0)
+    ).fetchall()
+    assert 'PRIMARY KEY' in plan[0][3]
+
+
+def test_percentile_over_thirty_days(tmp_path):
+    base = tmp_path / 'daily'
+    for n in range(1, 31):
+        _write_day(base, TODAY - timedelta(days=n), [100 * k for k in range(1, 21)])
+    _write_day(base, TODAY - timedelta(days=45), [10 ** 7])
+    con = connect(tmp_path / 'metrics.sqlite')
+    compact(con, base, now=NOW)
+    store = MetricsStore(con)
+    now = datetime.combine(TODAY, datetime.min.time(), timezone.utc).timestamp()
+
+    p95 = store.percentile('build_index', 0.95, since=now - 30 * 86400, until=now, status='ok')
+    assert p95 == pytest.approx(1900, rel=1 / 16)
+    assert store.percentile('build_index', 1.0, since=now - 30 * 86400, until=now) == pytest.approx(2000, rel=1 / 16)
+    assert store.percentile('build_index', 0.95, since=now - 30 * 86400, until=now, status='error') is None
+    assert store.counts('build_index', since=now - 86400, until=now) == {'ok': 20}
+
+
+def test_compact_waits_for_grace_and_merges_rows(tmp_path):
+    base = tmp_path / 'daily'
+    day = TODAY - timedelta(days=1)
+    _write_day(base, day, [100, 200])
+    con = connect(tmp_path / 'metrics.sqlite')
+    midnight = datetime.combine(TODAY, datetime.min.time(), timezone.utc)
+
+    assert compact(con, base, now=midnight + timedelta(minutes=30))['days'] == 0
+    # A buffered record stamped 23:59 lands after midnight, inside the grace period.
+    late = {'ts': (midnight - timedelta(seconds=1)).isoformat(), 'event_type': 'build_index', 'status': 'ok'}
+    late['duration_ms'] = 300
+    with (base / f'{day.isoformat()}.json').open('a', encoding='utf-8') as fh:
+        fh.write(json.dumps(late) + '\n')
+    assert compact(con, base, now=midnight + timedelta(hours=2))['records'] == 4
+
+    store = MetricsStore(con)
+    since, until = midnight.timestamp() - 86400, midnight.timestamp()
+    assert store.counts('build_index', since=since, until=until) == {'ok': 3}
+
+    # Rows that already exist are added to, not replaced.
+    con.execute('DELETE FROM compacted_days')
+    compact(con, base, now=midnight + timedelta(hours=2))
+    assert store.counts('build_index', since=since, until=until) == {'ok': 6}
+    row = con.execute(
+        'SELECT count, timed, sum_ms, min_ms, max_ms FROM rollup_hour WHERE event_type = ? AND ts = ?',
+        ('build_index', int(until - 3600)),
+    ).fetchone()
+    assert row == (2, 2, 600.0, 300.0, 300.0)
+    p100 = store.percentile('build_index', 1.0, since=since, until=until, resolution='hour')
+    assert p100 == pytest.approx(300, rel=1 / 16)
@@ -0,0 +1,93 @@
+import json
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'benchmarks'))
+import run_benchmarks as bench
+import synth
+
+SCHEMA = json.loads((pathlib.Path(__file__).resolve().parents[1] / 'schemas' / 'issue.schema.json').read_text())
+TYPES = {'string': str, 'null': type(None), 'number': (int, float), 'integer': int, 'object': dict, 'array': list}
+
+
+def _conforms(doc: dict) -> bool:
+    if set(doc) - set(SCHEMA['properties']) or set(SCHEMA['required']) - set(doc):
+        return False
+    for key, value in doc.items():
+        allowed = SCHEMA['properties'][key]['type']
+        allowed = allowed if isinstance(allowed, list) else [allowed]
+        if not any(isinstance(value, TYPES[t]) for t in allowed):
+            return False
+    return True
+
+
+def test_generator_is_deterministic_and_matches_schema(tmp_path):
+    docs = list(synth.generate(50, seed=3))
+    assert docs == list(synth.generate(50, seed=3))
+    assert docs != list(synth.generate(50, seed=4))
+    assert all(_conforms(d) for d in docs)
+    assert len({d['issue_id'] for d in docs}) == 50
+
+    a = synth.write_corpus(tmp_path / 'a', 20, seed=1)
+    b = synth.write_corpus(tmp_path / 'b', 20, seed=1)
+    assert [p.read_bytes() for p in a] == [p.read_bytes() for p in b]
+
+
+def _pipeline_globals():
+    return (
+        bench.build_index.ROOT,
+        bench.build_index.DB,
+        bench.build_index.STATE,
+        bench.build_index.SQL,
+        bench.chunk_export.ROOT,
+        bench.render_memory_bank.DB,
+    )
+
+
+def test_suite_runs_and_compares(tmp_path):
+    out = tmp_path / 'bench.json'
+    before = _pipeline_globals()
+    assert bench.main(['--sizes', '40', '--queries', '6', '--output', str(out)]) == 0
+    # The corpus is deleted after the run; nothing may keep pointing at it.
+    assert _pipeline_globals() == before
+    report = json.loads(out.read_text())
+    results = report['results']
+    for name in ('cold_build_s@40', 'incremental_build_s@40', 'noop_build_s@40', 'search@40_p95_ms',
+                 'chunk_export_s@40', 'render_memory_bank_s@40'):
+        assert name in results
+
+    baseline = {name: value / 10 for name, value in results.items()}
+    regressions = bench.compare(results, baseline, 0.2)
+    assert {r['name'] for r in regressions} == {n for n, v in results.items() if v > 0}
+    assert bench.compare(results, results, 0.2) == []
+
+
+def test_relevance_harness_scores_golden_queries():
+    import relevance
+
+    golden = relevance.make_golden(size=60, seed=2, per_class=3)
+    assert golden == relevance.make_golden(size=60, seed=2, per_class=3)
+    assert {q['class'] for q in golden['queries']} == set(relevance.CLASSES)
+    assert all(q['expected'] for q in golden['queries'] if q['class'] == 'rule_id')
+
+    sql = relevance.schema_sql(relevance.CONFIGS['trigram'])
+    assert "tokenize='trigram'" in sql and 'prefix=' not in sql
+
+    before = _pipeline_globals()
+    report = relevance.run_config('baseline', golden, 5)
+    assert _pipeline_globals() == before
+    assert set(report) == set(relevance.CLASSES)
+    assert report['message']['recall@5'] > 0
+    assert all(row['queries'] == 3 for row in report.values())
+
+
+def test_json_codec_benchmark(tmp_path, capsys):
+    import json_codec
+
+    results = json_codec.run(docs=30, repeat=1, seed=1)
+    assert 'json' in results
+    assert all(row['canonical_identical'] for row in results.values())
+    out = tmp_path / 'codec.json'
+    assert json_codec.main(['--docs', '20', '--repeat', '1', '--output', str(out)]) == 0
+    assert set(json.loads(out.read_text())) == set(results)
+    assert 'dumps_canonical us' in capsys.readouterr().out
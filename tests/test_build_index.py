@@ -180,7 +180,7 @@ def test_projected_memory_warning(monkeypatch, tmp_path, caplog):
     assert any('projected memory usage' in r.message for r in caplog.records)
 
 
-def test_projected_memory_limit_exits(monkeypatch, tmp_path):
+def test_tight_memory_limit_degrades_instead_of_exiting(monkeypatch, tmp_path):
     root = tmp_path / 'issuesdb'
     issues_dir = root / 'issues' / 'src' / 'py'
     issues_dir.mkdir(parents=True)
@@ -194,7 +194,33 @@ def test_projected_memory_limit_exits(monkeypatch, tmp_path):
     for i in range(5):
         _write_issue(issues_dir, i)
 
-    with pytest.raises(SystemExit) as excinfo:
-        build_index.main(['--batch-size', '5', '--memory-limit-mb', '20'])
-    assert 'projected memory' in str(excinfo.value)
+    # The old issues * batch_size projection (25MB) aborted this run.
+    build_index.main(['--batch-size', '5', '--memory-limit-mb', '20'])
 
+    con = sqlite3.connect(root / 'issues.sqlite')
+    assert con.execute('SELECT COUNT(*) FROM issues').fetchone()[0] == 5
+    con.close()
+    events = [
+        json.loads(line)
+        for f in (tmp_path / 'metrics' / 'daily').glob('*.json')
+        for line in f.read_text('utf-8').splitlines()
+    ]
+    summary = [e for e in events if e['event_type'] == 'memory_governor' and e['status'] == 'summary']
+    assert summary and summary[0]['details']['batch_size'] < 5
+
+
+def test_governor_estimate_persists_across_builds(indexed_root, monkeypatch):
+    for i in range(3):
+        indexed_root.write(i)
+    build_index.main()
+    saved = build_index.load_bytes_per_doc()
+    assert saved and saved > 0
+
+    def calibrate():
+        raise AssertionError('calibrated again')
+
+    monkeypatch.setattr(build_index, '_calibration_sample', calibrate)
+    indexed_root.write(3)
+    build_index.main()
+    # A one-document batch is too small to move the estimate.
+    assert build_index.load_bytes_per_doc() == saved
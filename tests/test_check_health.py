@@ -45,10 +45,39 @@ def test_main_ok(tmp_path, monkeypatch):
 
     status = json.loads((tmp_path / 'metrics/health_status.json').read_text())
     assert status['status'] == 'ok'
-    assert events == [('check_health', 'success', {})]
+    assert [(e, st) for e, st, _ in events] == [('check_health', 'success')]
+    assert events[0][2]['details']['tier'] == 'full'
+    assert events[0][2]['duration_ms'] >= 0
     assert critical == []
 
 
+@pytest.mark.parametrize('tier', ['quick', 'full'])
+def test_main_tiers_detect_missing_fts_data(tmp_path, monkeypatch, tier):
+    db = tmp_path / 'db.sqlite'
+    _init_db(db)
+    con = sqlite3.connect(db)
+    con.execute('DROP TABLE fts_issues_data')
+    con.commit()
+    con.close()
+    monkeypatch.chdir(tmp_path)
+
+    events = []
+    monkeypatch.setattr(
+        check_health.MetricsCollector,
+        'record',
+        lambda self, event_type, status, **kw: events.append((event_type, status, kw)),
+    )
+    monkeypatch.setattr(check_health.AlertManager, 'critical', lambda self, message: None)
+
+    with pytest.raises(SystemExit):
+        check_health.main(['--check-health', '--db-path', str(db), '--tier', tier])
+
+    status = json.loads((tmp_path / 'metrics/health_status.json').read_text())
+    assert status['status'] == 'error'
+    assert status['tier'] == tier
+    assert events[0][2]['details']['tier'] == tier
+
+
 def test_main_corrupted(tmp_path, monkeypatch):
     db = tmp_path / 'db.sqlite'
     _init_db(db)
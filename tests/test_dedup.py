@@ -0,0 +1,108 @@
+import json
+import os
+import pathlib
+import sqlite3
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'scripts'))
+import build_index
+import dedup
+import search
+
+FIX = 'Close the stream in a finally block or use a context manager so the handle is released on every path.'
+SUMMARY = 'Streams opened while reading configuration files are never closed, which leaks file handles under load.'
+
+
+def _write(issues_dir: pathlib.Path, issue_id: str, title: str, summary: str = SUMMARY) -> pathlib.Path:
+    path = issues_dir / f'{issue_id}.json'
+    doc = {'issue_id': issue_id, 'source': 'src', 'language': 'py', 'title': title, 'summary': summary, 'fix_steps': FIX}
+    path.write_text(json.dumps(doc), 'utf-8')
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    return path
+
+
+def _clusters(db: pathlib.Path) -> dict:
+    con = sqlite3.connect(db)
+    try:
+        return dict(con.execute('SELECT issue_id, cluster_id FROM minhash'))
+    finally:
+        con.close()
+
+
+def test_signature_similarity_tracks_overlap():
+    base = dedup.signature(SUMMARY + ' ' + FIX)
+    near = dedup.signature(SUMMARY.replace('load', 'heavy load') + ' ' + FIX)
+    other = dedup.signature('SQL injection through string concatenation in a query builder for reports.')
+    assert dedup.similarity(base, near) >= dedup.THRESHOLD
+    assert dedup.similarity(base, other) < 0.2
+    assert len(dedup.band_keys(base)) == dedup.BANDS
+    assert dedup.signature('same words here') == dedup.signature('Same, words here!')
+
+
+def test_build_clusters_incrementally_and_search_collapses(monkeypatch, tmp_path):
+    root = tmp_path / 'issuesdb'
+    issues_dir = root / 'issues' / 'src' / 'py'
+    issues_dir.mkdir(parents=True)
+    monkeypatch.setattr(build_index, 'ROOT', root)
+    monkeypatch.setattr(build_index, 'DB', root / 'issues.sqlite')
+    monkeypatch.setattr(build_index, 'SQL', pathlib.Path(__file__).resolve().parents[1] / 'issues_index.sql')
+    monkeypatch.setattr(build_index, 'STATE', root / 'index_state.json')
+    _write(issues_dir, 'a', 'Stream leak in config reader')
+    _write(issues_dir, 'b', 'Stream leak in the config reader')
+    _write(issues_dir, 'c', 'Unrelated', 'SQL injection through string concatenation in a query builder.')
+    build_index.main(['--integrity-tier', 'none'])
+    assert _clusters(build_index.DB) == {'a': 'a', 'b': 'a', 'c': 'c'}
+
+    con = sqlite3.connect(build_index.DB)
+    assert dedup.clusters(con) == [{'cluster_id': 'a', 'size': 2, 'issue_ids': ['a', 'b']}]
+    signed = dict(con.execute('SELECT issue_id, signature FROM minhash'))
+    con.close()
+
+    rows = search.query_fts(build_index.DB, 'stream leak', 5, collapse=True)
+    assert [(r['cluster_id'], r['duplicates']) for r in rows] == [('a', 1)]
+    assert len(search.query_fts(build_index.DB, 'stream leak', 5)) == 2
+
+    # Only the changed issue is re-signed; deleting the label holder relabels the cluster.
+    _write(issues_dir, 'c', 'Unrelated', 'SQL injection through string formatting in a query builder.')
+    (issues_dir / 'a.json').unlink()
+    build_index.main(['--integrity-tier', 'none'])
+    con = sqlite3.connect(build_index.DB)
+    after = dict(con.execute('SELECT issue_id, signature FROM minhash'))
+    con.close()
+    assert after['b'] == signed['b'] and after['c'] != signed['c']
+    assert _clusters(build_index.DB) == {'b': 'b', 'c': 'c'}
+
+
+def test_build_backfills_signatures_for_existing_index(monkeypatch, tmp_path):
+    root = tmp_path / 'issuesdb'
+    issues_dir = root / 'issues' / 'src' / 'py'
+    issues_dir.mkdir(parents=True)
+    monkeypatch.setattr(build_index, 'ROOT', root)
+    monkeypatch.setattr(build_index, 'DB', root / 'issues.sqlite')
+    monkeypatch.setattr(build_index, 'SQL', pathlib.Path(__file__).resolve().parents[1] / 'issues_index.sql')
+    monkeypatch.setattr(build_index, 'STATE', root / 'index_state.json')
+    _write(issues_dir, 'a', 'Stream leak in config reader')
+    _write(issues_dir, 'b', 'Stream leak in the config reader')
+    _write(issues_dir, 'c', 'Unrelated', 'SQL injection through string concatenation in a query builder.')
+    build_index.main(['--integrity-tier', 'none'])
+    con = sqlite3.connect(build_index.DB)
+    signed = dict(con.execute('SELECT issue_id, text_hash FROM minhash'))
+    # An index from before signatures existed: no minhash rows, no files changed since.
+    con.execute('DELETE FROM minhash')
+    con.execute('DELETE FROM lsh_buckets')
+    con.commit()
+    con.close()
+    assert search.query_fts(build_index.DB, 'stream leak', 5, collapse=True)[0]['duplicates'] == 0
+
+    build_index.main(['--integrity-tier', 'none'])
+    assert _clusters(build_index.DB) == {'a': 'a', 'b': 'a', 'c': 'c'}
+    con = sqlite3.connect(build_index.DB)
+    try:
+        # Signed from the issues rows, with the same text hashes as signing the files.
+        assert dict(con.execute('SELECT issue_id, text_hash FROM minhash')) == signed
+        assert not dedup.needs_backfill(con.cursor())
+    finally:
+        con.close()
+    rows = search.query_fts(build_index.DB, 'stream leak', 5, collapse=True)
+    assert [(r['cluster_id'], r['duplicates']) for r in rows] == [('a', 1)]
@@ -65,7 +65,7 @@ def test_write_issue_too_big(monkeypatch, tmp_path):
         'issue_id': 'a' * 40,
         'source': 'src',
         'title': 'ok',
-        'payload': 'x' * 20,
+        'summary': 'x' * 20,
     }
     with pytest.raises(ValueError):
         emit_issue.write_issue(doc)
@@ -80,10 +80,31 @@ def test_write_issues_batch_too_big(monkeypatch, tmp_path):
             'issue_id': 'a' * 40,
             'source': 'src',
             'title': 'ok',
-            'payload': 'x' * 20,
+            'summary': 'x' * 20,
         },
         {'issue_id': 'b' * 40, 'source': 'src', 'title': 'ok'},
     ]
     with pytest.raises(ValueError):
         emit_issue.write_issues_batch(docs)
     assert not list(tmp_path.rglob('*.json'))
+
+
+def test_write_issue_rejects_schema_violation(monkeypatch, tmp_path):
+    monkeypatch.setattr(emit_issue, 'ROOT', tmp_path)
+    doc = {'issue_id': 'a' * 40, 'source': 'src', 'title': 'ok', 'frequency': 'often'}
+    with pytest.raises(ValueError):
+        emit_issue.write_issue(doc)
+    assert not list(tmp_path.rglob('*.json'))
+
+
+def test_write_issue_accepts_issue_model(monkeypatch, tmp_path):
+    from issue_model import Issue, Signal
+
+    monkeypatch.setattr(emit_issue, 'ROOT', tmp_path)
+    issue = Issue('d' * 40, 'src', 'typed', language='Python', signals=[Signal('rule_id', 'S1')])
+    path = emit_issue.write_issue(issue)
+    assert path == tmp_path / 'src' / 'python' / (issue.issue_id + '.json')
+    data = json.loads(path.read_text('utf-8'))
+    assert data['signals'] == [{'kind': 'rule_id', 'value': 'S1'}]
+    assert data['updated_at'] == issue.updated_at
+    assert Issue.from_dict(data) == issue
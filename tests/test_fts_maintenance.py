@@ -0,0 +1,110 @@
+import json
+import pathlib
+import sqlite3
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'scripts'))
+import build_index
+import fts_maintenance
+from fts_maintenance import Policy, decide
+from integrity import read_structure
+
+
+def _write_issue(tree, i, title=None):
+    return tree.write(
+        i,
+        title=title or f'Connection reset {i}',
+        summary=f'Peer closed the socket during request {i}.',
+        signals=[{'kind': 'rule_id', 'value': f'python:S{i}'}],
+    )
+
+
+@pytest.fixture
+def corpus(monkeypatch, indexed_root, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    for i in range(200):
+        _write_issue(indexed_root, i)
+    return indexed_root.root, indexed_root
+
+
+def _segments(db):
+    con = sqlite3.connect(db)
+    try:
+        return read_structure(con).segments
+    finally:
+        con.close()
+
+
+def _decisions(tmp_path):
+    events = []
+    for path in (tmp_path / 'metrics' / 'daily').glob('*.json'):
+        for line in path.read_text('utf-8').splitlines():
+            event = json.loads(line)
+            if event.get('event_type') == 'fts_maintenance':
+                events.append(event)
+    return events
+
+
+def test_decide_policy():
+    policy = Policy(optimize_segments=8, bulk_fraction=0.5, window=(2, 5))
+    noon, night = datetime(2024, 1, 1, 12), datetime(2024, 1, 1, 3)
+    assert decide(1, 1, 10, 100, policy, now=noon).reason == 'compact'
+    assert decide(9, 3, 1, 100, policy, now=noon).reason == 'fragmented'
+    assert decide(4, 2, 60, 100, policy, now=noon).reason == 'bulk'
+    assert decide(4, 2, 1, 100, policy, now=night).reason == 'window'
+    assert decide(4, 2, 1, 100, policy, now=noon).action == 'merge'
+    assert decide(4, 2, 0, 100, policy, now=noon).action == 'none'
+    assert decide(20, 3, 1, 100, policy, mode='merge').action == 'merge'
+    assert decide(2, 1, 0, 100, policy, mode='optimize').reason == 'requested'
+    assert decide(20, 3, 1, 100, policy, mode='none').reason == 'disabled'
+    with pytest.raises(ValueError):
+        decide(2, 1, 0, 100, mode='sometimes')
+    assert fts_maintenance.in_window((22, 2), datetime(2024, 1, 1, 23))
+    assert not fts_maintenance.in_window((22, 2), datetime(2024, 1, 1, 12))
+
+
+def test_small_updates_merge_instead_of_optimize(corpus, tmp_path):
+    root, tree = corpus
+    db = root / 'issues.sqlite'
+    build_index.main([])
+    assert _segments(db) == 1
+
+    # Out-of-order updates are written in rowid order: a couple of segments, not one per issue.
+    for i in (150, 3, 77, 120, 9):
+        _write_issue(tree, i, f'Socket timeout {i}')
+    build_index.main([])
+    assert 1 < _segments(db) <= 3
+    con = sqlite3.connect(db)
+    try:
+        hits = con.execute("SELECT COUNT(*) FROM fts_issues WHERE fts_issues MATCH 'timeout'").fetchone()[0]
+        assert hits == 5
+        assert con.execute("SELECT COUNT(*) FROM fts_issues WHERE fts_issues MATCH 'reset'").fetchone()[0] == 195
+    finally:
+        con.close()
+
+    build_index.main(['--fts-maintenance', 'optimize'])
+    assert _segments(db) == 1
+    actions = [(e['status'], e['details']['reason']) for e in _decisions(tmp_path)]
+    assert actions == [('none', 'compact'), ('merge', 'updated'), ('optimize', 'requested')]
+
+
+def test_fragmented_index_is_optimized(corpus):
+    root, tree = corpus
+    db = root / 'issues.sqlite'
+    build_index.main([])
+    for i in range(5):
+        _write_issue(tree, i, 'Broken pipe')
+    build_index.main(['--fts-maintenance', 'none'])
+    assert _segments(db) > 1
+
+    con = sqlite3.connect(db)
+    try:
+        con.execute('BEGIN')
+        outcome = fts_maintenance.run(con, 1, 200, Policy(optimize_segments=1))
+        con.commit()
+    finally:
+        con.close()
+    assert (outcome.action, outcome.reason, outcome.segments_after) == ('optimize', 'fragmented', 1)
@@ -0,0 +1,49 @@
+import pathlib
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'scripts'))
+from fts_query import bm25_expr, compile_query, phrase, tokenize
+
+
+@pytest.mark.parametrize(
+    'text, expected',
+    [
+        ('netw failure', '"netw"* AND "failure"'),
+        ('python:S1234', '"python s1234"'),
+        ('"null pointer" crash', '"null pointer" AND "crash"'),
+        ('title:"null pointer"', 'title : "null pointer"'),
+        ('fix:(restart OR escape)', 'fix_steps : ("restart" OR "escape")'),
+        ('sql OR query AND injection', '"sql"* OR ("query" AND "injection")'),
+        ('injection -(cookie OR header)', '"injection" NOT ("cookie" OR "header")'),
+        ('null NOT pointer', '"null"* NOT "pointer"'),
+        ('a b* exceptions*', '"a" AND "b" AND "exceptions"*'),
+        ("TypeError: Cannot read property 'id' of undefined", '"typeerror" AND "cannot" AND "read" AND '
+         '"property" AND "id" AND "of" AND "undefined"'),
+        ('NOT alone', ''),
+        ('-x', ''),
+        (')(:"', ''),
+    ],
+)
+def test_compile_query(text, expected):
+    assert compile_query(text) == expected
+
+
+def test_helpers_match_tokenizer():
+    assert tokenize('snake_case-Name:42') == ['snake', 'case', 'name', '42']
+    assert phrase('java.lang.NullPointerException') == '"java lang nullpointerexception"'
+    assert phrase('::') == ''
+    assert bm25_expr().startswith('bm25(fts_issues, 2.0, ')
+
+
+@pytest.mark.parametrize('text', ['"', '((a', 'a) OR (', 'NEAR(a b, 3)', 'col:x', '- - -', 'x:"y', '*', 'AND OR NOT'])
+def test_compiled_queries_parse(text):
+    con = sqlite3.connect(':memory:')
+    con.execute(
+        "CREATE VIRTUAL TABLE f USING fts5(title, summary, fix_steps, signals_concat, language, prefix='2 3 4')"
+    )
+    match = compile_query(text)
+    if match:
+        con.execute('SELECT rowid FROM f WHERE f MATCH ?', (match,)).fetchall()
@@ -0,0 +1,145 @@
+import pathlib
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'scripts'))
+import build_index
+import check_health
+import index_generations
+import search
+
+
+def _write_issue(tree, i, title=None):
+    return tree.write(
+        i,
+        title=title or f'Connection reset {i}',
+        signals=[{'kind': 'rule_id', 'value': f'python:S{i}'}],
+    )
+
+
+@pytest.fixture
+def corpus(indexed_root):
+    for i in range(20):
+        _write_issue(indexed_root, i)
+    return indexed_root.root, indexed_root
+
+
+def _count(db):
+    con = sqlite3.connect(db)
+    try:
+        return con.execute('SELECT COUNT(*) FROM issues').fetchone()[0]
+    finally:
+        con.close()
+
+
+def test_shadow_build_migrates_and_swaps(corpus):
+    root, tree = corpus
+    db = root / 'issues.sqlite'
+    build_index.main([])
+    assert not index_generations.is_managed(db)
+    before = index_generations.generation_token(db)
+
+    # An old-style connection keeps reading its file across the swap.
+    old = sqlite3.connect(db)
+    _write_issue(tree, 99, 'Socket timeout')
+    build_index.main(['--shadow'])
+    assert index_generations.is_managed(db)
+    assert index_generations.current(db).name == 'issues-000001.sqlite'
+    assert index_generations.generation_token(db) != before
+    assert not list(root.glob('issues.sqlite-*'))
+    assert old.execute('SELECT COUNT(*) FROM issues').fetchone()[0] == 20
+    old.close()
+    assert _count(db) == 21
+
+    # Generational from now on: plain builds go through a shadow too, no-op builds copy nothing.
+    _write_issue(tree, 100, 'Broken pipe')
+    build_index.main([])
+    assert index_generations.current(db).name == 'issues-000002.sqlite'
+    build_index.main([])
+    assert [n for n, _ in index_generations.generations(db)] == [1, 2]
+    con = sqlite3.connect(db)
+    try:
+        assert con.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+    finally:
+        con.close()
+
+    build_index.main(['--rebuild'])
+    assert [n for n, _ in index_generations.generations(db)] == [2, 3]
+    assert _count(db) == 22
+
+
+def test_failed_build_keeps_published_generation(corpus, monkeypatch):
+    root, tree = corpus
+    db = root / 'issues.sqlite'
+    build_index.main(['--shadow'])
+    state = (root / 'index_state.json').read_text('utf-8')
+    live = index_generations.current(db)
+
+    check_integrity = build_index.check_integrity
+
+    def broken(*args, **kwargs):
+        raise RuntimeError('corrupt')
+
+    monkeypatch.setattr(build_index, 'check_integrity', broken)
+    _write_issue(tree, 99, 'Socket timeout')
+    with pytest.raises(RuntimeError):
+        build_index.main([])
+    assert index_generations.current(db) == live
+    assert (root / 'index_state.json').read_text('utf-8') == state
+    assert _count(db) == 20
+
+    # The next build replaces the leftover shadow.
+    assert (root / 'generations' / 'issues-000002.sqlite').exists()
+    monkeypatch.setattr(build_index, 'check_integrity', check_integrity)
+    build_index.main([])
+    assert index_generations.current(db).name == 'issues-000002.sqlite'
+    assert _count(db) == 21
+
+
+def test_reader_and_search_cache_follow_generation(corpus, monkeypatch):
+    root, tree = corpus
+    db = root / 'issues.sqlite'
+    build_index.main(['--shadow'])
+    monkeypatch.setattr(search, 'DB', db)
+    search.search.cache_clear()
+
+    with index_generations.Reader(db) as reader:
+        first = reader.connection()
+        assert reader.connection() is first
+        assert search.query_fts(db, 'socket', 5, reader=reader) == []
+        assert search.search('socket', 5) == []
+
+        _write_issue(tree, 99, 'Socket timeout')
+        build_index.main([])
+        hits = search.query_fts(db, 'socket', 5, reader=reader)
+        assert [h['title'] for h in hits] == ['Socket timeout']
+        assert reader.reopened == 2
+        assert [h['title'] for h in search.search('socket', 5)] == ['Socket timeout']
+
+
+def test_repair_goes_through_shadow(corpus):
+    root, tree = corpus
+    db = root / 'issues.sqlite'
+    build_index.main(['--shadow'])
+    live = index_generations.current(db)
+    extra = _write_issue(tree, 99, 'Socket timeout')
+    updated, removed = build_index.reindex(db, [extra], [], root=root, state_path=root / 'index_state.json')
+    assert (updated, removed) == (1, 0)
+    assert index_generations.current(db) != live
+    assert _count(live) == 20
+    assert _count(db) == 21
+    assert check_health.run_health_check(db, 'full').tier == 'full'
+
+
+def test_prune_keeps_newest(tmp_path):
+    db = tmp_path / 'issues.sqlite'
+    for _ in range(4):
+        shadow = index_generations.new_shadow(db)
+        sqlite3.connect(shadow).close()
+        index_generations.publish(db, shadow, keep=10)
+    assert [n for n, _ in index_generations.generations(db)] == [1, 2, 3, 4]
+    pruned = index_generations.prune(db, keep=2)
+    assert [p.name for p in pruned] == ['issues-000001.sqlite', 'issues-000002.sqlite']
+    assert index_generations.status(db)['current'].endswith('issues-000004.sqlite')
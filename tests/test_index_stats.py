@@ -0,0 +1,96 @@
+import pathlib
+import sqlite3
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'scripts'))
+import build_index
+import index_stats
+
+
+def _write_issue(tree, idx: int, **extra) -> pathlib.Path:
+    fields = {
+        'severity': 'MAJOR',
+        'taxonomy': {'cwe': ['CWE-20']},
+        'updated_at': f'2025-02-{idx + 1:02d}T00:00:00Z',
+    }
+    fields.update(extra)
+    return tree.write(idx, **fields)
+
+
+def _stats_and_rebuilt(db: pathlib.Path):
+    con = sqlite3.connect(db)
+    try:
+        incremental = index_stats.read_stats(con)
+        index_stats.rebuild(con.cursor())
+        rebuilt = index_stats.read_stats(con)
+        con.rollback()
+    finally:
+        con.close()
+    return incremental, rebuilt
+
+
+def test_stats_deltas_track_updates_and_deletes(indexed_root):
+    paths = [_write_issue(indexed_root, i) for i in range(5)]
+    build_index.main(['--batch-size', '2'])
+
+    stats, rebuilt = _stats_and_rebuilt(build_index.DB)
+    assert stats == rebuilt
+    assert stats['total'] == 5
+    assert stats['by_severity'] == {'MAJOR': 5}
+    assert stats['signals_total'] == 5
+    assert stats['last_updated_at'] == '2025-02-05T00:00:00Z'
+
+    _write_issue(
+        indexed_root,
+        0,
+        severity='BLOCKER',
+        taxonomy={'cwe': ['CWE-89']},
+        signals=[{'kind': 'rule', 'value': 'S1'}, {'kind': 'message', 'value': 'boom'}],
+    )
+    paths[4].unlink()
+    build_index.main()
+
+    stats, rebuilt = _stats_and_rebuilt(build_index.DB)
+    assert stats == rebuilt
+    assert stats['total'] == 4
+    assert stats['by_severity'] == {'BLOCKER': 1, 'MAJOR': 3}
+    assert stats['by_cwe'] == {'CWE-20': 3, 'CWE-89': 1}
+    assert stats['signals'] == {'message': 1, 'rule': 4}
+    assert stats['last_updated_at'] == '2025-02-04T00:00:00Z'
+
+
+def test_stats_backfilled_for_existing_index(indexed_root):
+    for i in range(3):
+        _write_issue(indexed_root, i)
+    build_index.main()
+
+    con = sqlite3.connect(build_index.DB)
+    con.execute('DELETE FROM stats')
+    con.commit()
+    con.close()
+
+    build_index.main()
+    con = sqlite3.connect(build_index.DB)
+    try:
+        assert index_stats.read_stats(con)['total'] == 3
+    finally:
+        con.close()
+
+
+def test_rebuild_buckets_empty_values_like_deltas(indexed_root):
+    for i in range(3):
+        _write_issue(indexed_root, i, severity='', signals=[{'kind': '', 'value': 'S1'}])
+    build_index.main()
+
+    con = sqlite3.connect(build_index.DB)
+    index_stats.rebuild(con.cursor())
+    con.commit()
+    con.close()
+
+    # Deltas after a rebuild subtract from the same 'unknown' rows.
+    _write_issue(indexed_root, 0)
+    build_index.main()
+    stats, rebuilt = _stats_and_rebuilt(build_index.DB)
+    assert stats == rebuilt
+    assert stats['by_severity'] == {'MAJOR': 1, 'unknown': 2}
+    assert stats['signals'] == {'rule': 1, 'unknown': 2}
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import pathlib
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'scripts'))
+import build_index
+import integrity
+
+
+def _build(monkeypatch, tmp_path, n: int) -> pathlib.Path:
+    root = tmp_path / 'issuesdb'
+    issues_dir = root / 'issues' / 'src' / 'py'
+    issues_dir.mkdir(parents=True)
+    sql_path = pathlib.Path(__file__).resolve().parents[1] / 'issues_index.sql'
+    monkeypatch.setattr(build_index, 'ROOT', root)
+    monkeypatch.setattr(build_index, 'DB', root / 'issues.sqlite')
+    monkeypatch.setattr(build_index, 'SQL', sql_path)
+    monkeypatch.setattr(build_index, 'STATE', root / 'index_state.json')
+    for i in range(n):
+        issue_id = hashlib.sha1(str(i).encode()).hexdigest()
+        doc = {
+            'issue_id': issue_id,
+            'source': 'src',
+            'language': 'py',
+            'title': f'Null "pointer" dereference {i}',
+            'signals': [{'kind': 'rule', 'value': f'S{i}'}],
+        }
+        (issues_dir / f'{issue_id}.json').write_text(json.dumps(doc), 'utf-8')
+    build_index.main(['--integrity-tier', 'full'])
+    return root / 'issues.sqlite'
+
+
+def test_decode_structure_counts_segments():
+    # cookie, 1 level, 2 segments, write counter 2, level: nMerge 0, 2 segments.
+    block = bytes([0, 0, 0, 0, 1, 2, 2, 0, 2, 1, 1, 1, 2, 2, 2])
+    structure = integrity.decode_structure(block)
+    assert structure.levels == 1
+    assert structure.segments == 2
+    assert structure.segment_ids == [1, 2]
+    with pytest.raises(integrity.IntegrityError):
+        integrity.decode_structure(block[:-2])
+
+
+@pytest.mark.parametrize('tier', integrity.TIERS)
+def test_tiers_pass_on_fresh_build(monkeypatch, tmp_path, tier):
+    db = _build(monkeypatch, tmp_path, 20)
+    con = sqlite3.connect(db)
+    try:
+        result = integrity.run_check(con, tier, sample_size=10, seed=1)
+    finally:
+        con.close()
+    assert result.tier == tier
+    assert result.seconds >= 0
+    if tier == 'sampled':
+        assert result.samples > 0
+
+
+def test_sampled_detects_missing_fts_rows(monkeypatch, tmp_path):
+    db = _build(monkeypatch, tmp_path, 5)
+    con = sqlite3.connect(db)
+    try:
+        con.execute("INSERT INTO fts_issues(fts_issues) VALUES('delete-all')")
+        with pytest.raises(integrity.IntegrityError, match='sampled issues missing'):
+            integrity.run_check(con, 'sampled', sample_size=5, seed=1)
+    finally:
+        con.close()
+
+
+def test_quick_accepts_secure_delete_config_version(monkeypatch, tmp_path):
+    db = _build(monkeypatch, tmp_path, 3)
+    con = sqlite3.connect(db)
+    try:
+        con.execute("UPDATE fts_issues_config SET v=5 WHERE k='version'")
+        assert integrity.run_check(con, 'quick').tier == 'quick'
+        con.execute("UPDATE fts_issues_config SET v=6 WHERE k='version'")
+        with pytest.raises(integrity.IntegrityError, match='config version'):
+            integrity.run_check(con, 'quick')
+    finally:
+        con.close()
+
+
+def test_budget_exceeded_raises_timeout(monkeypatch, tmp_path):
+    db = _build(monkeypatch, tmp_path, 50)
+    con = sqlite3.connect(db)
+    clock = iter([0.0] + [100.0] * 10_000)
+    monkeypatch.setattr(integrity.time, 'monotonic', lambda: next(clock))
+    monkeypatch.setattr(integrity, 'PROGRESS_OPS', 1)
+    try:
+        with pytest.raises(integrity.CheckTimeout):
+            integrity.run_check(con, 'full', budget_seconds=1)
+    finally:
+        con.close()
+
+
+def test_sampled_budget_overrun_is_not_a_pass(monkeypatch, tmp_path):
+    db = _build(monkeypatch, tmp_path, 20)
+    con = sqlite3.connect(db)
+    # Past the deadline only once sampling starts, so SQLite itself is never interrupted.
+    clock = iter([0.0] * 3 + [100.0] * 10_000)
+    monkeypatch.setattr(integrity.time, 'monotonic', lambda: next(clock))
+    monkeypatch.setattr(integrity, '_quick', lambda con: {})
+    monkeypatch.setattr(integrity, 'PROGRESS_OPS', 1_000_000)
+    try:
+        with pytest.raises(integrity.CheckTimeout, match='of 10 issues'):
+            integrity.run_check(con, 'sampled', budget_seconds=1, sample_size=10, seed=1)
+    finally:
+        con.close()
+
+
+def test_build_integrity_check_runs_without_budget(monkeypatch, tmp_path):
+    budgets = []
+    real = build_index.run_check
+
+    def spy(con, tier, **kwargs):
+        budgets.append(kwargs.get('budget_seconds'))
+        return real(con, tier, **kwargs)
+
+    monkeypatch.setattr(build_index, 'run_check', spy)
+    _build(monkeypatch, tmp_path, 3)
+    assert budgets == [0]
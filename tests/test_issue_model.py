@@ -0,0 +1,78 @@
+import json
+import pathlib
+import sys
+
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'scripts'))
+from issue_model import FIELDS, Issue, IssueValidationError, Reference, Signal, load_issues
+
+
+def _doc(**extra):
+    doc = {'issue_id': 'a' * 40, 'source': 'src', 'title': 'Null dereference'}
+    doc.update(extra)
+    return doc
+
+
+def test_fields_follow_schema():
+    schema = json.loads((pathlib.Path(__file__).resolve().parents[1] / 'schemas' / 'issue.schema.json').read_text())
+    assert FIELDS == tuple(schema['properties'])
+    assert set(Issue.__slots__) == set(FIELDS)
+    with pytest.raises(AttributeError):
+        Issue('a' * 40, 'src', 't').extra = 1
+
+
+@pytest.mark.parametrize(
+    'doc',
+    [
+        {'source': 'src', 'title': 't'},
+        _doc(payload='x'),
+        _doc(frequency='3'),
+        _doc(frequency=True),
+        _doc(confidence=False),
+        _doc(taxonomy=[]),
+        _doc(signals=[{'kind': 'rule_id'}]),
+        _doc(references=['https://example.com']),
+        [],
+    ],
+)
+def test_from_dict_rejects_invalid(doc):
+    with pytest.raises(IssueValidationError):
+        Issue.from_dict(doc)
+
+
+def test_round_trip():
+    doc = _doc(
+        language='python',
+        confidence=0.5,
+        frequency=3,
+        taxonomy={'cwe': ['CWE-476']},
+        signals=[{'kind': 'rule_id', 'value': 'S1'}],
+        references=[{'label': 'docs', 'url': 'https://example.com', 'license': None}],
+        updated_at='2024-01-01T00:00:00Z',
+    )
+    issue = Issue.from_dict(doc)
+    assert issue.signals == [Signal('rule_id', 'S1')]
+    assert issue.references == [Reference('docs', 'https://example.com')]
+    assert issue['language'] == issue.get('language') == 'python'
+    assert issue.get('nope', 1) == 1
+    again = Issue.from_json(issue.to_json())
+    assert again == issue
+    assert {k: v for k, v in again.to_dict().items() if k in doc} == doc
+    assert 'updated_at' not in Issue('b' * 40, 'src', 't').to_dict()
+
+
+def test_rows():
+    issue = Issue.from_dict(_doc(signals=[{'kind': 'error_code', 'value': 'E1'}], metadata={'n': 1}))
+    row = issue.db_row('hash')
+    assert row[0] == issue.issue_id and row[-1] == 'hash'
+    assert row[9] == '{}' and json.loads(row[11]) == {'n': 1}
+    assert issue.signal_rows() == [(issue.issue_id, 'error_code', 'E1')]
+    assert issue.reference_rows() == []
+
+
+def test_load_issues_passes_instances_through():
+    issue = Issue('c' * 40, 'src', 't')
+    loaded = load_issues([issue, _doc()])
+    assert loaded[0] is issue
+    assert loaded[1].issue_id == 'a' * 40
@@ -15,3 +15,61 @@ def test_load_json_rejects_oversized_file(tmp_path: Path) -> None:
     assert path.stat().st_size > MAX_JSON_BYTES
     with pytest.raises(ValueError):
         load_json(path)
+
+
+import json_utils  # noqa: E402
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'benchmarks'))
+import synth  # noqa: E402
+
+
+def _codec(name):
+    try:
+        return json_utils.get_codec(name)
+    except ImportError:
+        pytest.skip(f'{name} not installed')
+
+
+def _canonical(obj):
+    return json.dumps(obj, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+@pytest.mark.parametrize('name', json_utils.BACKENDS)
+def test_canonical_output_is_backend_independent(name):
+    codec = _codec(name)
+    corpus = list(synth.generate(100, seed=5))
+    edge_cases = [
+        {'f': [0.0, -0.0, 1e-4, 0.1 + 0.2, 1.5e15, 1e-05, 1e16, float('nan'), float('inf')]},
+        {'big': [2 ** 63 - 1, -(2 ** 63), 2 ** 64, -(2 ** 70)]},
+        {'s': 'é   \x7f \x1f "\\/', 'empty': [{}, []], 'nested': {'b': 1, 'a': [True, None]}},
+        {1: 'int key'},
+        ('tuple', 1),
+    ]
+    for doc in corpus + edge_cases:
+        assert codec.dumps_canonical(doc) == _canonical(doc)
+    for doc in corpus:
+        assert codec.loads(codec.dumps(doc).encode('utf-8')) == doc
+
+
+@pytest.mark.parametrize('name', json_utils.BACKENDS)
+def test_loads_raises_value_error(name):
+    codec = _codec(name)
+    assert codec.loads(b'{"a": [1, 2.5, "\\u00e9"]}') == {'a': [1, 2.5, 'é']}
+    assert codec.loads('[]') == []
+    with pytest.raises(ValueError):
+        codec.loads(b'{not json')
+
+
+def test_get_codec_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        json_utils.get_codec('yaml')
+    assert json_utils.BACKEND in json_utils.BACKENDS
+
+
+def test_read_json_bytes_round_trip(tmp_path: Path) -> None:
+    path = tmp_path / 'doc.json'
+    path.write_bytes(b'{"title": "\xc3\xa9"}')
+    assert json_utils.read_json_bytes(path) == path.read_bytes()
+    assert load_json(path) == {'title': 'é'}
+    (tmp_path / 'empty.json').write_bytes(b'')
+    assert json_utils.read_json_bytes(tmp_path / 'empty.json') == b''
@@ -1,11 +1,12 @@
 import pathlib
 import sys
+import time
 
 import pytest
 
 sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'scripts'))
 import memory_monitor
-from memory_monitor import MemoryMonitor
+from memory_monitor import MemoryGovernor, MemoryMonitor, measure_bytes_per_doc
 
 
 def test_rss_mb(monkeypatch):
@@ -29,3 +30,75 @@ def test_env_limit(monkeypatch):
     monitor = MemoryMonitor()
     assert monitor.limit_mb == 123
     monkeypatch.delenv('ISSUES_KB_MEMORY_LIMIT_MB', raising=False)
+
+
+class _FixedMonitor:
+    def __init__(self, rss, warn_mb=None, limit_mb=None):
+        self.rss = rss
+        self.warn_mb = warn_mb
+        self.limit_mb = limit_mb
+
+    def rss_mb(self):
+        return self.rss
+
+
+def test_governor_clamps_initial_batch_to_band():
+    monitor = _FixedMonitor(100, limit_mb=1000)
+    decisions = []
+    governor = MemoryGovernor(monitor, 5000, on_decision=decisions.append)
+    governor.observe(1024 * 1024)  # 1MB per document
+    governor.clamp()
+    # band upper edge is 800MB; 700MB of headroom fits 700 documents.
+    assert governor.batch_size == 700
+    assert decisions[0].action == 'clamp'
+
+
+@pytest.mark.parametrize(
+    ('rss', 'expected_action', 'expected_size'),
+    [
+        (1200, 'shrink_limit', 50),
+        (900, 'shrink', 75),
+        (100, 'grow', 200),
+        (600, None, 100),
+    ],
+)
+def test_governor_adjusts_to_rss_band(rss, expected_action, expected_size):
+    monitor = _FixedMonitor(rss, limit_mb=1000)
+    governor = MemoryGovernor(monitor, 100)
+    governor.observe(1024)
+    decision = governor.adjust()
+    assert (decision.action if decision else None) == expected_action
+    assert governor.batch_size == expected_size
+
+
+def test_governor_without_limits_only_observes():
+    governor = MemoryGovernor(_FixedMonitor(10_000), 100)
+    governor.observe_batch(20, 20_000, rss_before_mb=0)
+    assert governor.adjust() is None
+    assert governor.batch_size == 100
+    assert governor.bytes_per_doc > 0
+
+
+def test_governor_ignores_small_batches():
+    governor = MemoryGovernor(_FixedMonitor(10_000), 100)
+    governor.observe(2048)
+    governor.observe_batch(3, 3 * 100, rss_before_mb=0)
+    assert governor.bytes_per_doc == 2048
+
+
+def test_governor_samples_in_background():
+    monitor = _FixedMonitor(10)
+    with MemoryGovernor(monitor, 1, interval_s=0.01) as governor:
+        monitor.rss = 42
+        for _ in range(200):
+            if governor.rss_mb == 42:
+                break
+            time.sleep(0.01)
+    assert governor.rss_mb == 42
+    assert governor.peak_rss_mb == 42
+
+
+def test_measure_bytes_per_doc_counts_live_objects():
+    per_doc = measure_bytes_per_doc(lambda: [({'k': str(i) * 1000}, 10) for i in range(5)])
+    assert per_doc >= 1000
+    assert measure_bytes_per_doc(lambda: []) is None
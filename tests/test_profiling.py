@@ -0,0 +1,61 @@
+import json
+import pathlib
+import sqlite3
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'scripts'))
+import build_index
+import profiling
+import search
+
+
+def test_disabled_profiler_is_noop(monkeypatch, tmp_path):
+    monkeypatch.delenv(profiling.ENV_ENABLED, raising=False)
+    profiler = profiling.Profiler('demo', 'cid', out_dir=tmp_path)
+    with profiler:
+        with profiler.stage('work'):
+            pass
+    assert profiler.stages == {}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_env_enables_profiler_and_counts_statements(monkeypatch, tmp_path):
+    monkeypatch.setenv(profiling.ENV_ENABLED, '1')
+    profiler = profiling.Profiler('demo', 'abc123', out_dir=tmp_path)
+    con = sqlite3.connect(':memory:')
+    with profiler:
+        profiler.trace(con)
+        with profiler.stage('sql'):
+            con.execute('CREATE TABLE t (x)')
+            for i in range(3):
+                con.execute(f'INSERT INTO t VALUES ({i})')
+    summary = json.loads((tmp_path / 'demo-abc123.json').read_text())
+    assert (tmp_path / 'demo-abc123.prof').exists()
+    assert summary['cid'] == 'abc123'
+    assert summary['stages']['sql']['calls'] == 1
+    assert ['INSERT INTO t VALUES (?)', 3] in summary['sqlite']['top']
+    assert summary['top_functions']
+
+
+def test_build_index_profile_flag(monkeypatch, tmp_path):
+    root = tmp_path / 'issuesdb'
+    issues_dir = root / 'issues' / 'src' / 'py'
+    issues_dir.mkdir(parents=True)
+    (issues_dir / 'a.json').write_text(
+        json.dumps({'issue_id': 'a', 'source': 'src', 'language': 'py', 'title': 'Widget crash'}), 'utf-8'
+    )
+    monkeypatch.setattr(build_index, 'ROOT', root)
+    monkeypatch.setattr(build_index, 'DB', root / 'issues.sqlite')
+    monkeypatch.setattr(build_index, 'SQL', pathlib.Path(__file__).resolve().parents[1] / 'issues_index.sql')
+    monkeypatch.setattr(build_index, 'STATE', root / 'index_state.json')
+    out = tmp_path / 'profiles'
+
+    build_index.main(['--profile', '--profile-dir', str(out)])
+    (summary_path,) = out.glob('build_index-*.json')
+    summary = json.loads(summary_path.read_text())
+    assert {'load', 'index', 'optimize', 'integrity'} <= set(summary['stages'])
+    assert summary['sqlite']['statements'] > 0
+
+    search.main(['widget', '--db-path', str(root / 'issues.sqlite'), '--profile', '--profile-dir', str(out)])
+    (search_summary,) = out.glob('search-*.json')
+    assert json.loads(search_summary.read_text())['stages']['query']['calls'] == 1
@@ -0,0 +1,108 @@
+import json
+import pathlib
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'scripts'))
+import build_index
+import check_health
+import reconcile
+
+
+@pytest.fixture
+def index(indexed_root):
+    paths = [indexed_root.write(i) for i in range(6)]
+    build_index.main()
+    return indexed_root, paths
+
+
+def _report(root: pathlib.Path, spill: pathlib.Path = None) -> reconcile.ReconcileReport:
+    con = sqlite3.connect(root / 'issues.sqlite')
+    try:
+        return reconcile.reconcile(root / 'issues', con, run_size=2, spill=spill)
+    finally:
+        con.close()
+
+
+def test_reconcile_clean_index(index):
+    root = index[0].root
+    report = _report(root)
+    assert report.ok
+    assert report.files == report.indexed == 6
+
+
+def test_reconcile_reports_missing_extra_stale(index, tmp_path):
+    tree, paths = index
+    root = tree.root
+    tree.write(0, title='Changed title')
+    paths[1].unlink()
+    added = tree.write(99)
+
+    report = _report(root, tmp_path / 'drift.tsv')
+    assert report.counts == {'missing': 1, 'extra': 1, 'stale': 1, 'duplicate': 0}
+    assert report.samples['stale'] == [paths[0].stem]
+    assert [d.issue_id for d in report.drift('extra')] == [paths[1].stem]
+    assert [d.path for d in report.drift('missing')] == [added.resolve()]
+    assert sorted(d.kind for d in report.drift()) == ['extra', 'missing', 'stale']
+    assert report.summary()['stale'] == 1
+
+
+def test_reconcile_report_memory_is_bounded(index, monkeypatch):
+    tree, paths = index
+    root = tree.root
+    for path in paths:
+        path.unlink()
+    monkeypatch.setattr(reconcile, 'SAMPLE_LIMIT', 2)
+
+    report = _report(root)
+    assert report.counts['extra'] == 6
+    assert len(report.samples['extra']) == 2
+    with pytest.raises(ValueError):
+        next(report.drift())
+
+
+def test_reconcile_reports_duplicate_ids_and_matches_the_indexed_copy(index):
+    tree, paths = index
+    issue_id = paths[0].stem
+    # Sorts after the original, but it is the copy the incremental build indexes.
+    tree.write(0, ('tool', 'py'), issue_id=issue_id, title='Second copy')
+    build_index.main()
+
+    report = _report(tree.root)
+    assert report.counts == {'missing': 0, 'extra': 0, 'stale': 0, 'duplicate': 1}
+    assert report.samples['duplicate'] == [issue_id]
+    assert report.files == report.indexed == 6
+
+
+def test_check_health_reconcile_repair(index, monkeypatch):
+    tree, paths = index
+    root = tree.root
+    tree.write(0, title='Renamed widget')
+    paths[1].unlink()
+    tree.write(99)
+    monkeypatch.chdir(root.parent)
+    argv = ['--reconcile', '--db-path', str(root / 'issues.sqlite'), '--issues-dir', str(root / 'issues')]
+
+    with pytest.raises(SystemExit):
+        check_health.main(argv)
+    status = json.loads((root.parent / 'metrics/reconcile_status.json').read_text())
+    assert (status['status'], status['missing'], status['extra'], status['stale']) == ('drift', 1, 1, 1)
+
+    check_health.main(argv + ['--repair'])
+    status = json.loads((root.parent / 'metrics/reconcile_status.json').read_text())
+    assert status['repaired'] == {'updated': 2, 'removed': 1}
+    assert _report(root).ok
+
+    con = sqlite3.connect(root / 'issues.sqlite')
+    try:
+        # The old title's postings are removed together with the stale row.
+        assert con.execute("SELECT rowid FROM fts_issues WHERE fts_issues MATCH 'title:issue'").fetchall() == [
+            (r,) for (r,) in con.execute(
+                "SELECT rowid FROM issues WHERE title LIKE 'Issue %' ORDER BY rowid"
+            )
+        ]
+        assert con.execute("SELECT COUNT(*) FROM fts_issues WHERE fts_issues MATCH 'widget'").fetchone()[0] == 1
+    finally:
+        con.close()
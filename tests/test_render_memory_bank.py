@@ -0,0 +1,87 @@
+import pathlib
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'scripts'))
+import build_index
+import render_memory_bank
+
+
+def _write_issue(tree, idx: int, **extra) -> pathlib.Path:
+    fields = {
+        'severity': 'MAJOR' if idx % 2 else 'MINOR',
+        'taxonomy': {'cwe': ['CWE-79'] if idx % 3 == 0 else []},
+        'updated_at': f'2025-01-{idx + 1:02d}T00:00:00Z',
+    }
+    fields.update(extra)
+    return tree.write(idx, **fields)
+
+
+@pytest.fixture
+def tree(monkeypatch, indexed_root):
+    root = indexed_root.root
+    monkeypatch.setattr(render_memory_bank, 'ISS', root / 'issues')
+    monkeypatch.setattr(render_memory_bank, 'DB', root / 'issues.sqlite')
+    monkeypatch.setattr(render_memory_bank, 'STATE', root / 'index_state.json')
+    return indexed_root
+
+
+def test_index_stats_match_file_scan(tree):
+    for i in range(7):
+        _write_issue(tree, i)
+    build_index.main()
+
+    assert render_memory_bank.index_is_fresh()
+    from_index = render_memory_bank.stats_from_index()
+    from_files = render_memory_bank.stats_from_files()
+    assert from_index == from_files
+    assert from_index['total'] == 7
+    assert from_index['by_severity'] == {'MAJOR': 3, 'MINOR': 4}
+    assert from_index['top_cwe'] == [('CWE-79', 3)]
+    assert from_index['recent'][0][0] == '2025-01-07T00:00:00Z'
+
+
+def test_count_docs_falls_back_when_stale(tree):
+    for i in range(3):
+        _write_issue(tree, i)
+    build_index.main()
+    _write_issue(tree, 10, source='other')
+
+    assert not render_memory_bank.index_is_fresh()
+    stats = render_memory_bank.count_docs()
+    assert stats['total'] == 4
+    assert stats['by_source'] == {'other': 1, 'src': 3}
+
+
+def test_render_system_patterns_includes_snapshot():
+    stats = {
+        'total': 2,
+        'by_source': {'sonar': 2},
+        'by_language': {'py': 2},
+        'by_severity': {'INFO': 2},
+        'top_cwe': [('CWE-89', 1)],
+        'recent': [('2025-01-01T00:00:00Z', 'abc', 'Demo')],
+    }
+    text = render_memory_bank.render_system_patterns(stats)
+    assert '- Total issues: 2' in text
+    assert '- INFO: 2' in text
+    assert '- CWE-89: 1' in text
+    assert 'Demo (`abc`)' in text
+
+
+def test_group_by_fallback_buckets_empty_values_like_file_scan(tree):
+    for i in range(4):
+        _write_issue(tree, i, **({'language': '', 'severity': ''} if i < 2 else {}))
+    build_index.main()
+    # An index from before the stats table: the GROUP BY fallback runs.
+    con = sqlite3.connect(build_index.DB)
+    con.execute('DROP TABLE stats')
+    con.commit()
+    con.close()
+
+    from_index = render_memory_bank.stats_from_index()
+    assert from_index == render_memory_bank.stats_from_files()
+    assert from_index['by_language'] == {'py': 2, 'unknown': 2}
+    assert from_index['by_severity'] == {'MAJOR': 1, 'MINOR': 1, 'unknown': 2}
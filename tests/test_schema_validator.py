@@ -0,0 +1,89 @@
+import json
+import pathlib
+import sys
+
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'scripts'))
+import schema_validator
+from schema_validator import SchemaError, compile_schema, validate_issue
+
+
+def _doc(**extra):
+    doc = {'issue_id': 'a' * 40, 'source': 'src', 'title': 'ok'}
+    doc.update(extra)
+    return doc
+
+
+def test_issue_schema_errors_carry_paths():
+    assert validate_issue(_doc(signals=[{'kind': 'rule_id', 'value': 'S1'}])) == []
+    errors = validate_issue(
+        {
+            'issue_id': 1,
+            'title': 't',
+            'frequency': True,
+            'signals': [{'kind': 'rule_id', 'value': 'S1'}, {'kind': 3}],
+            'references': [{'url': None}],
+            'extra/field': 1,
+        }
+    )
+    assert [str(e) for e in errors] == [
+        "/: missing required property 'source'",
+        '/issue_id: expected string, got number',
+        '/frequency: expected integer or null, got boolean',
+        "/signals/1: missing required property 'value'",
+        '/signals/1/kind: expected string or null, got number',
+        '/references/0/url: expected string, got null',
+        '/extra~1field: unexpected property',
+    ]
+    assert validate_issue([]) == [SchemaError('', 'expected object, got array')]
+
+
+def test_compile_schema_keywords():
+    validate = compile_schema(
+        {
+            'type': 'object',
+            'properties': {
+                'n': {'type': ['integer', 'string'], 'minimum': 2, 'maximum': 5, 'pattern': '^a'},
+                'tags': {'type': 'array', 'minItems': 1, 'maxItems': 2, 'items': {'enum': ['x', 'y']}},
+                's': {'type': 'string', 'minLength': 2, 'maxLength': 3},
+                'k': {'const': 'fixed'},
+            },
+            'additionalProperties': {'type': 'number'},
+        }
+    )
+    assert validate({'n': 3, 'tags': ['x'], 's': 'ab', 'k': 'fixed', 'extra': 1.5}) == []
+    errors = validate({'n': 'b', 'tags': ['z', 'x', 'y'], 's': 'a', 'k': 'other', 'extra': 'no'})
+    assert [e.path for e in errors] == ['/n', '/tags', '/tags/0', '/s', '/k', '/extra']
+    assert [e.path for e in validate({'n': 9, 'tags': [], 's': 'abcd'})] == ['/n', '/tags', '/s']
+    assert 'def validate' in validate.source
+
+
+def test_compile_schema_rejects_unknown_keywords():
+    with pytest.raises(ValueError, match='oneOf'):
+        compile_schema({'type': 'object', 'properties': {'a': {'oneOf': []}}})
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_validate_files_and_cli(tmp_path, monkeypatch, capsys, workers):
+    monkeypatch.setattr(schema_validator, 'PARALLEL_MIN_FILES', 1)
+    monkeypatch.setattr(schema_validator, 'CHUNK_FILES', 2)
+    folder = tmp_path / 'src' / 'python'
+    folder.mkdir(parents=True)
+    paths = []
+    for i in range(5):
+        path = folder / f'{i:040x}.json'
+        path.write_text(json.dumps(_doc(issue_id=f'{i:040x}', frequency='x' if i == 3 else 1)))
+        paths.append(path)
+    (folder / f'{9:040x}.json').write_text('{not json')
+
+    failures = schema_validator.validate_files(sorted(folder.glob('*.json')), workers=workers)
+    assert [(pathlib.Path(p).name, [e.path for e in errs]) for p, errs in failures] == [
+        (paths[3].name, ['/frequency']),
+        (f'{9:040x}.json', ['']),
+    ]
+
+    assert schema_validator.main(['--root', str(tmp_path), '--workers', str(workers)]) == 1
+    out = capsys.readouterr()
+    assert f'{paths[3]}: /frequency: expected integer or null, got string' in out.out
+    assert '6 files, 2 invalid' in out.err
@@ -63,6 +63,75 @@ def test_query_fts_orders_by_bm25_and_prefix(tmp_path: Path) -> None:
     assert after['seconds_total'] > before.get('seconds_total', 0)
 
 
+def test_query_fts_feeds_registry(tmp_path: Path) -> None:
+    db = create_db(tmp_path)
+    hits = search_module.QUERIES.value(plan='fts', outcome='hit')
+    observed = search_module.QUERY_SECONDS.count(plan='fts')
+    search_module.query_fts(db, 'netw', 5)
+    search_module.query_fts(db, 'zzz', 5)
+    assert search_module.QUERIES.value(plan='fts', outcome='hit') == hits + 1
+    assert search_module.QUERY_SECONDS.count(plan='fts') == observed + 2
+    assert search_module.QUERY_SECONDS.percentile(0.99, plan='fts') > 0
+
+
+def test_plan_query_shapes() -> None:
+    plan = search_module.plan_query('python:S1234')
+    assert (plan.kind, plan.shape, plan.value) == ('signal', 'rule_id', 'python:S1234')
+    assert plan.match == '{signals_concat title} : "python s1234"'
+    assert search_module.plan_query('java.lang.NullPointerException').shape == 'signature'
+    assert search_module.plan_query('TS2345').shape == 'error_code'
+    plan = search_module.plan_query('netw failure')
+    assert (plan.kind, plan.match) == ('fts', '"netw"* AND "failure"')
+
+
+def test_signal_lookup_then_scoped_fallback(tmp_path: Path) -> None:
+    db = create_db(tmp_path)
+    con = sqlite3.connect(db)
+    con.executescript(
+        """
+        ALTER TABLE issues ADD COLUMN frequency INTEGER;
+        UPDATE issues SET frequency = 1;
+        CREATE TABLE signals (issue_id TEXT NOT NULL, kind TEXT, value TEXT NOT NULL);
+        CREATE INDEX idx_signals_value ON signals(value);
+        INSERT INTO signals VALUES ('id1', 'rule_id', 'python:S1234');
+        INSERT INTO fts_issues(rowid, signals_concat) VALUES (2, 'python:S9999');
+        """
+    )
+    con.commit()
+    con.close()
+    fallbacks = search_module.QUERIES.value(plan='signal_fts', outcome='hit')
+
+    assert [r['issue_id'] for r in search_module.query_fts(db, 'python:S1234', 5)] == ['id1']
+    assert [r['issue_id'] for r in search_module.query_fts(db, 'python:s9999', 5)] == ['id2']
+    assert search_module.QUERIES.value(plan='signal_fts', outcome='hit') == fallbacks + 1
+
+
+def test_query_fts_accepts_fts_syntax_in_input(tmp_path: Path) -> None:
+    db = create_db(tmp_path)
+    for text in ('Network "glitch', 'network -(hiccup', 'NEAR(network, 2)', 'title:network', ':-)'):
+        search_module.query_fts(db, text, 5)
+    assert [r['issue_id'] for r in search_module.query_fts(db, 'network -hiccup', 5)] == ['id2']
+
+
+def test_column_filter_is_not_a_signal(tmp_path: Path) -> None:
+    db = create_db(tmp_path)
+    assert search_module.plan_query('lang:py').kind == 'fts'
+    assert [r['issue_id'] for r in search_module.query_fts(db, 'title:hiccup', 5)] == ['id1']
+    assert [r['issue_id'] for r in search_module.query_fts(db, 'Summary:glitch', 5)] == ['id1']
+
+
+def test_query_fts_snippets(tmp_path: Path) -> None:
+    db = create_db(tmp_path)
+    (row,) = search_module.query_fts(db, 'glitch', 5, snippets=True)
+    assert row == {
+        'issue_id': 'id1',
+        'title': 'Network hiccup',
+        'language': 'py',
+        'field': 'summary',
+        'snippet': 'Network **glitch**',
+    }
+
+
 def test_search_uses_cache(monkeypatch: pytest.MonkeyPatch) -> None:
     calls = {'n': 0}
 
@@ -0,0 +1,83 @@
+import json
+import pathlib
+import sys
+
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'scripts'))
+import build_index
+import search
+import shards
+
+PARTITIONS = [('sonar', 'py'), ('sonar', 'ts'), ('semgrep', 'py')]
+
+
+def _write_issue(tree, source, language, i, title):
+    signals = [{'kind': 'rule_id', 'value': f'{source}-{language}:S{i}'}]
+    return tree.write(i, (source, language), title=title, signals=signals).stem
+
+
+@pytest.fixture
+def corpus(monkeypatch, indexed_root, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    for source, language in PARTITIONS:
+        for i in range(5):
+            _write_issue(indexed_root, source, language, i, f'Connection reset {source} {language} {i}')
+    return indexed_root.root
+
+
+def test_build_creates_one_index_per_partition(corpus):
+    saved = (build_index.ROOT, build_index.DB, build_index.STATE, build_index.PARTITION)
+    results = shards.build(corpus, workers=1)
+    assert sorted((r['source'], r['language']) for r in results) == sorted(PARTITIONS)
+    assert (build_index.ROOT, build_index.DB, build_index.STATE, build_index.PARTITION) == saved
+
+    found = shards.discover(corpus / 'shards')
+    assert [(s.source, s.language) for s in found] == sorted(PARTITIONS)
+    assert all(s.db.exists() and s.state.exists() for s in found)
+    assert [s.source for s in shards.discover(corpus / 'shards', languages=['py'])] == ['semgrep', 'sonar']
+    assert [s.language for s in shards.discover(corpus / 'shards', sources=['sonar'])] == ['py', 'ts']
+
+    # A partition that disappears takes its shard with it.
+    for path in (corpus / 'issues' / 'sonar' / 'ts').iterdir():
+        path.unlink()
+    (corpus / 'issues' / 'sonar' / 'ts').rmdir()
+    shards.build(corpus, workers=1)
+    assert not (corpus / 'shards' / 'sonar' / 'ts.sqlite').exists()
+    assert len(shards.discover(corpus / 'shards')) == 2
+
+
+def test_query_shards_merges_and_prunes(corpus, indexed_root, capsys):
+    target = _write_issue(indexed_root, 'sonar', 'ts', 9, 'Socket timeout socket')
+    _write_issue(indexed_root, 'semgrep', 'py', 9, 'Socket closed')
+    shards.build(corpus, workers=1)
+    shards_dir = corpus / 'shards'
+
+    hits = search.query_shards(shards_dir, 'socket', 10, snippets=False)
+    assert len(hits) == 2
+    assert hits[0]['issue_id'] == target
+    assert hits[0]['score'] <= hits[1]['score']
+    assert len(search.query_shards(shards_dir, 'connection', 4)) == 4
+
+    assert [h['language'] for h in search.query_shards(shards_dir, 'socket', 10, languages=['py'])] == ['py']
+    assert search.query_shards(shards_dir, 'socket', 10, sources=['nope']) == []
+
+    # An exact signal hit ranks ahead of the other shards' text matches.
+    hits = search.query_shards(shards_dir, 'sonar-ts:S9', 10)
+    assert hits[0]['issue_id'] == target and hits[0]['score'] is None
+
+    search.main(['socket', '--shards', str(shards_dir), '--lang', 'ts', '--full'])
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [r['issue_id'] for r in rows] == [target]
+
+
+def test_pool_workers_report_metrics_to_one_textfile(corpus, monkeypatch, tmp_path):
+    prom = tmp_path / 'prom' / 'build.prom'
+    monkeypatch.setenv('METRICS_PROM_PATH', str(prom))
+    before = build_index.DOCS_INDEXED.value(op='upsert')
+
+    shards.build(corpus, workers=2)
+    # Workers never write the textfile; the parent writes it once with every shard's counts.
+    assert build_index.DOCS_INDEXED.value(op='upsert') == before + 15
+    assert f'index_documents_total{{op="upsert"}} {before + 15:g}' in prom.read_text()
+    assert [p.name for p in prom.parent.iterdir()] == ['build.prom']
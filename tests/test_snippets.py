@@ -0,0 +1,40 @@
+import pathlib
+import sys
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'scripts'))
+from fts_query import query_terms
+from snippets import excerpt, highlight, snippet
+
+TEXT = (
+    'Startup is slow because the cache is rebuilt. Unrelated words fill this part of the text '
+    'for a while before anything else. Close the stream after reading; leaked streams exhaust '
+    'file handles under load.'
+)
+
+
+def test_query_terms_skip_negations():
+    assert query_terms('stream -cookie "file handle"') == [('stream', False), ('file', False), ('handle', False)]
+    assert query_terms('netw') == [('netw', True)]
+
+
+def test_snippet_picks_densest_window():
+    text, score = snippet(TEXT, query_terms('stream handles'), size=12)
+    assert score == 2
+    assert text.startswith('…') and text.endswith('…')
+    assert '**stream**' in text and '**streams**' in text and '**handles**' in text
+    assert 'Startup' not in text
+
+
+def test_snippet_without_hits_returns_lead():
+    text, score = snippet(TEXT, [('zebra', False)], size=4)
+    assert (text, score) == ('Startup is slow because…', 0)
+    assert snippet(None, [('x', False)]) == ('', 0)
+
+
+def test_highlight_and_excerpt():
+    assert highlight('Network netw hiccup', [('netw', True)]) == '**Network** **netw** hiccup'
+    row = {'issue_id': 'a', 'title': 'Leaked stream', 'summary': 'Nothing here.', 'fix_steps': TEXT, 'language': 'py'}
+    hit = excerpt(row, query_terms('stream'), size=8)
+    assert hit['field'] == 'fix_steps'
+    assert hit['title'] == 'Leaked **stream**'
+    assert set(hit) == {'issue_id', 'title', 'language', 'field', 'snippet'}
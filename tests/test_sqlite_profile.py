@@ -0,0 +1,80 @@
+import hashlib
+import json
+import pathlib
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'scripts'))
+import build_index
+import search
+import sqlite_profile
+
+
+@pytest.fixture
+def built(monkeypatch, tmp_path):
+    root = tmp_path / 'issuesdb'
+    issues_dir = root / 'issues' / 'src' / 'py'
+    issues_dir.mkdir(parents=True)
+    monkeypatch.setattr(build_index, 'ROOT', root)
+    monkeypatch.setattr(build_index, 'DB', root / 'issues.sqlite')
+    monkeypatch.setattr(build_index, 'SQL', pathlib.Path(__file__).resolve().parents[1] / 'issues_index.sql')
+    monkeypatch.setattr(build_index, 'STATE', root / 'index_state.json')
+    for i in range(30):
+        issue_id = hashlib.sha1(str(i).encode()).hexdigest()
+        doc = {
+            'issue_id': issue_id,
+            'source': 'src',
+            'language': 'py',
+            'title': f'Null pointer dereference {i}',
+            'summary': 'Accessing an attribute of None raises AttributeError.',
+            'signals': [{'kind': 'rule_id', 'value': f'python:S{i}'}],
+        }
+        (issues_dir / f'{issue_id}.json').write_text(json.dumps(doc), 'utf-8')
+    return root
+
+
+def test_build_uses_page_size_and_writes_snapshot(built):
+    snap = built / 'serving.sqlite'
+    build_index.main(['--serving-snapshot', str(snap)])
+    con = sqlite3.connect(built / 'issues.sqlite')
+    assert con.execute('PRAGMA page_size').fetchone()[0] == sqlite_profile.SERVING.page_size
+    con.close()
+
+    reader = sqlite_profile.connect_reader(snap, immutable=True)
+    try:
+        settings = sqlite_profile.describe(reader)
+        assert settings['page_size'] == sqlite_profile.SERVING.page_size
+        assert settings['journal_mode'] == 'delete'
+        assert settings['mmap_size'] == sqlite_profile.SERVING.mmap_size
+        assert settings['cache_size'] == -sqlite_profile.SERVING.cache_kib
+        assert settings['temp_store'] == 2  # MEMORY
+        assert settings['query_only'] == 1
+        assert reader.execute('SELECT COUNT(*) FROM sqlite_stat1').fetchone()[0] > 0
+        with pytest.raises(sqlite3.OperationalError):
+            reader.execute('DELETE FROM issues')
+    finally:
+        reader.close()
+    assert not list(built.glob('serving.sqlite?*'))
+
+    hits = search.query_fts(snap, 'dereference', 5, immutable=True)
+    assert len(hits) == 5
+    assert search.query_fts(snap, 'python:S7', 5, immutable=True)[0]['title'] == 'Null pointer dereference 7'
+
+    # An up-to-date build recreates a missing snapshot and leaves an existing one alone.
+    snap.unlink()
+    build_index.main(['--serving-snapshot', str(snap)])
+    assert snap.exists()
+
+
+def test_snapshot_page_size_override(built, tmp_path):
+    build_index.main([])
+    out = sqlite_profile.snapshot(built / 'issues.sqlite', tmp_path / 'snap' / 'small.sqlite',
+                                  sqlite_profile.Profile(page_size=4096))
+    con = sqlite3.connect(out)
+    try:
+        assert con.execute('PRAGMA page_size').fetchone()[0] == 4096
+        assert con.execute('SELECT COUNT(*) FROM issues').fetchone()[0] == 30
+    finally:
+        con.close()
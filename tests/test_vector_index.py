@@ -0,0 +1,81 @@
+import json
+import pathlib
+import sqlite3
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1] / 'scripts'))
+import vector_index
+
+TEXTS = {
+    'a': 'Connection refused when the client connects to the database server',
+    'b': 'Null pointer dereference in the request handler',
+    'c': 'SQL injection through string concatenation in a query builder',
+    'd': 'Deprecated import of a removed module',
+}
+
+
+def write_chunks(path: pathlib.Path, copies: int = 1) -> pathlib.Path:
+    with path.open('w', encoding='utf-8') as fh:
+        for n in range(copies):
+            for doc, text in TEXTS.items():
+                fh.write(json.dumps({'id': f'{doc}{n}:0', 'doc_id': f'{doc}{n}', 'chunk_ix': 0, 'text': text}) + '\n')
+    return path
+
+
+def test_brute_force_finds_paraphrase(tmp_path):
+    chunks = write_chunks(tmp_path / 'chunks.jsonl')
+    meta = vector_index.build(chunks, tmp_path / 'vectors', dim=256)
+    assert meta['count'] == 4 and meta['ivf_lists'] == 0
+    index = vector_index.VectorIndex(tmp_path / 'vectors')
+    assert isinstance(index.matrix, np.memmap)
+    hits = index.search('database connections were refused', 2)
+    assert hits[0]['doc_id'] == 'a0'
+    assert hits[0]['score'] >= hits[1]['score']
+    assert index.search('   ', 2) == []
+
+
+def test_ivf_matches_brute_force(tmp_path):
+    chunks = write_chunks(tmp_path / 'chunks.jsonl', copies=10)
+    vector_index.build(chunks, tmp_path / 'brute', dim=256)
+    vector_index.build(chunks, tmp_path / 'ivf', dim=256, ivf_lists=4)
+    brute = vector_index.VectorIndex(tmp_path / 'brute')
+    ivf = vector_index.VectorIndex(tmp_path / 'ivf')
+    query = 'injection in the sql query builder'
+    assert {h['doc_id'][0] for h in ivf.search(query, 5, nprobe=4)} == {h['doc_id'][0] for h in brute.search(query, 5)}
+
+
+def test_pluggable_embedder(tmp_path, monkeypatch):
+    module = tmp_path / 'toy_embedder.py'
+    module.write_text('def embed(texts):\n    return [[len(t), t.count("e") + 1.0] for t in texts]\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    meta = vector_index.build(write_chunks(tmp_path / 'chunks.jsonl'), tmp_path / 'v', embedder='toy_embedder:embed')
+    assert meta['dim'] == 2
+    assert len(vector_index.VectorIndex(tmp_path / 'v').search('anything', 3)) == 3
+
+
+def test_hybrid_fuses_bm25_and_vector_ranks(tmp_path):
+    db = tmp_path / 'issues.sqlite'
+    con = sqlite3.connect(db)
+    con.executescript(
+        """
+        CREATE TABLE issues (issue_id TEXT PRIMARY KEY, title TEXT, summary TEXT, fix_steps TEXT, language TEXT);
+        CREATE VIRTUAL TABLE fts_issues USING fts5(title, summary, fix_steps, signals_concat, language, content='');
+        """
+    )
+    for rowid, (doc, text) in enumerate(TEXTS.items(), 1):
+        con.execute('INSERT INTO issues VALUES (?,?,?,?,?)', (f'{doc}0', text, '', '', 'py'))
+        con.execute('INSERT INTO fts_issues(rowid, title) VALUES (?,?)', (rowid, text))
+    con.commit()
+    con.close()
+    vector_index.build(write_chunks(tmp_path / 'chunks.jsonl'), tmp_path / 'v', dim=256)
+
+    rows = vector_index.hybrid_search(
+        'database connections refused', 3, index=vector_index.VectorIndex(tmp_path / 'v'), db_path=db
+    )
+    assert rows[0]['issue_id'] == 'a0'
+    assert rows[0]['title'] == TEXTS['a']
+    assert rows[0]['vector_rank'] == 1